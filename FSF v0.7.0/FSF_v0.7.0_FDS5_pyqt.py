@@ -9,7 +9,7 @@ try:
     from fsf_utils import (setup_app_palette, get_input_style_common, get_button_style_common,
                            get_group_box_style, get_label_style, create_input_field_common,
                            load_from_ini_common, calculate_common, save_to_ini_common,
-                           read_ini_file_path, read_ini_file_hoc, process_fds_file_common,
+                           read_ini_file_path, read_ini_file_hoc, process_fds_file_common, preview_fds_file_common,
                            get_icon_path, safe_convert_to_float)
 except ModuleNotFoundError:
     import os
@@ -20,7 +20,7 @@ except ModuleNotFoundError:
     from fsf_utils import (setup_app_palette, get_input_style_common, get_button_style_common,
                            get_group_box_style, get_label_style, create_input_field_common,
                            load_from_ini_common, calculate_common, save_to_ini_common,
-                           read_ini_file_path, read_ini_file_hoc, process_fds_file_common,
+                           read_ini_file_path, read_ini_file_hoc, process_fds_file_common, preview_fds_file_common,
                            get_icon_path, safe_convert_to_float)
 
 # Глобальная переменная для ProcessID
@@ -108,11 +108,17 @@ class FDSProcessorAppQt(QMainWindow):
         self.calculate_button.setStyleSheet(get_button_style_common())
         self.calculate_button.clicked.connect(lambda: calculate_common(self, self.k_entry, self.fpom_entry, self.psyd_entry, self.v_entry, self.m_entry, self.tmax_entry, self.psy_entry, self.hrr_entry, self.stt_entry, self.bigM_entry, self.process_button, self.statusBar, ProcessID, read_ini_file_hoc))
 
+        self.preview_button = QPushButton("Предпросмотр")
+        self.preview_button.setFont(QFont("Segoe UI", 11, QFont.Weight.Light))
+        self.preview_button.setStyleSheet(get_button_style_common())
+        self.preview_button.setToolTip("Показать изменения .fds файла без сохранения")
+        self.preview_button.clicked.connect(lambda: preview_fds_file_common(self, self.m_entry, self.tmax_entry, self.psy_entry, ProcessID, read_ini_file_path, read_ini_file_hoc))
+
         self.process_button = QPushButton("Сохранить")
         self.process_button.setFont(QFont("Segoe UI", 11, QFont.Weight.Light))
         self.process_button.setStyleSheet(get_button_style_common())
         self.process_button.setEnabled(False)
-        self.process_button.clicked.connect(lambda: process_fds_file_common(self, self.k_entry, self.fpom_entry, self.psyd_entry, self.v_entry, self.m_entry, self.tmax_entry, self.psy_entry, self.hrr_entry, self.stt_entry, self.bigM_entry, self.process_button, ProcessID, read_ini_file_path, read_ini_file_hoc))
+        self.process_button.clicked.connect(lambda: process_fds_file_common(self, self.k_entry, self.fpom_entry, self.psyd_entry, self.v_entry, self.m_entry, self.tmax_entry, self.psy_entry, self.hrr_entry, self.stt_entry, self.bigM_entry, self.process_button, ProcessID, read_ini_file_path, read_ini_file_hoc, fds_dialect="FDS5"))
 
         # Layouts
         input_layout.addWidget(self.k_entry[0])
@@ -131,6 +137,8 @@ class FDSProcessorAppQt(QMainWindow):
         button_row_layout.addStretch()
         button_row_layout.addWidget(self.calculate_button)
         button_row_layout.addSpacing(20)
+        button_row_layout.addWidget(self.preview_button)
+        button_row_layout.addSpacing(20)
         button_row_layout.addWidget(self.process_button)
         button_row_layout.addStretch()
 
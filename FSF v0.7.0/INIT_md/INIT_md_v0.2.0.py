@@ -1,7 +1,6 @@
 import os
 import re
 import io
-import csv
 import sys
 import glob
 import json
@@ -16,6 +15,21 @@ import plotly.io as pio
 pio.renderers.default = 'iframe'
 import numpy as np
 
+try:
+    from fds_stream import DevcInjectStage, read_chunk_settings, rewrite_fds_file
+    from fds_records import make_record
+    from fds_index import load_index
+    from devc_csv import read_devc_csv_files
+    from fds_snapshot import take_snapshot
+except ModuleNotFoundError:
+    # Добавляем директорию, содержащую fds_stream.py, в Python-путь
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+    from fds_stream import DevcInjectStage, read_chunk_settings, rewrite_fds_file
+    from fds_records import make_record
+    from fds_index import load_index
+    from devc_csv import read_devc_csv_files
+    from fds_snapshot import take_snapshot
+
 class MainWindow(QMainWindow):
     def __init__(self, process_id=None):
         super().__init__()
@@ -89,12 +103,9 @@ class MainWindow(QMainWindow):
 
     def extract_chid_from_fds(self):
         try:
-            with open(self.path_to_fds, 'r', encoding='utf-8') as file:
-                for line in file:
-                    if line.strip().startswith("&HEAD") and "CHID=" in line:
-                        match = re.search(r"CHID\s*=\s*['\"]?([^'\"]+)['\"]?", line)
-                        if match:
-                            return match.group(1).strip()
+            chid = load_index(self.path_to_fds, workers=1).chid()
+            if chid:
+                return chid.strip()
             raise ValueError("CHID not found")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error extracting CHID: {str(e)}")
@@ -106,52 +117,11 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Error", "Invalid deltaZ value!")
             return
         try:
-            with io.open(self.path_to_fds, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            chunksize, _ = read_chunk_settings(self.fds_file_ini_path)
+            take_snapshot(self.path_to_fds, "INIT_md DEVC")
+            rewrite_fds_file(self.path_to_fds, [DevcInjectStage(user_delta_z)], chunksize=chunksize)
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not read .fds file: {str(e)}")
-            return
-        updated_lines = []
-        init_line_pattern = re.compile(r"^\s*&INIT.*TEMPERATURE\s*=\s*(\d+\.\d+)", re.IGNORECASE)
-        xb_pattern = re.compile(r"XB\s*=\s*([-\d\.]+)\s*,\s*([-\d\.]+)\s*,\s*([-\d\.]+)\s*,\s*([-\d\.]+)\s*,\s*([-\d\.]+)\s*,\s*([-\d\.]+)", re.IGNORECASE)
-        counters = defaultdict(int)
-        mass_flow_created = set()
-        for line in lines:
-            updated_lines.append(line)
-            match_init = init_line_pattern.search(line)
-            if match_init:
-                temperature_value_str = match_init.group(1)
-                match_xb = xb_pattern.search(line)
-                if not match_xb:
-                    continue
-                x1, x2, y1, y2, z1, z2 = map(float, match_xb.groups())
-                z2_adjusted = z2 - user_delta_z
-                suffix_match = re.search(r'\.(\d+)$', temperature_value_str)
-                if not suffix_match:
-                    continue
-                group_key = suffix_match.group(1)
-                counters[group_key] += 1
-                devc_id_suffix = f"_{group_key}_{counters[group_key]}"
-                devc_ids = [
-                    f"h{devc_id_suffix}",
-                    f"Density_VM{devc_id_suffix}",
-                    f"Tg 3D{devc_id_suffix}"
-                ]
-                devc_lines = [
-                    f"&DEVC ID='{devc_ids[0]}', QUANTITY='LAYER HEIGHT', XB={x1},{x2},{y1},{y2},{z1},{z2_adjusted}/\n",
-                    f"&DEVC ID='{devc_ids[1]}', QUANTITY='DENSITY', STATISTICS='VOLUME MEAN', XB={x1},{x2},{y1},{y2},{z1},{z2_adjusted}/\n",
-                    f"&DEVC ID='{devc_ids[2]}', QUANTITY='GAS TEMPERATURE', STATISTICS='MEAN', XB={x1},{x2},{y1},{y2},{z1},{z2_adjusted}/\n",
-                ]
-                if group_key not in mass_flow_created:
-                    devc_ids_mass_flow = f"MFLOW+{devc_id_suffix}"
-                    devc_lines.append(f"&DEVC ID='{devc_ids_mass_flow}', QUANTITY='MASS FLOW +', XB={x1},{x2},{y1},{y2},{z2_adjusted},{z2_adjusted}/\n")
-                    mass_flow_created.add(group_key)
-                updated_lines.extend(devc_lines)
-        try:
-            with io.open(self.path_to_fds, 'w', encoding='utf-8') as f:
-                f.writelines(updated_lines)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not write to .fds file: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Could not modify .fds file: {str(e)}")
             return
         self.status_text.setText("Файл .fds успешно изменён!")
         time.sleep(1.5)
@@ -208,67 +178,42 @@ class MainWindow(QMainWindow):
     def parse_fds(self, fds_path):
         groups = defaultdict(list)
         current_group = None
-        head_pattern = re.compile(r"&HEAD\s+CHID=['\"]([^'\"]+)['\"]", re.IGNORECASE)
-        devc_pattern = re.compile(r"ID=['\"](h_\d{4}_\d+|Density_VM_\d{4}_\d+|Tg 3D_\d{4}_\d+|MFLOW\+_\d{4}_\d+)['\"]", re.IGNORECASE)
-        with open(fds_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line.upper().startswith('&HEAD'):
-                    head_match = head_pattern.search(line)
-                    if head_match:
-                        self.chid = re.sub(r'(_nfs|_tout)+$', '', head_match.group(1))
-                if line.upper().startswith('&INIT'):
-                    temp_match = re.search(r'TEMPERATURE=(\d+\.\d{4})', line, re.IGNORECASE)
-                    if temp_match:
-                        current_group = temp_match.group(1).split('.')[-1][:4]
-                elif line.upper().startswith('&DEVC'):
-                    devc_match = devc_pattern.search(line)
-                    if devc_match and current_group:
-                        devc_id = devc_match.group(1)
-                        groups[current_group].append(devc_id)
+        devc_pattern = re.compile(r"h_\d{4}_\d+|Density_VM_\d{4}_\d+|Tg 3D_\d{4}_\d+|MFLOW\+_\d{4}_\d+", re.IGNORECASE)
+        # Читаются только группы HEAD, INIT и DEVC по смещениям из индекса;
+        # индекс строится в этом процессе (workers=1): пул процессов в GUI не запускается
+        for name, text in load_index(fds_path, workers=1).read_records('HEAD', 'INIT', 'DEVC'):
+            record = make_record(name, text)
+            if name == 'HEAD':
+                if record.chid:
+                    self.chid = re.sub(r'(_nfs|_tout)+$', '', record.chid)
+            elif name == 'INIT':
+                temp_match = re.match(r'\d+\.(\d{4})', record.get('TEMPERATURE') or '')
+                if temp_match:
+                    current_group = temp_match.group(1)
+            elif name == 'DEVC':
+                devc_id = record.id
+                if devc_id and current_group and devc_pattern.fullmatch(devc_id):
+                    groups[current_group].append(devc_id)
         return groups
 
     def track_values_from_csv(self, csv_files, groups):
         all_data = defaultdict(lambda: defaultdict(list))
-        expected_columns = set()
+        expected_columns = []
         for group_ids in groups.values():
-            expected_columns.update(group_ids)
-            
-        total_files = len(csv_files)
-        for i, csv_file in enumerate(csv_files):
-            self.status_text.setText(f"Обработка CSV файлов... ({i+1}/{total_files})")
+            expected_columns.extend(group_ids)
+
+        def progress(done, total):
+            self.status_text.setText(f"Обработка CSV файлов... ({done}/{total})")
             QApplication.processEvents()
-            
-            with open(csv_file, 'r') as f:
-                header_line = f.readline().strip()
-                units_line = f.readline().strip()
-                f.seek(0)
-                reader = csv.DictReader(f)
-                if any('/' in name for name in reader.fieldnames):
-                    f.seek(0)
-                    next(f)
-                    reader = csv.DictReader(f)
-                    reader.fieldnames = [name.strip('"').strip() for name in next(f).strip().split(',')]
-                    reader = csv.DictReader(f, fieldnames=reader.fieldnames)
-                reader.fieldnames = [name.strip('"').strip() for name in reader.fieldnames]
-                csv_columns = set(reader.fieldnames)
-                valid_columns = expected_columns & csv_columns
-                for row_num, row in enumerate(reader, 1):
-                    try:
-                        time = float(row.get('Time', 0)) if 'Time' in row else float(row.get('FDS Time', 0))
-                    except:
-                        continue
-                    for group, dev_ids in groups.items():
-                        for dev_id in dev_ids:
-                            if dev_id not in valid_columns:
-                                continue
-                            val = row.get(dev_id, '0')
-                            try:
-                                num_val = float(val)
-                                num_val = 0.0 if np.isnan(num_val) else num_val
-                            except:
-                                num_val = 0.0
-                            all_data[group][dev_id].append((time, num_val))
+
+        # Размер группы строк и число одновременно читаемых файлов задаются лаунчером в filePath.ini;
+        # файлы читаются в потоках: пул процессов в GUI не запускается
+        chunksize, batchsize = read_chunk_settings(self.fds_file_ini_path)
+        series = read_devc_csv_files(csv_files, expected_columns, chunksize, batchsize, progress, processes=False)
+        for group, dev_ids in groups.items():
+            for dev_id in dev_ids:
+                if dev_id in series:
+                    all_data[group][dev_id].extend(series[dev_id])
         return all_data
 
     def calculate_and_plot(self, all_data, groups):
@@ -478,13 +423,12 @@ class MainWindow(QMainWindow):
 
     def check_devc(self):
         try:
-            with open(self.path_to_fds, 'r', encoding='utf-8') as file:
-                for line in file:
-                    if line.strip().startswith("&DEVC") and ("h_" in line or "Density_VM_" in line or "Tg 3D_" in line or "MFLOW+_" in line):
-                        self.deltaZ_field.setEnabled(False)
-                        self.apply_button.setEnabled(False)
-                        self.track_button.setEnabled(True)
-                        return
+            for devc_id in load_index(self.path_to_fds, workers=1).ids('DEVC'):
+                if devc_id and ("h_" in devc_id or "Density_VM_" in devc_id or "Tg 3D_" in devc_id or "MFLOW+_" in devc_id):
+                    self.deltaZ_field.setEnabled(False)
+                    self.apply_button.setEnabled(False)
+                    self.track_button.setEnabled(True)
+                    return
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error checking DEVC: {str(e)}")
         self.apply_button.setEnabled(True)
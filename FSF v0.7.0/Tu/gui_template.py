@@ -1,12 +1,24 @@
 import numpy as np
-import re
-import math
 import configparser
+import io
 import os
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QTabWidget, QStatusBar, QLineEdit, QPushButton, QCheckBox, QMessageBox, QListWidget, QGroupBox, QFileDialog)
 from PyQt6.QtGui import QPalette, QColor, QIcon, QIntValidator, QDoubleValidator, QFont
-from PyQt6.QtCore import Qt, QSize, pyqtSignal, QLocale
+from PyQt6.QtCore import Qt, QSize, pyqtSignal, QLocale, QObject, QTimer, QFileSystemWatcher
+
+try:
+    from fds_stream import FDS_ENCODING, atomic_write, iter_namelists, open_fds, rewrite_lines
+    from fds_index import load_index, refresh_index
+    from fds_mesh import calculate_cs, merge_mesh_stage, partition_mesh_stage, refine_mesh_stage
+    from fds_snapshot import take_snapshot
+except ModuleNotFoundError:
+    # Добавляем директорию, содержащую fds_stream.py, в Python-путь
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+    from fds_stream import FDS_ENCODING, atomic_write, iter_namelists, open_fds, rewrite_lines
+    from fds_index import load_index, refresh_index
+    from fds_mesh import calculate_cs, merge_mesh_stage, partition_mesh_stage, refine_mesh_stage
+    from fds_snapshot import take_snapshot
 
 # Глобальная переменная для ProcessID, используемая для путей к ini-файлам.
 # Инициализируется из аргументов командной строки при запуске.
@@ -24,200 +36,42 @@ else:
 
 
 
-def find_best_factors(n):
+def mesh_records(lines):
     """
-    Находит факторы числа n, которые обеспечивают сбалансированное деление по двум осям.
-    Вспомогательная функция для split_mesh.
-    """
-    best_factors = (1, n)
-    min_difference = float('inf')
-
-    for i in range(1, int(n**0.5) + 1):
-        if n % i == 0:
-            factor_x = i
-            factor_y = n // i
-            difference = abs(factor_x - factor_y)
-
-            if difference < min_difference:
-                min_difference = difference
-                best_factors = (factor_x, factor_y)
-
-    return best_factors
-
-def split_mesh(original_mesh, num_splits):
-    """
-    Разбивает одну расчетную область (mesh) на num_splits частей в плоскости XY.
-    
-    :param original_mesh: Словарь с данными оригинальной сетки (IJK, XB).
-    :param num_splits: Желаемое количество разбиений.
-    :return: Список словарей с данными новых сеток.
-    """
-    ijk = original_mesh['IJK']
-    xb = original_mesh['XB']
-    x1, x2, y1, y2, z1, z2 = xb
-
-    def divide_into_parts(length, parts):
-        part_length = length / parts
-        offsets = [i * part_length for i in range(parts)]
-        return offsets, [part_length] * parts
-
-    num_splits_x, num_splits_y = find_best_factors(num_splits)
-
-    x_offsets, dx_sizes = divide_into_parts(x2 - x1, num_splits_x)
-    y_offsets, dy_sizes = divide_into_parts(y2 - y1, num_splits_y)
-    
-    ni = max(1, ijk[0] // num_splits_x)
-    nj = max(1, ijk[1] // num_splits_y)
-
-    split_meshes = []
-    mesh_id = 1
-    for ix in range(num_splits_x):
-        for iy in range(num_splits_y):
-            xb_new = [
-                x1 + x_offsets[ix], x1 + x_offsets[ix] + dx_sizes[ix],
-                y1 + y_offsets[iy], y1 + y_offsets[iy] + dy_sizes[iy],
-                z1, z2
-            ]
-            ijk_new = [ni, nj, ijk[2]]
-            mesh = {
-                'ID': f'Mesh{mesh_id:02d}',
-                'IJK': ijk_new,
-                'XB': xb_new
-            }
-            split_meshes.append(mesh)
-            mesh_id += 1
-
-    return split_meshes
+    Записи &MESH FDS файла в том же разборе, что и у MeshReplaceStage
+    (iter_namelists: многострочные записи, имя группы в любом регистре).
 
-def split_mesh_homo(original_mesh, num_splits):
-    """
-    Разбивает одну расчетную область (mesh) на num_splits частей,
-    стараясь сохранить гомоморфизм (пропорциональность) ячеек.
-    
-    :param original_mesh: Словарь с данными оригинальной сетки (IJK, XB).
-    :param num_splits: Желаемое количество разбиений.
-    :return: Список словарей с данными новых сеток.
-    :raises ValueError: Если num_splits <= 0.
+    :param lines: Список строк FDS файла.
+    :return: Список кортежей (индекс первой строки записи, запись); порядок - порядковые номера &MESH.
     """
-    ijk = original_mesh['IJK']
-    xb = original_mesh['XB']
-    x1, x2, y1, y2, z1, z2 = xb
-
-    if num_splits <= 0:
-        raise ValueError("num_splits must be greater than 0")
-
-    num_splits_z = 1 if ijk[2] < 4 else max(1, min(num_splits, 2))
-    remaining_splits = num_splits // num_splits_z
-
-    num_splits_x = max(1, int(math.sqrt(remaining_splits)))
-    num_splits_y = max(1, remaining_splits // num_splits_x)
-
-    # Корректировка факторов для достижения точного num_splits
-    while num_splits_x * num_splits_y * num_splits_z < num_splits:
-        if num_splits_y < num_splits_x:
-            num_splits_y += 1
-        else:
-            num_splits_x += 1
-
-    while num_splits_x * num_splits_y * num_splits_z > num_splits:
-        if num_splits_y > num_splits_x:
-            num_splits_y -= 1
-        else:
-            num_splits_x -= 1
-    
-    dx = (x2 - x1) / num_splits_x
-    dy = (y2 - y1) / num_splits_y
-    dz = (z2 - z1) / num_splits_z
-    
-    ni = ijk[0] // num_splits_x
-    nj = ijk[1] // num_splits_y
-    nk = ijk[2] // num_splits_z
-
-    split_meshes = []
-    mesh_id = 1
-
-    for ix in range(num_splits_x):
-        for iy in range(num_splits_y):
-            for iz in range(num_splits_z):
-                xb_new = [
-                    x1 + ix * dx,
-                    x1 + (ix + 1) * dx,
-                    y1 + iy * dy,
-                    y1 + (iy + 1) * dy,
-                    z1 + iz * dz,
-                    z1 + (iz + 1) * dz
-                ]
-                ijk_new = [ni, nj, nk]
-                mesh = {
-                    'ID': f'Mesh{mesh_id:02d}',
-                    'IJK': ijk_new,
-                    'XB': xb_new
-                }
-                split_meshes.append(mesh)
-                mesh_id += 1
-
-    return split_meshes
+    meshes = []
+    consumed = 0
+
+    def counted():
+        nonlocal consumed
+        for line in lines:
+            consumed += 1
+            yield line
+
+    start = 0
+    for record in iter_namelists(counted()):
+        if record.name == 'MESH':
+            meshes.append((start, record))
+        start = consumed
+    return meshes
 
 def partition_fds_content(lines, partition_value, homogeneous=False):
     """
     Разбивает одну расчетную область FDS файла на несколько.
-    
+
     :param lines: Список строк FDS файла.
     :param partition_value: Желаемое количество разбиений.
     :param homogeneous: Если True, используется гомоморфное разбиение.
     :return: Модифицированное содержимое файла в виде списка строк.
     :raises ValueError: Если в файле нет MESH или он поврежден, или partition_value некорректно.
     """
-    mesh_line_indices = [i for i, line in enumerate(lines) if line.startswith('&MESH')]
-    if len(mesh_line_indices) != 1:
-        raise ValueError("Файл сценария .fds должен иметь только одну расчетную область")
-
-    original_mesh_line_index = mesh_line_indices[0]
-    original_mesh_line = lines[original_mesh_line_index]
-    
-    ijk_match = re.search(r'IJK=\s*(\d+),(\d+),(\d+)', original_mesh_line)
-    xb_match = re.search(r'XB=\s*([-+]?\d*\.?\d+),([-+]?\d*\.?\d+),([-+]?\d*\.?\d+),([-+]?\d*\.?\d+),([-+]?\d*\.?\d+),([-+]?\d*\.?\d+)', original_mesh_line)
-    
-    if not ijk_match or not xb_match:
-        raise ValueError("Не удалось найти значения IJK or XB. Убедитесь, что .fds файл не поврежден.")
-
-    ijk = list(map(int, ijk_match.groups()))
-    xb = list(map(float, xb_match.groups()))
-
-    original_mesh = {'IJK': ijk, 'XB': xb}
-    num_splits = partition_value
-
-    if num_splits <= 1:
-        raise ValueError("Число разбиений должно быть целым положительным и больше 1")
-
-    if homogeneous:
-        split_meshes = split_mesh_homo(original_mesh, num_splits)
-    else:
-        split_meshes = split_mesh(original_mesh, num_splits)
-        
-    mesh_lines = []
-    for mesh in split_meshes:
-        xb_new = mesh['XB']
-        ijk_new = mesh['IJK']
-        mesh_line = f"&MESH ID='{mesh['ID']}', IJK={ijk_new[0]},{ijk_new[1]},{ijk_new[2]}, XB={xb_new[0]},{xb_new[1]},{xb_new[2]},{xb_new[3]},{xb_new[4]},{xb_new[5]} /\n"
-        mesh_lines.append(mesh_line)
-    
-    # Replace the original MESH line with the new split meshes
-    modified_lines = lines[:original_mesh_line_index] + mesh_lines + lines[original_mesh_line_index + 1:]
-    return modified_lines
-
-def calculate_cs(xmin, xmax, imin):
-    """
-    Вычисляет размер ячейки (cell size) по одному направлению.
-    
-    :param xmin: Минимальная координата.
-    :param xmax: Максимальная координата.
-    :param imin: Количество ячеек в этом направлении.
-    :return: Размер ячейки.
-    """
-    if imin == 0:
-        return float('inf') # Avoid division by zero, indicates an invalid mesh
-    return (xmax - xmin) / imin
+    meshes = [mesh for _, mesh in mesh_records(lines)]
+    return rewrite_lines(lines, [partition_mesh_stage(meshes, partition_value, homogeneous)])
 
 def parse_fds_file_for_meshes_refine(contents):
     """
@@ -232,13 +86,10 @@ def parse_fds_file_for_meshes_refine(contents):
     total_cells = 0
     min_cs_value = float('inf')
 
-    for i, line in enumerate(contents):
-        match = re.search(r'&MESH\s.*?\bIJK=(\d+,\d+,\d+)\b.*?\bXB=([-\d\.]+,[-\d\.]+,[-\d\.]+,[-\d\.]+,[-\d\.]+,[-\d\.]+)\b', line)
-        if match:
-            IJK = match.group(1).split(',')
-            XB = match.group(2).split(',')
-            I, J, K = map(int, IJK)
-            Xmin, Xmax, Ymin, Ymax, Zmin, Zmax = map(float, XB)
+    for i, mesh in mesh_records(contents):
+        if mesh.ijk is not None and mesh.xb is not None:
+            I, J, K = mesh.ijk
+            Xmin, Xmax, Ymin, Ymax, Zmin, Zmax = mesh.xb
             
             cs_x = calculate_cs(Xmin, Xmax, I)
             cs_y = calculate_cs(Ymin, Ymax, J)
@@ -255,41 +106,19 @@ def parse_fds_file_for_meshes_refine(contents):
 
     return meshes_data, total_cells, min_cs_value, contents
 
-def refine_fds_meshes(contents, meshes_data, selected_mesh_indices, Csw):
+def refine_fds_meshes(contents, selected_mesh_indices, Csw):
     """
     Пересчитывает IJK для выбранных сеток на основе Csw и возвращает модифицированное содержимое FDS файла.
     Также обновляет файл IniDeltaZ.ini.
     
     :param contents: Список строк FDS файла.
-    :param meshes_data: Список кортежей с данными сеток (I, J, K, Xmin, ..., line_index).
-    :param selected_mesh_indices: Список индексов выбранных сеток из meshes_data.
+    :param selected_mesh_indices: Список индексов выбранных сеток из parse_fds_file_for_meshes_refine.
     :param Csw: Желаемое значение Cs.
     :return: Модифицированное содержимое файла в виде списка строк.
     :raises ValueError: Если Csw некорректно или нет выбранных сеток.
     """
-    if Csw <= 0:
-        raise ValueError("Значение Csw должно быть положительным!")
-    if not selected_mesh_indices:
-        raise ValueError("Выберите хотя бы одну расчётную область из списка.")
-
-    modified_contents = list(contents)
-
-    for index in selected_mesh_indices:
-        if index >= len(meshes_data):
-            continue 
-
-        I, J, K, Xmin, Xmax, Ymin, Ymax, Zmin, Zmax, line_index = meshes_data[index]
-        
-        Cs = min(calculate_cs(Xmin, Xmax, I), calculate_cs(Ymin, Ymax, J), calculate_cs(Zmin, Zmax, K))
-        
-        # Пересчитываем IJK, округляя до целого и обеспечивая минимум 1
-        new_I = max(1, int(round(I * (Cs / Csw))))
-        new_J = max(1, int(round(J * (Cs / Csw))))
-        new_K = max(1, int(round(K * (Cs / Csw))))
-        
-        original_mesh_line = contents[line_index].strip()
-        new_line = re.sub(r'IJK=\d+,\d+,\d+', f'IJK={new_I},{new_J},{new_K}', original_mesh_line)
-        modified_contents[line_index] = new_line + "\n"
+    meshes = [mesh for _, mesh in mesh_records(contents)]
+    modified_contents = rewrite_lines(contents, [refine_mesh_stage(meshes, selected_mesh_indices, Csw)])
 
     # Обновление IniDeltaZ.ini
     try:
@@ -297,24 +126,24 @@ def refine_fds_meshes(contents, meshes_data, selected_mesh_indices, Csw):
         parent_directory = os.path.abspath(os.path.join(current_directory, os.pardir))
         inis_path = os.path.join(parent_directory, 'inis')
         ini_delta_z_path = os.path.join(inis_path, 'IniDeltaZ.ini')
-        
+
         config = configparser.ConfigParser()
         if os.path.exists(ini_delta_z_path):
             config.read(ini_delta_z_path, encoding='utf-16')
-        
+
         if not config.has_section('deltaZ'):
             config.add_section('deltaZ')
-            
+
         config.set('deltaZ', 'deltaZ', str(Csw))
-        
+
         os.makedirs(inis_path, exist_ok=True)
-        
+
         with open(ini_delta_z_path, 'w', encoding='utf-16') as configfile:
             config.write(configfile)
 
     except Exception as e:
         print(f"Ошибка при обновлении IniDeltaZ.ini: {e}")
-        
+
     return modified_contents
 
 def merge_fds_meshes(contents, Csw=None):
@@ -328,115 +157,9 @@ def merge_fds_meshes(contents, Csw=None):
     :return: Модифицированное содержимое файла в виде списка строк.
     :raises ValueError: Если не найдены MESH записи.
     """
-    meshes_xb_only = []
-    all_mesh_lines_ijk_xb = []
-
-    lines = contents # Use the passed contents directly
-
-    for line in lines:
-        stripped_line = line.strip()
-        if stripped_line.startswith('&MESH'):
-            params = dict(re.findall(r'(\w+)=([^=\s/]+)', stripped_line))
-            if 'XB' in params:
-                try:
-                    xb = [float(val.strip()) for val in params['XB'].split(',')]
-                    meshes_xb_only.append(xb)
-                    if 'IJK' in params:
-                        ijk = [int(val.strip()) for val in params['IJK'].split(',')]
-                        all_mesh_lines_ijk_xb.append({'IJK': ijk, 'XB': xb})
-                except ValueError:
-                    pass
-    
-    if not meshes_xb_only:
-        raise ValueError("В файле не найдено записей &MESH для объединения!")
-
-    x_min = min(m[0] for m in meshes_xb_only)
-    x_max = max(m[1] for m in meshes_xb_only)
-    y_min = min(m[2] for m in meshes_xb_only)
-    y_max = max(m[3] for m in meshes_xb_only)
-    z_min = min(m[4] for m in meshes_xb_only)
-    z_max = max(m[5] for m in meshes_xb_only)
-
-    effective_csw = Csw
-    if effective_csw is None:
-        min_cs = []
-        for mesh_data in all_mesh_lines_ijk_xb:
-            ijk = mesh_data['IJK']
-            xb = mesh_data['XB']
-            # Ensure no division by zero if IJK is 0 for some reason
-            cs_x = (xb[1] - xb[0]) / ijk[0] if ijk[0] != 0 else float('inf')
-            cs_y = (xb[3] - xb[2]) / ijk[1] if ijk[1] != 0 else float('inf')
-            cs_z = (xb[5] - xb[4]) / ijk[2] if ijk[2] != 0 else float('inf')
-            
-            current_min_cs = min(cs_x, cs_y, cs_z)
-            if current_min_cs != float('inf'): # Only add valid Cs values
-                min_cs.append(current_min_cs)
-        effective_csw = min(min_cs) if min_cs else 0.1
-
-    if effective_csw <= 0:
-        raise ValueError("Вычисленное или заданное значение Csw должно быть положительным.")
-
-    i = max(1, int(round((x_max - x_min) / effective_csw)))
-    j = max(1, int(round((y_max - y_min) / effective_csw)))
-    k = max(1, int(round((z_max - z_min) / effective_csw)))
-
-    new_mesh_line = (
-        f"&MESH IJK={i},{j},{k}, XB={x_min:.4f},{x_max:.4f},"
-        f"{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f}/\n"
-    )
-
-    vent_faces_to_open = {
-        'xmin': False, 'xmax': False,
-        'ymin': False, 'ymax': False,
-        'zmin': False, 'zmax': False
-    }
-
-    new_fds_lines = []
-    mesh_line_inserted = False
-
-    for line in lines:
-        stripped_line = line.strip()
-        if stripped_line.startswith('&MESH'):
-            if not mesh_line_inserted:
-                new_fds_lines.append(new_mesh_line)
-                mesh_line_inserted = True
-            continue
-        elif stripped_line.startswith('&VENT'):
-            if "SURF_ID='OPEN'" in stripped_line or 'SURF_ID="OPEN"' in stripped_line:
-                params = dict(re.findall(r'(\w+)=([^=\s/]+)', stripped_line))
-                if 'XB' in params:
-                    try:
-                        xb_vent = [float(val.strip()) for val in params['XB'].split(',')]
-                        tol = 1e-6
-                        if abs(xb_vent[0] - xb_vent[1]) < tol:
-                            if abs(xb_vent[0] - x_min) < tol: vent_faces_to_open['xmin'] = True
-                            elif abs(xb_vent[0] - x_max) < tol: vent_faces_to_open['xmax'] = True
-                        elif abs(xb_vent[2] - xb_vent[3]) < tol:
-                            if abs(xb_vent[2] - y_min) < tol: vent_faces_to_open['ymin'] = True
-                            elif abs(xb_vent[2] - y_max) < tol: vent_faces_to_open['ymax'] = True
-                        elif abs(xb_vent[4] - xb_vent[5]) < tol:
-                            if abs(xb_vent[4] - z_min) < tol: vent_faces_to_open['zmin'] = True
-                            elif abs(xb_vent[4] - z_max) < tol: vent_faces_to_open['zmax'] = True
-                    except ValueError:
-                        pass
-            continue
-        new_fds_lines.append(line)
-
-    new_vent_lines = []
-    if vent_faces_to_open['xmin']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_min:.4f},{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
-    if vent_faces_to_open['xmax']: new_vent_lines.append(f"&VENT XB={x_max:.4f},{x_max:.4f},{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
-    if vent_faces_to_open['ymin']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_min:.4f},{y_min:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
-    if vent_faces_to_open['ymax']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_max:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
-    if vent_faces_to_open['zmin']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_min:.4f} SURF_ID='OPEN'/\n")
-    if vent_faces_to_open['zmax']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_min:.4f},{y_max:.4f},{z_max:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
+    records = [record for record in iter_namelists(contents) if record.name in ('MESH', 'VENT')]
+    return rewrite_lines(contents, [merge_mesh_stage(records, Csw)])
 
-    try:
-        insert_index = new_fds_lines.index(new_mesh_line) + 1
-        new_fds_lines[insert_index:insert_index] = new_vent_lines
-    except ValueError:
-        new_fds_lines.extend(new_vent_lines)
-            
-    return new_fds_lines
 
 from PyQt6.QtCore import Qt, QSize, pyqtSignal
 
@@ -526,12 +249,14 @@ class FDSFileSelectionWidget(QWidget):
     def _read_fds_file(self, file_path):
         """
         Чтение содержимого FDS файла.
+        Файл читается побайтово (FDS_ENCODING), поэтому UTF-8 и cp1251 сохраняются при записи без изменений.
+        Сжатые .fds.gz / .fds.xz распаковываются при чтении.
         
         :param file_path: Путь к FDS файлу.
         :return: Список строк файла.
         :raises FileNotFoundError: Если FDS файл не найден.
         """
-        with open(file_path, 'r', encoding='utf-8') as file:
+        with open_fds(file_path) as file:
             lines = file.readlines()
         return lines
 
@@ -549,7 +274,7 @@ class FDSFileSelectionWidget(QWidget):
         try:
             if self.process_id is None:
                 # Если ProcessID не был предоставлен, открываем QFileDialog для выбора файла
-                fds_file_path, _ = QFileDialog.getOpenFileName(self, "Открыть FDS файл", "", "FDS Files (*.fds);;All Files (*)")
+                fds_file_path, _ = QFileDialog.getOpenFileName(self, "Открыть FDS файл", "", "FDS Files (*.fds *.fds.gz *.fds.xz);;All Files (*)")
                 if fds_file_path and os.path.exists(fds_file_path):
                     fds_lines = self._read_fds_file(fds_file_path)
                     self.file_path_label.setText(os.path.basename(fds_file_path))
@@ -605,6 +330,68 @@ class FDSFileSelectionWidget(QWidget):
             
         return loaded_successfully
 
+class FdsFileWatcher(QObject):
+    """
+    Следит за .fds файлом, открытым в окне, и сообщает об изменениях,
+    сделанных другими программами (PyroSim, текстовый редактор).
+
+    Изменение определяется по индексу файла (refresh_index): заново разбирается
+    только изменённый участок, сигнал file_changed передаёт IndexChange.
+    Каталог файла тоже отслеживается, так как редакторы и atomic_write
+    заменяют файл новым, и наблюдение за старым путём прекращается.
+    """
+    file_changed = pyqtSignal(object)
+    DEBOUNCE_MS = 300
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.index = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._schedule)
+        self.watcher.directoryChanged.connect(self._schedule)
+        # Редакторы сохраняют файл в несколько операций - проверка выполняется после паузы
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(self._refresh)
+
+    def watch(self, file_path):
+        """Начинает наблюдение за файлом (предыдущий файл больше не отслеживается)."""
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        # Индекс строится в этом процессе (workers=1): пул процессов в GUI не запускается
+        self.index = load_index(file_path, workers=1)
+        self.watcher.addPath(os.path.dirname(os.path.abspath(file_path)))
+        self._rewatch()
+
+    def sync(self):
+        """Обновляет индекс после записи файла самим приложением, без сигнала file_changed."""
+        if self.index is not None:
+            self.index, _ = refresh_index(self.index, workers=1)
+            self._rewatch()
+
+    def _rewatch(self):
+        file_path = self.index.fds_path
+        if os.path.exists(file_path) and file_path not in self.watcher.files():
+            self.watcher.addPath(file_path)
+
+    def _schedule(self, _path):
+        self.timer.start()
+
+    def _refresh(self):
+        if self.index is None or not os.path.exists(self.index.fds_path):
+            return
+        self._rewatch()
+        try:
+            self.index, change = refresh_index(self.index, workers=1)
+        except OSError:
+            # Файл ещё записывается - проверка повторится при следующем изменении
+            return
+        if change is not None:
+            self.file_changed.emit(change)
+
+
 class FDSMeshToolsApp(QMainWindow):
     def __init__(self, process_id=None):
         super().__init__()
@@ -635,6 +422,10 @@ class FDSMeshToolsApp(QMainWindow):
          
         self._setup_palette()
         self._setup_ui()
+
+        # Изменения файла другими программами подхватываются без полной перезагрузки
+        self.fds_watcher = FdsFileWatcher(self)
+        self.fds_watcher.file_changed.connect(self._handle_external_change)
         
         # If process_id is provided, try to load the file automatically
         if self.process_id is not None:
@@ -647,6 +438,23 @@ class FDSMeshToolsApp(QMainWindow):
             # If no process_id, always show the widget for manual file selection
             self.fds_file_selection_widget.show()
         
+    def _handle_external_change(self, change):
+        """
+        Обновляет строки файла и зависящие от них виды после изменения файла другой программой.
+
+        Строки заменяются только на изменённом участке; список сеток перестраивается,
+        если изменились &MESH или сместились номера строк.
+        """
+        lines = patch_lines(self.fds_lines, self.fds_file_path, change)
+        if lines is None:
+            lines = self.fds_file_selection_widget._read_fds_file(self.fds_file_path)
+        line_shift = len(lines) != len(self.fds_lines)
+        self.fds_lines = lines
+        if 'MESH' in change.names or line_shift:
+            self._handle_file_selected(self.fds_file_path, lines)
+        names = ', '.join(sorted(change.names)) or '-'
+        self.statusBar.showMessage(f"Файл изменён другой программой, обновлено: {names}")
+
     def _setup_palette(self):
         """Установка цветовой палитры для приложения."""
         palette = QPalette()
@@ -933,9 +741,11 @@ class FDSMeshToolsApp(QMainWindow):
         """
         self.fds_file_path = file_path
         self.fds_lines = fds_lines
+        if file_path and (self.fds_watcher.index is None or self.fds_watcher.index.fds_path != file_path):
+            self.fds_watcher.watch(file_path)
         
         if file_path and fds_lines:
-            if any(line.strip().startswith('&MESH') for line in fds_lines):
+            if load_index(file_path, workers=1).has('MESH'):
                 self.partition_entry.setEnabled(True)
                 self.partition_button.setEnabled(True)
                 self.parse_file_refine(file_path, fds_lines) # Call to update Refine tab
@@ -1035,6 +845,7 @@ class FDSMeshToolsApp(QMainWindow):
 
             if modified_lines is not None:
                 write_fds_file(self.fds_file_path, modified_lines)
+                self.fds_watcher.sync()
                 QMessageBox.information(self, "Успех!", f"Расчетная область поделена на {partition_value} частей.")
                 self.parse_file_refine(self.fds_file_path, modified_lines)
         except ValueError as ve:
@@ -1102,10 +913,11 @@ class FDSMeshToolsApp(QMainWindow):
                 QMessageBox.warning(self, "Ошибка", "Файл FDS не загружен.")
                 return
                 
-            modified_contents = refine_fds_meshes(self.fds_lines, self.meshes, selected_indices, Csw)
+            modified_contents = refine_fds_meshes(self.fds_lines, selected_indices, Csw)
             
             if modified_contents is not None:
                 write_fds_file(self.fds_file_path, modified_contents)
+                self.fds_watcher.sync()
                 QMessageBox.information(self, "Успех!", "Расчётные области преобразованы и сохранены.")
                 # Перезагрузить файл, передавая текущие lines
                 self.parse_file_refine(self.fds_file_path, modified_contents)
@@ -1134,6 +946,7 @@ class FDSMeshToolsApp(QMainWindow):
             
             if modified_contents is not None:
                 write_fds_file(self.fds_file_path, modified_contents)
+                self.fds_watcher.sync()
                 QMessageBox.information(self, "Успех!", "MESH и VENT объединены!")
                 # Перезагрузить файл, передавая текущие lines
                 self.parse_file_refine(self.fds_file_path, modified_contents)
@@ -1152,16 +965,51 @@ class FDSMeshToolsApp(QMainWindow):
         """
         self.refine_list_widget.clearSelection()
 
+def patch_lines(lines, file_path, change):
+    """
+    Заменяет в списке строк файла только строки изменённого участка.
+
+    :param lines: Строки файла до изменения (как возвращает _read_fds_file).
+    :param file_path: Путь к FDS файлу.
+    :param change: IndexChange из refresh_index.
+    :return: Новый список строк или None, если строки не соответствуют старому файлу
+             (тогда файл нужно прочитать целиком).
+    """
+    with open_fds(file_path, 'rb') as f:
+        # Строки хранят исходные переводы строки и байты (FDS_ENCODING), поэтому длина строки - её размер в байтах
+        offset = 0
+        start_line = end_line = None
+        for number, line in enumerate(lines):
+            if offset == change.start:
+                start_line = number
+            if offset == change.old_end:
+                end_line = number
+                break
+            offset += len(line)
+        else:
+            if offset == change.old_end:
+                end_line = len(lines)
+            if offset == change.start:
+                start_line = len(lines)
+        if start_line is None or end_line is None:
+            return None
+        f.seek(change.start)
+        data = f.read(change.new_end - change.start)
+    middle = io.StringIO(data.decode(FDS_ENCODING), newline='').readlines()
+    return lines[:start_line] + middle + lines[end_line:]
+
+
 def write_fds_file(file_path: str, contents: list):
     """
-    Записывает содержимое в указанный FDS-файл, создавая необходимые директории.
+    Атомарно записывает содержимое в указанный FDS-файл, создавая необходимые директории.
+    Предыдущая версия файла сохраняется снимком (fds_snapshot).
     
     :param file_path: Путь к файлу.
     :param contents: Список строк для записи.
     """
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
+        take_snapshot(file_path, "MESH")
+        with atomic_write(file_path, encoding=FDS_ENCODING) as f:
             f.writelines(contents)
     except Exception as e:
         QMessageBox.critical(None, "Ошибка записи файла", f"Не удалось записать файл: {e}")
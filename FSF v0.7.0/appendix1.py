@@ -0,0 +1,147 @@
+"""
+Расчёт параметров пожара по Приложению 1 Методики 1140 без графического интерфейса.
+
+    tmax   = √(k·Fpom / (π·v²))              время достижения максимальной площади, с
+    Stt    = π·(v·tmax)²                     площадь, охватываемая пожаром за tmax, м²
+    Psi    = ψуд·Stt                         скорость выгорания (MLRPUA для &SURF)
+    bigM   = Psi·tmax                        масса сгоревшей нагрузки, кг
+             (если задана m: bigM = m, Psi = m / tmax;
+              FDS5 без m: Psi = 0.45/k · bigM / tmax)
+    HRRPUA = Hc · Psi · 0.93 · 1000          Hc = HEAT_OF_COMBUSTION / 1000
+    TAU_Q  = -tmax
+
+calculate() считает одно помещение с полной точностью (без округления до
+4 знаков, как в полях ввода); calculate_arrays() - массивы помещений NumPy
+за один вызов (поэлементно, с трансляцией размерностей).
+"""
+from dataclasses import asdict, dataclass
+from math import pi, sqrt
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIALECTS = ('fds6', 'fds5')
+COMBUSTION_EFFICIENCY = 0.93
+FDS5_PSI_FACTOR = 0.45
+
+
+@dataclass(frozen=True)
+class RoomInput:
+    """
+    Исходные данные помещения.
+
+    k: коэффициент k; Fpom: площадь помещения с очагом пожара, м²;
+    v: линейная скорость распространения пламени, м/с;
+    psi_ud: удельная массовая скорость выгорания, кг/(с·м²);
+    m: полная масса сгораемой нагрузки, кг (0 - по ψуд);
+    hoc: теплота сгорания HEAT_OF_COMBUSTION, кДж/кг;
+    dialect: 'fds6' или 'fds5'.
+    """
+    k: float
+    Fpom: float
+    v: float
+    psi_ud: float
+    m: float = 0.0
+    hoc: float = 0.0
+    dialect: str = 'fds6'
+
+
+@dataclass(frozen=True)
+class FireParameters:
+    """Результат расчёта: tmax, с; Psi (MLRPUA); Stt, м²; bigM, кг; HRRPUA, кВт/м²."""
+    tmax: float
+    Psi: float
+    Stt: float
+    bigM: float
+    HRRPUA: float
+
+    @property
+    def TAU_Q(self) -> float:
+        return -self.tmax
+
+    def as_dict(self) -> dict:
+        """Словарь tmax, Psi, Stt, bigM, HRRPUA, TAU_Q."""
+        values = asdict(self)
+        values['TAU_Q'] = self.TAU_Q
+        return values
+
+
+def hrrpua(hoc: float, Psi: float) -> float:
+    """
+    Мощность тепловыделения на единицу площади HRRPUA, кВт/м².
+
+    :param hoc: Теплота сгорания HEAT_OF_COMBUSTION, кДж/кг.
+    :param Psi: Скорость выгорания (MLRPUA).
+    """
+    return hoc / 1000 * Psi * COMBUSTION_EFFICIENCY * 1000
+
+
+def _check_dialect(dialect):
+    if dialect not in DIALECTS:
+        raise ValueError(f"Неизвестный dialect '{dialect}'")
+
+
+def calculate(room: RoomInput) -> FireParameters:
+    """
+    Параметры пожара для одного помещения.
+
+    :param room: Исходные данные.
+    :return: FireParameters.
+    :raises ValueError: При неизвестном dialect или отрицательном подкоренном выражении.
+    :raises ZeroDivisionError: При v = 0.
+    """
+    _check_dialect(room.dialect)
+    k, v, m = room.k, room.v, room.m
+    tmax = sqrt((k * room.Fpom) / (pi * v**2))
+    Stt = pi * (v * tmax)**2
+    Psi = room.psi_ud * Stt
+
+    if m > 0:
+        Psi = m / tmax
+        bigM = m
+    else:
+        bigM = Psi * tmax
+        if room.dialect == 'fds5':
+            Psi = FDS5_PSI_FACTOR * (1 / k) * (bigM / tmax)
+    return FireParameters(tmax, Psi, Stt, bigM, hrrpua(room.hoc, Psi))
+
+
+def calculate_fire_parameters(k, Fpom, v, psi_ud, m, hoc, dialect='fds6'):
+    """
+    Параметры пожара по отдельным значениям (см. RoomInput).
+
+    :return: Словарь tmax, Psi, Stt, bigM, HRRPUA, TAU_Q.
+    """
+    return calculate(RoomInput(k, Fpom, v, psi_ud, m, hoc, dialect)).as_dict()
+
+
+def calculate_arrays(k, Fpom, v, psi_ud, m=0.0, hoc=0.0, dialect='fds6'):
+    """
+    Параметры пожара для массивов помещений (NumPy, поэлементно).
+
+    Аргументы - числа или массивы совместимых размерностей. Некорректные
+    исходные данные (v = 0, отрицательное подкоренное выражение) дают nan/inf
+    в соответствующих элементах без исключения.
+
+    :param dialect: 'fds6' или 'fds5' для всех помещений.
+    :return: Словарь массивов tmax, Psi, Stt, bigM, HRRPUA, TAU_Q.
+    :raises ImportError: Если NumPy не установлен.
+    """
+    if np is None:
+        raise ImportError("Для calculate_arrays требуется NumPy")
+    _check_dialect(dialect)
+    k, Fpom, v, psi_ud, m, hoc = np.broadcast_arrays(*(np.asarray(value, dtype=float)
+                                                       for value in (k, Fpom, v, psi_ud, m, hoc)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tmax = np.sqrt((k * Fpom) / (pi * v**2))
+        Stt = pi * (v * tmax)**2
+        given = m > 0
+        Psi = psi_ud * Stt
+        bigM = np.where(given, m, Psi * tmax)
+        if dialect == 'fds5':
+            Psi = FDS5_PSI_FACTOR * (1 / k) * (bigM / tmax)
+        Psi = np.where(given, m / tmax, Psi)
+        HRRPUA = hoc / 1000 * Psi * COMBUSTION_EFFICIENCY * 1000
+    return {'tmax': tmax, 'Psi': Psi, 'Stt': Stt, 'bigM': bigM, 'HRRPUA': HRRPUA, 'TAU_Q': -tmax}
@@ -0,0 +1,116 @@
+"""
+Чтение *_devc.csv файлов FDS группами строк.
+
+Файлы читаются по chunksize строк, поэтому память ограничена одной группой
+и накопленными рядами выбранных столбцов. Несколько файлов (*_devc.csv
+отдельных расчётов) могут читаться одновременно в batchsize процессах:
+файлы независимы, результаты объединяются в порядке списка файлов.
+
+Графические программы (INIT_md) читают файлы в потоках (processes=False):
+в собранном exe без multiprocessing.freeze_support() дочерний процесс
+пула повторно запускает GUI.
+"""
+import csv
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import islice
+
+from fds_stream import DEFAULT_BATCHSIZE, DEFAULT_CHUNKSIZE
+
+TIME_COLUMNS = ('Time', 'FDS Time')
+
+
+def _to_float(value):
+    """Число из ячейки CSV; пустые, некорректные значения и NaN заменяются на 0.0."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+def _read_header(f):
+    """
+    Читает заголовок CSV: строку единиц измерения (s, C, ...) FDS пропускает.
+
+    :param f: Открытый файл.
+    :return: Кортеж (csv.reader, список имён столбцов).
+    """
+    reader = csv.reader(f)
+    header = next(reader, [])
+    if any('/' in name for name in header):
+        # Первая строка - единицы измерения, имена столбцов во второй
+        header = next(reader, [])
+    return reader, [name.strip('"').strip() for name in header]
+
+
+def read_devc_csv(csv_file, columns, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Читает ряды (время, значение) выбранных столбцов *_devc.csv файла.
+
+    :param csv_file: Путь к CSV файлу.
+    :param columns: Имена столбцов (ID &DEVC); отсутствующие в файле пропускаются.
+    :param chunksize: Число строк, обрабатываемых за один шаг.
+    :return: Словарь {столбец: [(время, значение), ...]}.
+    """
+    data = {}
+    with open(csv_file, 'r', newline='') as f:
+        reader, header = _read_header(f)
+        positions = {name: i for i, name in enumerate(header)}
+        selected = [(name, positions[name]) for name in columns if name in positions]
+        time_index = next((positions[name] for name in TIME_COLUMNS if name in positions), None)
+        for name, _ in selected:
+            data[name] = []
+
+        for chunk in iter(lambda: list(islice(reader, chunksize)), []):
+            for row in chunk:
+                if time_index is None:
+                    time = 0.0
+                else:
+                    try:
+                        time = float(row[time_index])
+                    except (IndexError, ValueError):
+                        continue
+                for name, index in selected:
+                    data[name].append((time, _to_float(row[index]) if index < len(row) else 0.0))
+    return data
+
+
+def read_devc_csv_files(csv_files, columns, chunksize=DEFAULT_CHUNKSIZE, batchsize=DEFAULT_BATCHSIZE,
+                        progress=None, processes=True):
+    """
+    Читает несколько *_devc.csv файлов и объединяет ряды в порядке списка файлов.
+
+    :param csv_files: Список путей к CSV файлам.
+    :param columns: Имена столбцов (ID &DEVC).
+    :param chunksize: Число строк, обрабатываемых за один шаг.
+    :param batchsize: Число файлов, читаемых одновременно.
+    :param progress: Функция progress(done, total), вызываемая после чтения каждого файла.
+    :param processes: True - файлы читаются в пуле процессов, False - в пуле потоков
+                      (для вызова из GUI; progress вызывается в вызывающем потоке).
+    :return: Словарь {столбец: [(время, значение), ...]}.
+    """
+    columns = list(columns)
+    total = len(csv_files)
+    results = [None] * total
+    workers = min(batchsize, total)
+    if workers <= 1:
+        for i, csv_file in enumerate(csv_files):
+            results[i] = read_devc_csv(csv_file, columns, chunksize)
+            if progress is not None:
+                progress(i + 1, total)
+    else:
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool(max_workers=workers) as executor:
+            futures = {executor.submit(read_devc_csv, csv_file, columns, chunksize): i
+                       for i, csv_file in enumerate(csv_files)}
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress(done, total)
+
+    merged = {}
+    for data in results:
+        for name, values in data.items():
+            merged.setdefault(name, []).extend(values)
+    return merged
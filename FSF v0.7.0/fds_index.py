@@ -0,0 +1,599 @@
+"""
+Индекс namelist-групп .fds файла по смещениям в байтах.
+
+Индекс сохраняется рядом со сценарием (<файл>.fsfidx) и привязан к размеру,
+времени изменения и отпечатку содержимого файла. Пока файл не изменился,
+поиск &HEAD/CHID, &MESH или &DEVC выполняется чтением индекса и переходом
+по смещению, без полного просмотра сценария.
+
+Большие файлы индексируются параллельно: файл отображается в память (mmap),
+делится на части по границам namelist-групп и части просматриваются
+в пуле процессов; таблицы смещений частей объединяются по порядку.
+Пул запускается только из консольных программ; графические программы
+(Tu, INIT_md) передают workers=1, так как в собранном exe без
+multiprocessing.freeze_support() дочерний процесс повторно запускает GUI.
+Хэши блоков для частичного обновления считаются в том же проходе.
+
+После изменения файла (например, правки в PyroSim) индекс обновляется
+частично (refresh_index): по хэшам блоков файла определяется изменённый
+участок, и заново разбираются только namelist-группы этого участка.
+
+Для сжатых файлов (.fds.gz, .fds.xz) смещения относятся к распакованному
+содержимому. Записи читаются в порядке смещений одним проходом вперёд
+по потоку, поэтому выборка групп распаковывает файл не более одного раза.
+"""
+import bisect
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from fds_stream import FDS_ENCODING, READ_BUFFER_SIZE, atomic_write, compression_codec, decode_display, open_fds
+
+INDEX_VERSION = 2
+INDEX_SUFFIX = '.fsfidx'
+FINGERPRINT_BLOCK = 1 << 16
+PARALLEL_SCAN_THRESHOLD = 64 << 20
+PARALLEL_CHUNK_SIZE = 16 << 20
+INDEX_BLOCK_SIZE = 1 << 20
+
+_NAME_RE = re.compile(rb'\s*&(\w+)')
+_ID_RE = re.compile(rb"\bID\s*=\s*['\"]([^'\"]*)['\"]")
+_CHID_RE = re.compile(rb"\bCHID\s*=\s*['\"]([^'\"]*)['\"]")
+_SPLIT_RE = re.compile(rb'\n[ \t]*&')
+
+
+def index_path(fds_path):
+    """Путь к файлу индекса для указанного .fds файла."""
+    return fds_path + INDEX_SUFFIX
+
+
+def file_fingerprint(fds_path):
+    """
+    Отпечаток содержимого файла: размер, время изменения и хэш начала и конца файла.
+
+    Хэш берётся по первым и последним FINGERPRINT_BLOCK байтам, поэтому
+    проверка актуальности индекса не требует чтения всего сценария.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Словарь {'size', 'mtime_ns', 'hash'}.
+    """
+    stat = os.stat(fds_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(stat.st_size).encode('ascii'))
+    with open(fds_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if stat.st_size > FINGERPRINT_BLOCK:
+            f.seek(max(FINGERPRINT_BLOCK, stat.st_size - FINGERPRINT_BLOCK))
+            digest.update(f.read())
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+
+
+def _block_digest(data=b''):
+    return hashlib.blake2b(data, digest_size=8)
+
+
+def block_hashes(fds_path, size):
+    """
+    Хэши блоков INDEX_BLOCK_SIZE, отсчитанных от начала и от конца файла.
+
+    Совпадающие начальные хэши старого и нового файла дают неизменённое начало,
+    совпадающие конечные - неизменённый конец (даже если размер файла изменился).
+    При построении индекса хэши считаются в том же проходе, что и разбор
+    (_HashingReader, _range_block_hashes).
+
+    :param fds_path: Путь к несжатому .fds файлу.
+    :param size: Размер файла.
+    :return: Список [хэши от начала, хэши от конца] (как в сохранённом индексе).
+    """
+    with open(fds_path, 'rb') as f:
+        reader = _HashingReader(f, size)
+        while reader.read(INDEX_BLOCK_SIZE):
+            pass
+    return reader.hashes()
+
+
+class _HashingReader(io.RawIOBase):
+    """
+    Последовательное чтение файла со счётом хэшей блоков (см. block_hashes) по прочитанным данным.
+
+    Блоки от начала заканчиваются на смещениях, кратных INDEX_BLOCK_SIZE, блоки
+    от конца - на смещениях, сравнимых с размером файла по модулю INDEX_BLOCK_SIZE.
+    """
+
+    def __init__(self, f, size):
+        self.f = f
+        self.head = []
+        self.tail = []
+        # [хэш текущего блока, байт до конца блока, список готовых хэшей]
+        self.states = [[_block_digest(), INDEX_BLOCK_SIZE, self.head],
+                       [_block_digest(), size % INDEX_BLOCK_SIZE or INDEX_BLOCK_SIZE, self.tail]]
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.f.readinto(buffer)
+        if n:
+            data = memoryview(buffer)[:n]
+            for state in self.states:
+                position = 0
+                while position < n:
+                    step = min(state[1], n - position)
+                    state[0].update(data[position:position + step])
+                    position += step
+                    state[1] -= step
+                    if state[1] == 0:
+                        state[2].append(state[0].hexdigest())
+                        state[0] = _block_digest()
+                        state[1] = INDEX_BLOCK_SIZE
+            self.count += n
+        return n
+
+    def hashes(self):
+        """Хэши после чтения всего файла: [от начала, от конца]."""
+        head = list(self.head)
+        if self.count % INDEX_BLOCK_SIZE:
+            head.append(self.states[0][0].hexdigest())
+        return [head, self.tail[::-1]]
+
+
+def _range_block_hashes(mm, start, end):
+    """
+    Хэши блоков (см. block_hashes), начинающихся в участке [start, end) отображённого файла.
+
+    :return: Кортеж ({номер блока от начала: хэш}, {номер блока от конца: хэш}).
+    """
+    size = len(mm)
+    head = {}
+    for number in range(-(-start // INDEX_BLOCK_SIZE), -(-end // INDEX_BLOCK_SIZE)):
+        block_start = number * INDEX_BLOCK_SIZE
+        head[number] = _block_digest(mm[block_start:block_start + INDEX_BLOCK_SIZE]).hexdigest()
+    tail = {}
+    number = max(0, (size - end) // INDEX_BLOCK_SIZE - 1)
+    while size - number * INDEX_BLOCK_SIZE > 0:
+        block_end = size - number * INDEX_BLOCK_SIZE
+        block_start = max(0, block_end - INDEX_BLOCK_SIZE)
+        if block_start < start:
+            break
+        if block_start < end:
+            tail[number] = _block_digest(mm[block_start:block_end]).hexdigest()
+        number += 1
+    return head, tail
+
+
+def _common_blocks(old, new):
+    """Число совпадающих хэшей в начале двух списков."""
+    count = 0
+    for old_hash, new_hash in zip(old, new):
+        if old_hash != new_hash:
+            break
+        count += 1
+    return count
+
+
+def _find_terminator(line, quote=None):
+    """Байтовый аналог fds_stream._find_terminator: индекс '/' вне кавычек."""
+    if quote is None and b"'" not in line and b'"' not in line:
+        return line.find(b'/'), None
+    for i, char in enumerate(line):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char == 0x27 or char == 0x22:
+            quote = char
+        elif char == 0x2F:
+            return i, None
+    return -1, quote
+
+
+def _record_id(name, data):
+    """Идентификатор записи: CHID для &HEAD, ID для остальных групп."""
+    match = (_CHID_RE if name == 'HEAD' else _ID_RE).search(data)
+    return decode_display(match.group(1)) if match else None
+
+
+def scan_namelists(f, start=0, include_text=False, open_tail=None):
+    """
+    Генератор namelist-групп открытого в двоичном режиме файла.
+
+    :param f: Файл, открытый в режиме 'rb' и установленный на позицию start.
+    :param start: Смещение начала чтения в байтах.
+    :param include_text: Выдавать также строки вне namelist как (None, смещение, длина, None).
+    :param open_tail: Если задан список, незавершённая в конце группа не выдаётся,
+                      а её смещение добавляется в список (для просмотра по частям).
+    :return: Генератор кортежей (имя, смещение, длина, ID).
+    """
+    offset = start
+    pending = None
+    quote = None
+    for line in f:
+        if pending is None:
+            match = _NAME_RE.match(line)
+            if not match:
+                if include_text:
+                    yield None, offset, len(line), None
+            else:
+                name = match.group(1).decode('ascii').upper()
+                record_start = offset
+                end, quote = _find_terminator(line[match.end():])
+                if end >= 0:
+                    yield name, record_start, len(line), _record_id(name, line)
+                else:
+                    pending = [line]
+        else:
+            pending.append(line)
+            end, quote = _find_terminator(line, quote)
+            if end >= 0:
+                data = b''.join(pending)
+                yield name, record_start, len(data), _record_id(name, data)
+                pending = None
+                quote = None
+        offset += len(line)
+
+    if pending is not None:
+        if open_tail is not None:
+            open_tail.append(record_start)
+            return
+        data = b''.join(pending)
+        yield name, record_start, len(data), _record_id(name, data)
+
+
+class FdsIndex:
+    """
+    Таблица смещений namelist-групп одного .fds файла.
+
+    entries: {имя группы: [[смещение, длина, ID], ...]} в порядке следования в файле.
+    blocks: хэши блоков файла (см. block_hashes) для частичного обновления или None.
+    """
+
+    def __init__(self, fds_path, fingerprint, entries, blocks=None):
+        self.fds_path = fds_path
+        self.fingerprint = fingerprint
+        self.entries = entries
+        self.blocks = blocks
+
+    def has(self, name):
+        """Есть ли в файле хотя бы одна группа name."""
+        return bool(self.entries.get(name))
+
+    def count(self, name):
+        """Количество групп name."""
+        return len(self.entries.get(name, ()))
+
+    def ids(self, name):
+        """Список ID групп name (None для групп без ID)."""
+        return [entry[2] for entry in self.entries.get(name, ())]
+
+    def find(self, name, record_id):
+        """Смещение и длина группы name с указанным ID или None."""
+        for offset, length, entry_id in self.entries.get(name, ()):
+            if entry_id == record_id:
+                return offset, length
+        return None
+
+    def read_records(self, *names, raw=False):
+        """
+        Читает текст групп с указанными именами, переходя по смещениям.
+
+        :param names: Имена групп ('HEAD', 'DEVC', ...).
+        :param raw: Выдавать текст в FDS_ENCODING (байт в байт), а не для отображения.
+        :return: Генератор кортежей (имя, текст записи) в порядке следования в файле.
+        """
+        decode = (lambda data: data.decode(FDS_ENCODING)) if raw else decode_display
+        selected = sorted((entry[0], entry[1], name) for name in names for entry in self.entries.get(name, ()))
+        if not selected:
+            return
+        with open_fds(self.fds_path, 'rb') as f:
+            for offset, length, name in selected:
+                f.seek(offset)
+                yield name, decode(f.read(length))
+
+    def chid(self):
+        """CHID из &HEAD или None."""
+        for record_id in self.ids('HEAD'):
+            if record_id:
+                return record_id
+        return None
+
+    def to_json(self):
+        return {'version': INDEX_VERSION, 'fingerprint': self.fingerprint, 'entries': self.entries,
+                'blocks': self.blocks}
+
+
+class IndexChange:
+    """
+    Изменённый участок файла, найденный refresh_index.
+
+    start - начало участка (начало строки, одинаковое в старом и новом файле);
+    old_end / new_end - конец участка в старом и новом файле (начало строки);
+    names - имена namelist-групп, записи которых в участке добавлены, удалены или изменены.
+    """
+
+    def __init__(self, start, old_end, new_end, names):
+        self.start = start
+        self.old_end = old_end
+        self.new_end = new_end
+        self.names = names
+
+
+class _MmapRange:
+    """Итератор строк участка [start, end) отображённого в память файла; end - начало строки."""
+
+    def __init__(self, mm, start, end):
+        self.mm = mm
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        mm = self.mm
+        mm.seek(self.start)
+        while mm.tell() < self.end:
+            yield mm.readline()
+
+
+def split_points(mm, parts):
+    """
+    Делит файл на части по границам namelist-групп.
+
+    Граница - начало строки, начинающейся с '&', ближайшей после равномерной
+    отметки. Незавершённая группа ('/' ещё не встретился) может содержать такую
+    строку - это обнаруживается при объединении частей (см. build_index).
+
+    :param mm: Отображённый в память файл.
+    :param parts: Желаемое число частей.
+    :return: Список смещений [0, ..., размер файла] без повторов.
+    """
+    size = len(mm)
+    points = [0]
+    for k in range(1, parts):
+        match = _SPLIT_RE.search(mm, max(points[-1], k * size // parts))
+        if match is None:
+            break
+        if match.start() + 1 > points[-1]:
+            points.append(match.start() + 1)
+    points.append(size)
+    return points
+
+
+def _scan_range(fds_path, start, end):
+    """
+    Просматривает участок файла (выполняется в процессе пула).
+
+    :return: Кортеж (entries части, смещение незавершённой в конце группы или None,
+             хэши блоков, начинающихся в участке - см. _range_block_hashes).
+    """
+    entries = {}
+    open_tail = []
+    with open(fds_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for name, offset, length, record_id in scan_namelists(_MmapRange(mm, start, end), start,
+                                                              open_tail=open_tail):
+            entries.setdefault(name, []).append([offset, length, record_id])
+        blocks = _range_block_hashes(mm, start, end)
+    return entries, open_tail[0] if open_tail else None, blocks
+
+
+def _scan_sequential(fds_path, start=0, size=None):
+    """
+    Просматривает файл с позиции start одним проходом.
+
+    :param size: Размер несжатого файла, если в том же проходе нужны хэши блоков (start = 0).
+    :return: Кортеж (entries, хэши блоков или None).
+    """
+    entries = {}
+    with open_fds(fds_path, 'rb') as f:
+        reader = None
+        if size is not None:
+            reader = _HashingReader(f, size)
+            f = io.BufferedReader(reader, READ_BUFFER_SIZE)
+        if start:
+            f.seek(start)
+        for name, offset, length, record_id in scan_namelists(f, start):
+            entries.setdefault(name, []).append([offset, length, record_id])
+        if reader is not None:
+            # Остаток после последней группы (строки вне namelist) тоже входит в хэши
+            while f.read(INDEX_BLOCK_SIZE):
+                pass
+    return entries, reader.hashes() if reader is not None else None
+
+
+def _scan_parallel(fds_path, size, workers):
+    """Просматривает файл по частям в пуле процессов и объединяет таблицы смещений и хэши блоков."""
+    with open(fds_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        points = split_points(mm, max(workers, size // PARALLEL_CHUNK_SIZE))
+    ranges = list(zip(points, points[1:]))
+    if len(ranges) < 2:
+        return _scan_sequential(fds_path, size=size)
+
+    entries = {}
+    head = {}
+    tail = {}
+    resumed = False
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        for part, open_start, (part_head, part_tail) in executor.map(
+                _scan_range, *zip(*((fds_path, start, end) for start, end in ranges))):
+            # Хэши блоков не зависят от границ групп и собираются со всех частей
+            head.update(part_head)
+            tail.update(part_tail)
+            if resumed:
+                continue
+            for name, part_entries in part.items():
+                entries.setdefault(name, []).extend(part_entries)
+            if open_start is not None:
+                # Граница попала внутрь незавершённой группы - остаток файла просматривается последовательно
+                for name, part_entries in _scan_sequential(fds_path, open_start)[0].items():
+                    entries.setdefault(name, []).extend(part_entries)
+                resumed = True
+    return entries, [[head[number] for number in sorted(head)], [tail[number] for number in sorted(tail)]]
+
+
+def build_index(fds_path, workers=None):
+    """
+    Строит индекс полным просмотром файла.
+
+    Несжатые файлы больше PARALLEL_SCAN_THRESHOLD просматриваются параллельно по частям.
+    Хэши блоков считаются при том же просмотре, файл повторно не читается.
+
+    :param fds_path: Путь к .fds файлу.
+    :param workers: Число процессов (по умолчанию - число ядер; 1 - без пула).
+    :return: FdsIndex.
+    """
+    fingerprint = file_fingerprint(fds_path)
+    workers = workers or os.cpu_count() or 1
+    compressed = compression_codec(fds_path) is not None
+    if compressed:
+        entries, blocks = _scan_sequential(fds_path)
+    elif workers > 1 and fingerprint['size'] >= PARALLEL_SCAN_THRESHOLD:
+        entries, blocks = _scan_parallel(fds_path, fingerprint['size'], workers)
+    else:
+        entries, blocks = _scan_sequential(fds_path, size=fingerprint['size'])
+    return FdsIndex(fds_path, fingerprint, entries, blocks)
+
+
+def _full_change(old, new):
+    """IndexChange для полностью перестроенного индекса."""
+    names = {name for name, items in old.entries.items() if items}
+    names.update(name for name, items in new.entries.items() if items)
+    return IndexChange(0, old.fingerprint['size'], new.fingerprint['size'], names)
+
+
+def refresh_index(index, save=True, workers=None):
+    """
+    Обновляет индекс после изменения файла, разбирая только изменённый участок.
+
+    Участок определяется сравнением хэшей блоков (block_hashes) с сохранёнными
+    в индексе. Разбор начинается с группы, в которую попадает начало участка,
+    и заканчивается на первой группе после участка, начало которой совпадает
+    с началом группы старого файла (со сдвигом на изменение размера) -
+    записи после неё переносятся из старого индекса со сдвигом смещений.
+
+    :param index: Текущий FdsIndex.
+    :param save: Сохранять ли обновлённый индекс рядом с файлом.
+    :param workers: Число процессов при полном перестроении (см. build_index).
+    :return: Кортеж (FdsIndex, IndexChange или None, если файл не изменился).
+    """
+    fds_path = index.fds_path
+    fingerprint = file_fingerprint(fds_path)
+    if fingerprint == index.fingerprint:
+        return index, None
+    if not index.blocks or compression_codec(fds_path) is not None:
+        new_index = build_index(fds_path, workers)
+        if save:
+            save_index(new_index)
+        return new_index, _full_change(index, new_index)
+
+    old_size = index.fingerprint['size']
+    new_size = fingerprint['size']
+    blocks = block_hashes(fds_path, new_size)
+    limit = min(old_size, new_size)
+    prefix = min(_common_blocks(index.blocks[0], blocks[0]) * INDEX_BLOCK_SIZE, limit)
+    suffix = min(_common_blocks(index.blocks[1], blocks[1]) * INDEX_BLOCK_SIZE, limit - prefix)
+    delta = new_size - old_size
+    old_end = old_size - suffix
+
+    # Начало разбора: группа, внутри которой находится prefix, либо начало строки с prefix
+    old_records = sorted((entry[0], entry[0] + entry[1]) for items in index.entries.values() for entry in items)
+    restart = None
+    position = bisect.bisect_left(old_records, (prefix + 1,)) - 1
+    if position >= 0 and old_records[position][1] > prefix:
+        restart = old_records[position][0]
+    with open(fds_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        if restart is None:
+            f.seek(max(0, prefix - INDEX_BLOCK_SIZE))
+            before = f.read(prefix - max(0, prefix - INDEX_BLOCK_SIZE))
+            newline = before.rfind(b'\n')
+            restart = prefix - len(before) + newline + 1 if newline >= 0 or prefix <= INDEX_BLOCK_SIZE else None
+        if restart is None:
+            new_index = build_index(fds_path, workers)
+            if save:
+                save_index(new_index)
+            return new_index, _full_change(index, new_index)
+
+        # Начала старых групп после изменённого участка - точки синхронизации
+        old_starts = {start for start, _ in old_records if start >= old_end}
+        scanned = {}
+        resync = None
+        f.seek(restart)
+        for name, offset, length, record_id in scan_namelists(f, restart):
+            if offset >= old_end + delta and offset - delta in old_starts:
+                resync = offset - delta
+                break
+            scanned.setdefault(name, []).append([offset, length, record_id])
+
+    entries = {}
+    names = set(scanned)
+    for name, items in index.entries.items():
+        starts = [entry[0] for entry in items]
+        head = bisect.bisect_left(starts, restart)
+        tail = len(items) if resync is None else bisect.bisect_left(starts, resync)
+        if tail > head:
+            names.add(name)
+        kept = items[:head] + scanned.get(name, [])
+        kept.extend([entry[0] + delta, entry[1], entry[2]] for entry in items[tail:])
+        if kept:
+            entries[name] = kept
+    for name, items in scanned.items():
+        entries.setdefault(name, items)
+
+    new_index = FdsIndex(fds_path, fingerprint, entries, blocks)
+    if save:
+        save_index(new_index)
+    change_end = new_size if resync is None else resync + delta
+    return new_index, IndexChange(restart, old_size if resync is None else resync, change_end, names)
+
+
+def save_index(index):
+    """Сохраняет индекс рядом с .fds файлом. Ошибки записи (например, диск только для чтения) игнорируются."""
+    try:
+        with atomic_write(index_path(index.fds_path)) as f:
+            json.dump(index.to_json(), f, ensure_ascii=False, separators=(',', ':'))
+    except OSError:
+        pass
+
+
+def saved_index(fds_path):
+    """
+    Сохранённый индекс .fds файла, если он актуален (без построения).
+
+    Индекс актуален, если совпадают размер, время изменения и отпечаток содержимого.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: FdsIndex или None.
+    """
+    fingerprint = file_fingerprint(fds_path)
+    try:
+        with open(index_path(fds_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == INDEX_VERSION and data.get('fingerprint') == fingerprint:
+            return FdsIndex(fds_path, fingerprint, data['entries'], data.get('blocks'))
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def load_index(fds_path, save=True, workers=None):
+    """
+    Возвращает актуальный индекс .fds файла.
+
+    Используется сохранённый индекс (saved_index); если его нет или он
+    устарел, индекс строится заново и сохраняется.
+
+    :param fds_path: Путь к .fds файлу.
+    :param save: Сохранять ли перестроенный индекс рядом с файлом.
+    :param workers: Число процессов при построении (см. build_index); графические
+                    программы передают 1 - пул процессов запускается только из
+                    консольных программ (fsf_batch), где есть защита __main__.
+    :return: FdsIndex.
+    """
+    index = saved_index(fds_path)
+    if index is not None:
+        return index
+
+    index = build_index(fds_path, workers)
+    if save:
+        save_index(index)
+    return index
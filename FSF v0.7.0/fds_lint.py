@@ -0,0 +1,171 @@
+"""
+Проверка .fds сценария за один проход перед отправкой на расчёт.
+
+Находит ошибки, на которых FDS останавливается при запуске:
+    MISSING_SURF   - &VENT/&OBST ссылается на несуществующий &SURF
+    UNUSED_FIRE    - &SURF с HRRPUA не назначен ни одному &VENT/&OBST
+    MISSING_CTRL   - &OBST/&VENT/&HOLE ссылается на несуществующий (удалённый) &CTRL
+    DUPLICATE_ID   - повторяющийся ID (&DEVC и &CTRL проверяются вместе)
+    MESH_OVERLAP   - пересекающиеся &MESH
+
+Группы, записанные в той же строке после '/' завершённой группы
+(&DEVC .../ &DEVC .../), проверяются как отдельные записи.
+
+Проверка оформлена стадией конвейера (LintStage): её можно добавить
+к стадиям SURF_FIX и проверить результат в том же проходе записи.
+
+Запуск:
+    python fds_lint.py scenario.fds [...]    (код возврата 1 - найдены ошибки)
+"""
+import sys
+
+from fds_records import _terminator
+from fds_stream import Stage, iter_namelists, open_fds, run_pipeline, to_display
+
+PREDEFINED_SURFACES = frozenset(('INERT', 'OPEN', 'MIRROR', 'PERIODIC', 'HVAC', 'MASSLESS TRACER'))
+SURF_REFERENCE_KEYS = ('SURF_ID', 'SURF_IDS', 'SURF_ID6')
+CTRL_REFERENCE_NAMES = ('OBST', 'VENT', 'HOLE')
+# Группы, ID которых FDS требует уникальными; &DEVC и &CTRL - одно пространство имён (INPUT_ID)
+UNIQUE_ID_NAMES = {'SURF': 'SURF', 'MATL': 'MATL', 'MESH': 'MESH', 'PROP': 'PROP', 'PART': 'PART',
+                   'SPEC': 'SPEC', 'DEVC': 'DEVC/CTRL', 'CTRL': 'DEVC/CTRL'}
+MESH_TOLERANCE = 1e-6
+
+
+def find_overlaps(meshes, tolerance=MESH_TOLERANCE):
+    """
+    Пары пересекающихся сеток (пересечение ненулевого объёма).
+
+    Сетки перебираются в порядке X1, сравниваются только сетки, перекрывающиеся по X.
+
+    :param meshes: Список кортежей (метка, [x1, x2, y1, y2, z1, z2]).
+    :param tolerance: Допуск, м (касание гранями пересечением не считается).
+    :return: Список пар меток.
+    """
+    ordered = sorted(meshes, key=lambda mesh: min(mesh[1][0], mesh[1][1]))
+    boxes = [(label, [sorted(xb[0:2]), sorted(xb[2:4]), sorted(xb[4:6])]) for label, xb in ordered]
+    overlaps = []
+    active = []
+    for label, box in boxes:
+        active = [item for item in active if item[1][0][1] > box[0][0] + tolerance]
+        for other_label, other in active:
+            if all(min(box[axis][1], other[axis][1]) - max(box[axis][0], other[axis][0]) > tolerance
+                   for axis in (1, 2)):
+                overlaps.append((other_label, label))
+        active.append((label, box))
+    return overlaps
+
+
+class LintStage(Stage):
+    """
+    Стадия проверки сценария: записи не изменяются, результат - в issues после close().
+
+    issues: список кортежей (код, сообщение) в порядке проверок.
+    """
+
+    def __init__(self):
+        self.issues = []
+        self.line = 1
+        self.surf_ids = set()
+        self.fire_surfaces = {}
+        self.surf_references = []
+        self.used_surfaces = set()
+        self.ctrl_ids = set()
+        self.ctrl_references = []
+        self.seen_ids = {}
+        self.meshes = []
+
+    def feed(self, record):
+        line = self.line
+        self.line += record.text.count('\n')
+        if record.name is not None:
+            self._check(record, line)
+        return (record,)
+
+    def _check(self, record, line):
+        name = record.name
+
+        record_id = record.get_str('ID')
+        if name == 'SURF' and record_id is not None:
+            self.surf_ids.add(record_id)
+            if record.has('HRRPUA'):
+                self.fire_surfaces.setdefault(record_id, line)
+        elif name == 'CTRL' and record_id is not None:
+            self.ctrl_ids.add(record_id)
+        elif name == 'MESH':
+            xb = record.xb
+            if xb is not None:
+                self.meshes.append((f"{to_display(record_id) if record_id else '&MESH'} (строка {line})", xb))
+
+        if name in ('VENT', 'OBST'):
+            for key in SURF_REFERENCE_KEYS:
+                for surf_id in record.get_strs(key):
+                    self.used_surfaces.add(surf_id)
+                    self.surf_references.append((name, surf_id, line))
+        if name in CTRL_REFERENCE_NAMES:
+            ctrl_id = record.get_str('CTRL_ID')
+            if ctrl_id is not None:
+                self.ctrl_references.append((name, ctrl_id, line))
+
+        namespace = UNIQUE_ID_NAMES.get(name)
+        if namespace is not None and record_id is not None:
+            # Сравнивается сама запись, а не строка: в одной строке может быть несколько групп
+            entry = (name, line)
+            first = self.seen_ids.setdefault((namespace, record_id), entry)
+            if first is not entry:
+                self.issues.append(('DUPLICATE_ID', f"&{name} ID='{to_display(record_id)}' (строка {line}) "
+                                                    f"повторяет &{first[0]} в строке {first[1]}"))
+
+        rest = record.text[_terminator(record.text) + 1:]
+        if rest.lstrip().startswith('&'):
+            for trailing in iter_namelists([rest]):
+                if trailing.name is not None:
+                    self._check(trailing, line)
+
+    def close(self):
+        for name, surf_id, line in self.surf_references:
+            if surf_id not in self.surf_ids and surf_id.upper() not in PREDEFINED_SURFACES:
+                self.issues.append(('MISSING_SURF', f"&{name} (строка {line}) ссылается на несуществующий "
+                                                    f"SURF_ID='{to_display(surf_id)}'"))
+        for surf_id, line in self.fire_surfaces.items():
+            if surf_id not in self.used_surfaces:
+                self.issues.append(('UNUSED_FIRE', f"&SURF ID='{to_display(surf_id)}' с HRRPUA (строка {line}) "
+                                                   f"не назначен ни одному &VENT/&OBST"))
+        for name, ctrl_id, line in self.ctrl_references:
+            if ctrl_id not in self.ctrl_ids:
+                self.issues.append(('MISSING_CTRL', f"&{name} (строка {line}) ссылается на несуществующий "
+                                                    f"CTRL_ID='{to_display(ctrl_id)}'"))
+        for first, second in find_overlaps(self.meshes):
+            self.issues.append(('MESH_OVERLAP', f"Сетки {first} и {second} пересекаются"))
+        return ()
+
+
+def lint_fds_file(fds_path):
+    """
+    Проверяет .fds файл за один проход чтения.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Список кортежей (код, сообщение); пустой, если ошибок нет.
+    """
+    stage = LintStage()
+    with open_fds(fds_path) as src:
+        for _ in run_pipeline(iter_namelists(src), [stage]):
+            pass
+    return stage.issues
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("Использование: python fds_lint.py scenario.fds [...]", file=sys.stderr)
+        return 2
+    failed = False
+    for fds_path in paths:
+        issues = lint_fds_file(fds_path)
+        for code, message in issues:
+            print(f"{fds_path}: {code}: {message}")
+        failed = failed or bool(issues)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Расчётные области (&MESH) .fds сценария: разбиение, пересчёт IJK и объединение.
+
+Преобразования оформлены стадиями конвейера fds_stream (MeshReplaceStage) и
+строятся по заранее прочитанным записям &MESH (read_mesh_records читает их по
+смещениям индекса fds_index, не разбирая весь файл). Поэтому их можно добавить
+к стадиям SURF_FIX и DEVC и подготовить сценарий за один проход записи:
+
+    stage = partition_mesh_stage(read_mesh_records(fds_path), 4)
+    prepare_scenario(fds_path, hrrpua, tau_q, mesh_stage=stage, marker_state="Done")
+
+Графическая программа Tu/gui_template.py применяет те же стадии к уже загруженным строкам файла.
+"""
+import math
+
+from fds_index import load_index
+from fds_records import make_record
+from fds_stream import MeshReplaceStage
+
+
+def find_best_factors(n):
+    """
+    Находит факторы числа n, которые обеспечивают сбалансированное деление по двум осям.
+    Вспомогательная функция для split_mesh.
+    """
+    best_factors = (1, n)
+    min_difference = float('inf')
+
+    for i in range(1, int(n**0.5) + 1):
+        if n % i == 0:
+            factor_x = i
+            factor_y = n // i
+            difference = abs(factor_x - factor_y)
+
+            if difference < min_difference:
+                min_difference = difference
+                best_factors = (factor_x, factor_y)
+
+    return best_factors
+
+
+def split_mesh(original_mesh, num_splits):
+    """
+    Разбивает одну расчетную область (mesh) на num_splits частей в плоскости XY.
+    
+    :param original_mesh: Словарь с данными оригинальной сетки (IJK, XB).
+    :param num_splits: Желаемое количество разбиений.
+    :return: Список словарей с данными новых сеток.
+    """
+    ijk = original_mesh['IJK']
+    xb = original_mesh['XB']
+    x1, x2, y1, y2, z1, z2 = xb
+
+    def divide_into_parts(length, parts):
+        part_length = length / parts
+        offsets = [i * part_length for i in range(parts)]
+        return offsets, [part_length] * parts
+
+    num_splits_x, num_splits_y = find_best_factors(num_splits)
+
+    x_offsets, dx_sizes = divide_into_parts(x2 - x1, num_splits_x)
+    y_offsets, dy_sizes = divide_into_parts(y2 - y1, num_splits_y)
+    
+    ni = max(1, ijk[0] // num_splits_x)
+    nj = max(1, ijk[1] // num_splits_y)
+
+    split_meshes = []
+    mesh_id = 1
+    for ix in range(num_splits_x):
+        for iy in range(num_splits_y):
+            xb_new = [
+                x1 + x_offsets[ix], x1 + x_offsets[ix] + dx_sizes[ix],
+                y1 + y_offsets[iy], y1 + y_offsets[iy] + dy_sizes[iy],
+                z1, z2
+            ]
+            ijk_new = [ni, nj, ijk[2]]
+            mesh = {
+                'ID': f'Mesh{mesh_id:02d}',
+                'IJK': ijk_new,
+                'XB': xb_new
+            }
+            split_meshes.append(mesh)
+            mesh_id += 1
+
+    return split_meshes
+
+
+def split_mesh_homo(original_mesh, num_splits):
+    """
+    Разбивает одну расчетную область (mesh) на num_splits частей,
+    стараясь сохранить гомоморфизм (пропорциональность) ячеек.
+    
+    :param original_mesh: Словарь с данными оригинальной сетки (IJK, XB).
+    :param num_splits: Желаемое количество разбиений.
+    :return: Список словарей с данными новых сеток.
+    :raises ValueError: Если num_splits <= 0.
+    """
+    ijk = original_mesh['IJK']
+    xb = original_mesh['XB']
+    x1, x2, y1, y2, z1, z2 = xb
+
+    if num_splits <= 0:
+        raise ValueError("num_splits must be greater than 0")
+
+    num_splits_z = 1 if ijk[2] < 4 else max(1, min(num_splits, 2))
+    remaining_splits = num_splits // num_splits_z
+
+    num_splits_x = max(1, int(math.sqrt(remaining_splits)))
+    num_splits_y = max(1, remaining_splits // num_splits_x)
+
+    # Корректировка факторов для достижения точного num_splits
+    while num_splits_x * num_splits_y * num_splits_z < num_splits:
+        if num_splits_y < num_splits_x:
+            num_splits_y += 1
+        else:
+            num_splits_x += 1
+
+    while num_splits_x * num_splits_y * num_splits_z > num_splits:
+        if num_splits_y > num_splits_x:
+            num_splits_y -= 1
+        else:
+            num_splits_x -= 1
+    
+    dx = (x2 - x1) / num_splits_x
+    dy = (y2 - y1) / num_splits_y
+    dz = (z2 - z1) / num_splits_z
+    
+    ni = ijk[0] // num_splits_x
+    nj = ijk[1] // num_splits_y
+    nk = ijk[2] // num_splits_z
+
+    split_meshes = []
+    mesh_id = 1
+
+    for ix in range(num_splits_x):
+        for iy in range(num_splits_y):
+            for iz in range(num_splits_z):
+                xb_new = [
+                    x1 + ix * dx,
+                    x1 + (ix + 1) * dx,
+                    y1 + iy * dy,
+                    y1 + (iy + 1) * dy,
+                    z1 + iz * dz,
+                    z1 + (iz + 1) * dz
+                ]
+                ijk_new = [ni, nj, nk]
+                mesh = {
+                    'ID': f'Mesh{mesh_id:02d}',
+                    'IJK': ijk_new,
+                    'XB': xb_new
+                }
+                split_meshes.append(mesh)
+                mesh_id += 1
+
+    return split_meshes
+
+
+def read_mesh_records(fds_path, names=('MESH',), workers=None):
+    """
+    Записи &MESH (и других групп names) .fds файла по индексу fds_index.
+
+    Читаются только записи этих групп, поэтому стадии MESH строятся без
+    отдельного чтения всего сценария (индекс строится, только если его нет или он устарел).
+
+    :param fds_path: Путь к .fds файлу.
+    :param names: Имена namelist-групп.
+    :param workers: Число процессов при построении индекса (см. fds_index.load_index).
+    :return: Список Record в порядке следования в файле.
+    """
+    index = load_index(fds_path, workers=workers)
+    return [make_record(name, text) for name, text in index.read_records(*names, raw=True)]
+
+
+def partition_mesh_stage(meshes, partition_value, homogeneous=False):
+    """
+    Стадия конвейера fds_stream, заменяющая единственную &MESH на разбитые области.
+
+    :param meshes: Записи &MESH файла (read_mesh_records).
+    :param partition_value: Желаемое количество разбиений.
+    :param homogeneous: Если True, используется гомоморфное разбиение.
+    :return: MeshReplaceStage.
+    :raises ValueError: Если в файле нет MESH или он поврежден, или partition_value некорректно.
+    """
+    if len(meshes) != 1:
+        raise ValueError("Файл сценария .fds должен иметь только одну расчетную область")
+
+    ijk = meshes[0].ijk
+    xb = meshes[0].xb
+    
+    if ijk is None or xb is None:
+        raise ValueError("Не удалось найти значения IJK or XB. Убедитесь, что .fds файл не поврежден.")
+
+    original_mesh = {'IJK': ijk, 'XB': xb}
+    num_splits = partition_value
+
+    if num_splits <= 1:
+        raise ValueError("Число разбиений должно быть целым положительным и больше 1")
+
+    if homogeneous:
+        split_meshes = split_mesh_homo(original_mesh, num_splits)
+    else:
+        split_meshes = split_mesh(original_mesh, num_splits)
+        
+    mesh_lines = []
+    for mesh in split_meshes:
+        xb_new = mesh['XB']
+        ijk_new = mesh['IJK']
+        mesh_line = f"&MESH ID='{mesh['ID']}', IJK={ijk_new[0]},{ijk_new[1]},{ijk_new[2]}, XB={xb_new[0]},{xb_new[1]},{xb_new[2]},{xb_new[3]},{xb_new[4]},{xb_new[5]} /\n"
+        mesh_lines.append(mesh_line)
+    
+    # Replace the original MESH line with the new split meshes
+    return MeshReplaceStage({0: ''.join(mesh_lines)})
+
+
+def calculate_cs(xmin, xmax, imin):
+    """
+    Вычисляет размер ячейки (cell size) по одному направлению.
+    
+    :param xmin: Минимальная координата.
+    :param xmax: Максимальная координата.
+    :param imin: Количество ячеек в этом направлении.
+    :return: Размер ячейки.
+    """
+    if imin == 0:
+        return float('inf') # Avoid division by zero, indicates an invalid mesh
+    return (xmax - xmin) / imin
+
+
+def refine_mesh_stage(meshes, selected_mesh_indices, Csw):
+    """
+    Стадия конвейера fds_stream, пересчитывающая IJK выбранных сеток на основе Csw.
+
+    :param meshes: Записи &MESH файла (read_mesh_records).
+    :param selected_mesh_indices: Список индексов выбранных сеток среди &MESH с IJK и XB
+                                  (в порядке следования, как в списке Refine/Coarsen).
+    :param Csw: Желаемое значение Cs.
+    :return: MeshReplaceStage.
+    :raises ValueError: Если Csw некорректно или нет выбранных сеток.
+    """
+    if Csw <= 0:
+        raise ValueError("Значение Csw должно быть положительным!")
+    if not selected_mesh_indices:
+        raise ValueError("Выберите хотя бы одну расчётную область из списка.")
+
+    # Порядковые номера &MESH, для которых заданы IJK и XB
+    ordinals = [ordinal for ordinal, mesh in enumerate(meshes) if mesh.ijk is not None and mesh.xb is not None]
+    replacements = {}
+
+    for index in selected_mesh_indices:
+        if index >= len(ordinals):
+            continue 
+
+        mesh = meshes[ordinals[index]]
+        I, J, K = mesh.ijk
+        Xmin, Xmax, Ymin, Ymax, Zmin, Zmax = mesh.xb
+        
+        Cs = min(calculate_cs(Xmin, Xmax, I), calculate_cs(Ymin, Ymax, J), calculate_cs(Zmin, Zmax, K))
+        
+        # Пересчитываем IJK, округляя до целого и обеспечивая минимум 1
+        new_I = max(1, int(round(I * (Cs / Csw))))
+        new_J = max(1, int(round(J * (Cs / Csw))))
+        new_K = max(1, int(round(K * (Cs / Csw))))
+        
+        original_mesh_line = mesh.text.strip()
+        new_line = make_record('MESH', original_mesh_line).with_param('IJK', f'{new_I},{new_J},{new_K}').text
+        replacements[ordinals[index]] = new_line + "\n"
+
+    return MeshReplaceStage(replacements)
+
+
+def merge_mesh_stage(records, Csw=None):
+    """
+    Стадия конвейера fds_stream, заменяющая все &MESH одной объединённой областью.
+    Все &VENT удаляются, а OPEN VENT на границах новой области добавляются после &MESH.
+
+    :param records: Записи &MESH и &VENT файла (read_mesh_records(fds_path, ('MESH', 'VENT'))).
+    :param Csw: Желаемое значение Cs. Если None, будет вычислено из существующих сеток.
+    :return: MeshReplaceStage.
+    :raises ValueError: Если не найдены MESH записи.
+    """
+    meshes_xb_only = []
+    all_mesh_lines_ijk_xb = []
+
+    for mesh in records:
+        if mesh.name == 'MESH' and mesh.xb is not None:
+            meshes_xb_only.append(mesh.xb)
+            if mesh.ijk is not None:
+                all_mesh_lines_ijk_xb.append({'IJK': mesh.ijk, 'XB': mesh.xb})
+    
+    if not meshes_xb_only:
+        raise ValueError("В файле не найдено записей &MESH для объединения!")
+
+    x_min = min(m[0] for m in meshes_xb_only)
+    x_max = max(m[1] for m in meshes_xb_only)
+    y_min = min(m[2] for m in meshes_xb_only)
+    y_max = max(m[3] for m in meshes_xb_only)
+    z_min = min(m[4] for m in meshes_xb_only)
+    z_max = max(m[5] for m in meshes_xb_only)
+
+    effective_csw = Csw
+    if effective_csw is None:
+        min_cs = []
+        for mesh_data in all_mesh_lines_ijk_xb:
+            ijk = mesh_data['IJK']
+            xb = mesh_data['XB']
+            # Ensure no division by zero if IJK is 0 for some reason
+            cs_x = (xb[1] - xb[0]) / ijk[0] if ijk[0] != 0 else float('inf')
+            cs_y = (xb[3] - xb[2]) / ijk[1] if ijk[1] != 0 else float('inf')
+            cs_z = (xb[5] - xb[4]) / ijk[2] if ijk[2] != 0 else float('inf')
+            
+            current_min_cs = min(cs_x, cs_y, cs_z)
+            if current_min_cs != float('inf'): # Only add valid Cs values
+                min_cs.append(current_min_cs)
+        effective_csw = min(min_cs) if min_cs else 0.1
+
+    if effective_csw <= 0:
+        raise ValueError("Вычисленное или заданное значение Csw должно быть положительным.")
+
+    i = max(1, int(round((x_max - x_min) / effective_csw)))
+    j = max(1, int(round((y_max - y_min) / effective_csw)))
+    k = max(1, int(round((z_max - z_min) / effective_csw)))
+
+    new_mesh_line = (
+        f"&MESH IJK={i},{j},{k}, XB={x_min:.4f},{x_max:.4f},"
+        f"{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f}/\n"
+    )
+
+    vent_faces_to_open = {
+        'xmin': False, 'xmax': False,
+        'ymin': False, 'ymax': False,
+        'zmin': False, 'zmax': False
+    }
+
+    for vent in records:
+        if vent.name == 'VENT' and vent.surf_id == 'OPEN':
+            xb_vent = vent.xb
+            if xb_vent is not None:
+                tol = 1e-6
+                if abs(xb_vent[0] - xb_vent[1]) < tol:
+                    if abs(xb_vent[0] - x_min) < tol: vent_faces_to_open['xmin'] = True
+                    elif abs(xb_vent[0] - x_max) < tol: vent_faces_to_open['xmax'] = True
+                elif abs(xb_vent[2] - xb_vent[3]) < tol:
+                    if abs(xb_vent[2] - y_min) < tol: vent_faces_to_open['ymin'] = True
+                    elif abs(xb_vent[2] - y_max) < tol: vent_faces_to_open['ymax'] = True
+                elif abs(xb_vent[4] - xb_vent[5]) < tol:
+                    if abs(xb_vent[4] - z_min) < tol: vent_faces_to_open['zmin'] = True
+                    elif abs(xb_vent[4] - z_max) < tol: vent_faces_to_open['zmax'] = True
+
+    new_vent_lines = []
+    if vent_faces_to_open['xmin']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_min:.4f},{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
+    if vent_faces_to_open['xmax']: new_vent_lines.append(f"&VENT XB={x_max:.4f},{x_max:.4f},{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
+    if vent_faces_to_open['ymin']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_min:.4f},{y_min:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
+    if vent_faces_to_open['ymax']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_max:.4f},{y_max:.4f},{z_min:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
+    if vent_faces_to_open['zmin']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_min:.4f},{y_max:.4f},{z_min:.4f},{z_min:.4f} SURF_ID='OPEN'/\n")
+    if vent_faces_to_open['zmax']: new_vent_lines.append(f"&VENT XB={x_min:.4f},{x_max:.4f},{y_min:.4f},{y_max:.4f},{z_max:.4f},{z_max:.4f} SURF_ID='OPEN'/\n")
+
+    # Первая &MESH заменяется объединённой областью с OPEN VENT, остальные удаляются
+    return MeshReplaceStage({0: new_mesh_line + ''.join(new_vent_lines)}, default='', drop_names=('VENT',))
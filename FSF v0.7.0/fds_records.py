@@ -0,0 +1,316 @@
+"""
+Типизированная модель записей .fds файла.
+
+Запись хранит исходный текст без изменений; параметры namelist-группы
+разбираются только при первом обращении (params, get(), xb, ...) и хранятся
+как позиции в тексте. Поэтому запись, параметры которой не читались,
+не создаёт словаря, а изменение параметра (with_param, without_param)
+затрагивает только его значение - остальной текст, включая пробелы,
+переносы строк и комментарии после '/', сохраняется как есть.
+
+    record = make_record('MESH', "&MESH ID='M1', IJK=10,10,10, XB=0,1,0,1,0,1 /\\n")
+    record.ijk                       # [10, 10, 10]
+    record.with_param('IJK', '20,20,20').text
+"""
+import re
+
+_HEAD_RE = re.compile(r'\s*&\w+')
+_TOKEN_RE = re.compile(r"'[^']*'?|\"[^\"]*\"?|[=/]")
+_KEY_RE = re.compile(r'([A-Za-z_]\w*(?:\s*\([^()]*\))?)\s*$')
+_SEPARATORS = ' \t\r\n,'
+_QUOTED_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+
+
+def parse_param_spans(text):
+    """
+    Разбирает параметры namelist-группы в позиции текста.
+
+    Ключ - имя параметра в верхнем регистре без пробелов (например, 'XB', 'MATL_ID(1,1)').
+    Значение - кортеж (начало ключа, начало значения, конец значения, начало следующего ключа).
+    Конец значения не включает завершающие запятые и пробелы; '=' и '/' внутри
+    кавычек не учитываются.
+
+    :param text: Текст записи.
+    :return: Словарь {ключ: позиции}; пустой, если текст не является namelist-группой.
+    """
+    match = _HEAD_RE.match(text)
+    if not match:
+        return {}
+    start = match.end()
+    end = len(text)
+    equals = []
+    for token in _TOKEN_RE.finditer(text, start):
+        char = token.group()
+        if char == '=':
+            equals.append(token.start())
+        elif char == '/':
+            end = token.start()
+            break
+
+    keys = []
+    boundary = start
+    for position in equals:
+        key_match = _KEY_RE.search(text, boundary, position)
+        if key_match:
+            keys.append((re.sub(r'\s+', '', key_match.group(1)).upper(), key_match.start(1), position + 1))
+        boundary = position + 1
+
+    spans = {}
+    for index, (key, key_start, value_start) in enumerate(keys):
+        next_start = keys[index + 1][1] if index + 1 < len(keys) else end
+        value_end = next_start
+        while value_end > value_start and text[value_end - 1] in _SEPARATORS:
+            value_end -= 1
+        while value_start < value_end and text[value_start] in ' \t\r\n':
+            value_start += 1
+        spans.setdefault(key, (key_start, value_start, value_end, next_start))
+    return spans
+
+
+def _terminator(text):
+    """Индекс завершающего '/' вне кавычек или длина текста."""
+    match = _HEAD_RE.match(text)
+    for token in _TOKEN_RE.finditer(text, match.end() if match else 0):
+        if token.group() == '/':
+            return token.start()
+    return len(text)
+
+
+def unquote(value):
+    """Снимает кавычки со строкового значения параметра."""
+    if value is not None and len(value) >= 2 and value[0] in '\'"' and value[-1] == value[0]:
+        return value[1:-1]
+    return value
+
+
+class Record:
+    """
+    Одна запись .fds файла: namelist-группа или строка текста вне группы.
+
+    Параметры разбираются лениво при первом обращении и кэшируются.
+    Методы with_param/without_param возвращают новую запись того же типа.
+    """
+    __slots__ = ('name', 'text', '_spans')
+
+    def __init__(self, name, text):
+        self.name = name  # 'SURF', 'VENT', ... или None для текста вне namelist
+        self.text = text  # исходный текст записи вместе с переводами строк
+        self._spans = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, {self.text!r})"
+
+    @property
+    def spans(self):
+        """Позиции параметров в тексте (см. parse_param_spans)."""
+        if self._spans is None:
+            self._spans = parse_param_spans(self.text) if self.name else {}
+        return self._spans
+
+    @property
+    def params(self):
+        """Словарь {параметр: исходное значение} (значения - строки без завершающих запятых)."""
+        text = self.text
+        return {key: text[span[1]:span[2]] for key, span in self.spans.items()}
+
+    def has(self, key):
+        """Задан ли параметр key."""
+        return key in self.spans
+
+    def get(self, key, default=None):
+        """Исходное значение параметра (строка как в файле) или default."""
+        span = self.spans.get(key)
+        if span is None:
+            return default
+        return self.text[span[1]:span[2]]
+
+    def get_str(self, key, default=None):
+        """Строковое значение параметра без кавычек."""
+        value = self.get(key)
+        return default if value is None else unquote(value)
+
+    def get_strs(self, key):
+        """Список строковых значений параметра без кавычек (SURF_IDS, INPUT_ID, ...); пустой, если параметра нет."""
+        value = self.get(key)
+        if value is None:
+            return []
+        return [single or double for single, double in _QUOTED_RE.findall(value)]
+
+    def get_floats(self, key):
+        """Список чисел параметра (XB, XYZ, ...) или None, если параметра нет или он некорректен."""
+        value = self.get(key)
+        if value is None:
+            return None
+        try:
+            return [float(item) for item in re.split(r'[\s,]+', value) if item]
+        except ValueError:
+            return None
+
+    def get_float(self, key, default=None):
+        """Числовое значение параметра или default."""
+        values = self.get_floats(key)
+        return values[0] if values and len(values) == 1 else default
+
+    def get_ints(self, key):
+        """Список целых значений параметра (IJK) или None."""
+        values = self.get_floats(key)
+        if values is None or any(value != int(value) for value in values):
+            return None
+        return [int(value) for value in values]
+
+    def with_param(self, key, value):
+        """
+        Запись с изменённым (или добавленным перед '/') значением параметра.
+
+        :param key: Имя параметра.
+        :param value: Новое значение в синтаксисе .fds (строки - в кавычках).
+        :return: Новая запись того же типа.
+        """
+        text = self.text
+        span = self.spans.get(key)
+        if span is not None:
+            return type(self)(self.name, text[:span[1]] + value + text[span[2]:])
+        end = _terminator(text)
+        head = text[:end].rstrip()
+        separator = ' ' if not self.spans or head.endswith(',') else ', '
+        return type(self)(self.name, f"{head}{separator}{key}={value}{text[len(head):]}")
+
+    def without_param(self, key):
+        """
+        Запись без параметра key (вместе с разделителем после значения).
+
+        :param key: Имя параметра.
+        :return: Новая запись того же типа; та же запись, если параметра нет.
+        """
+        span = self.spans.get(key)
+        if span is None:
+            return self
+        text = self.text
+        return type(self)(self.name, text[:span[0]] + text[span[3]:])
+
+
+class HeadRecord(Record):
+    """&HEAD: CHID и TITLE."""
+    __slots__ = ()
+
+    @property
+    def chid(self):
+        return self.get_str('CHID')
+
+    @property
+    def title(self):
+        return self.get_str('TITLE')
+
+
+class _XbRecord(Record):
+    """Запись с ID и координатами XB."""
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return self.get_str('ID')
+
+    @property
+    def xb(self):
+        """[x1, x2, y1, y2, z1, z2] или None."""
+        values = self.get_floats('XB')
+        return values if values is not None and len(values) == 6 else None
+
+
+class MeshRecord(_XbRecord):
+    """&MESH: ID, IJK, XB."""
+    __slots__ = ()
+
+    @property
+    def ijk(self):
+        """[I, J, K] или None."""
+        values = self.get_ints('IJK')
+        return values if values is not None and len(values) == 3 else None
+
+
+class SurfRecord(Record):
+    """&SURF: ID, HRRPUA, TAU_Q."""
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return self.get_str('ID')
+
+    @property
+    def hrrpua(self):
+        return self.get_float('HRRPUA')
+
+    @property
+    def tau_q(self):
+        return self.get_float('TAU_Q')
+
+
+class VentRecord(_XbRecord):
+    """&VENT: XB, SURF_ID, CTRL_ID."""
+    __slots__ = ()
+
+    @property
+    def surf_id(self):
+        return self.get_str('SURF_ID')
+
+    @property
+    def ctrl_id(self):
+        return self.get_str('CTRL_ID')
+
+
+class ObstRecord(_XbRecord):
+    """&OBST: XB, SURF_ID, CTRL_ID."""
+    __slots__ = ()
+
+    @property
+    def surf_id(self):
+        return self.get_str('SURF_ID')
+
+    @property
+    def ctrl_id(self):
+        return self.get_str('CTRL_ID')
+
+
+class DevcRecord(_XbRecord):
+    """&DEVC: ID, QUANTITY, XB, XYZ."""
+    __slots__ = ()
+
+    @property
+    def quantity(self):
+        return self.get_str('QUANTITY')
+
+    @property
+    def xyz(self):
+        values = self.get_floats('XYZ')
+        return values if values is not None and len(values) == 3 else None
+
+
+class InitRecord(_XbRecord):
+    """&INIT: XB, TEMPERATURE."""
+    __slots__ = ()
+
+    @property
+    def temperature(self):
+        return self.get_float('TEMPERATURE')
+
+
+RECORD_TYPES = {
+    'HEAD': HeadRecord,
+    'MESH': MeshRecord,
+    'SURF': SurfRecord,
+    'VENT': VentRecord,
+    'OBST': ObstRecord,
+    'DEVC': DevcRecord,
+    'INIT': InitRecord,
+}
+
+
+def make_record(name, text):
+    """
+    Создаёт запись подходящего типа по имени namelist-группы.
+
+    :param name: Имя группы ('SURF', ...) или None для текста вне namelist.
+    :param text: Исходный текст записи.
+    :return: Record или его подкласс из RECORD_TYPES.
+    """
+    return RECORD_TYPES.get(name, Record)(name, text)
@@ -0,0 +1,294 @@
+"""
+Снимки .fds файла перед перезаписью с дедупликацией по содержимому.
+
+Снимок делится на фрагменты по границам, зависящим только от содержимого
+(content-defined chunking): граница ставится после строки, CRC32 которой
+удовлетворяет маске CHUNK_MASK. Вставка или изменение нескольких строк
+(&SURF, &MESH) меняет только фрагменты вокруг них, остальные фрагменты
+совпадают с уже сохранёнными и повторно не записываются.
+
+Хранилище находится рядом со сценарием:
+    .fsf_snapshots/chunks/<2 символа>/<хэш>     фрагменты (zlib)
+    .fsf_snapshots/<имя файла>.json             список снимков файла
+
+Сжатые сценарии (.fds.gz, .fds.xz) сохраняются в распакованном виде
+и при восстановлении сжимаются заново.
+
+Снимки автоматически не удаляются: хранилище растёт с каждой перезаписью.
+Команда prune оставляет последние снимки файла (по умолчанию DEFAULT_KEEP)
+и удаляет фрагменты, на которые не ссылается ни один снимок хранилища
+(фрагменты общие для всех сценариев каталога). prune выполняется, когда
+сценарии каталога не перезаписываются.
+
+Запуск:
+    python fds_snapshot.py list scenario.fds
+    python fds_snapshot.py restore scenario.fds [ID]    (по умолчанию - последний снимок)
+    python fds_snapshot.py prune scenario.fds [--keep N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+
+from fds_stream import atomic_write, open_fds
+
+SNAPSHOT_DIR = '.fsf_snapshots'
+SNAPSHOT_VERSION = 1
+CHUNK_MASK = (1 << 9) - 1
+CHUNK_MIN_SIZE = 4 << 10
+CHUNK_MAX_SIZE = 1 << 20
+CHUNK_COMPRESS_LEVEL = 1
+DEFAULT_KEEP = 10
+
+
+def store_path(fds_path):
+    """Каталог хранилища снимков для .fds файла."""
+    return os.path.join(os.path.dirname(os.path.abspath(fds_path)), SNAPSHOT_DIR)
+
+
+def _manifest_path(fds_path):
+    return os.path.join(store_path(fds_path), os.path.basename(fds_path) + '.json')
+
+
+def _chunk_path(store, chunk_hash):
+    return os.path.join(store, 'chunks', chunk_hash[:2], chunk_hash)
+
+
+def iter_content_chunks(f):
+    """
+    Делит поток на фрагменты по границам, определяемым содержимым строк.
+
+    Граница ставится после строки с CRC32 & CHUNK_MASK == 0, если фрагмент не
+    короче CHUNK_MIN_SIZE, и принудительно по достижении CHUNK_MAX_SIZE
+    (строка не разрывается).
+
+    :param f: Файл, открытый в двоичном режиме.
+    :return: Генератор фрагментов (bytes).
+    """
+    lines = []
+    size = 0
+    for line in f:
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_MAX_SIZE or (size >= CHUNK_MIN_SIZE and not zlib.crc32(line) & CHUNK_MASK):
+            yield b''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield b''.join(lines)
+
+
+def load_snapshots(fds_path):
+    """
+    Список снимков файла (от старых к новым).
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Список словарей {'id', 'time', 'label', 'size', 'hash', 'stat', 'chunks'}.
+    """
+    try:
+        with open(_manifest_path(fds_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if data.get('version') != SNAPSHOT_VERSION:
+        return []
+    return data.get('snapshots', [])
+
+
+def _save_snapshots(fds_path, snapshots):
+    with atomic_write(_manifest_path(fds_path)) as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'snapshots': snapshots}, f, ensure_ascii=False, indent=1)
+
+
+def take_snapshot(fds_path, label=''):
+    """
+    Сохраняет снимок текущего содержимого файла.
+
+    Если файл не изменился с последнего снимка (размер и время изменения), снимок не создаётся.
+
+    :param fds_path: Путь к .fds файлу.
+    :param label: Описание операции, перед которой сделан снимок.
+    :return: Словарь снимка или None, если файла нет или он не изменился.
+    """
+    if not os.path.exists(fds_path):
+        return None
+    stat = os.stat(fds_path)
+    stat_key = [stat.st_size, stat.st_mtime_ns]
+    snapshots = load_snapshots(fds_path)
+    if snapshots and snapshots[-1].get('stat') == stat_key:
+        return None
+
+    store = store_path(fds_path)
+    digest = hashlib.blake2b(digest_size=16)
+    chunks = []
+    size = 0
+    with open_fds(fds_path, 'rb') as f:
+        for chunk in iter_content_chunks(f):
+            digest.update(chunk)
+            size += len(chunk)
+            chunk_hash = hashlib.blake2b(chunk, digest_size=16).hexdigest()
+            chunks.append(chunk_hash)
+            path = _chunk_path(store, chunk_hash)
+            if not os.path.exists(path):
+                with atomic_write(path, encoding=None) as dst:
+                    dst.write(zlib.compress(chunk, CHUNK_COMPRESS_LEVEL))
+
+    content_hash = digest.hexdigest()
+    if snapshots and snapshots[-1]['hash'] == content_hash:
+        # Содержимое не изменилось (например, файл только перезаписан) - обновляется только отметка
+        snapshots[-1]['stat'] = stat_key
+        _save_snapshots(fds_path, snapshots)
+        return None
+
+    snapshot = {
+        'id': snapshots[-1]['id'] + 1 if snapshots else 1,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'label': label,
+        'size': size,
+        'hash': content_hash,
+        'stat': stat_key,
+        'chunks': chunks,
+    }
+    snapshots.append(snapshot)
+    _save_snapshots(fds_path, snapshots)
+    return snapshot
+
+
+def restore_snapshot(fds_path, snapshot_id=None):
+    """
+    Восстанавливает файл из снимка.
+
+    Текущее содержимое предварительно сохраняется снимком, поэтому восстановление можно отменить.
+
+    :param fds_path: Путь к .fds файлу.
+    :param snapshot_id: ID снимка (None - последний).
+    :return: Восстановленный снимок.
+    :raises LookupError: Если снимок не найден.
+    :raises ValueError: Если фрагменты снимка повреждены.
+    """
+    snapshots = load_snapshots(fds_path)
+    if snapshot_id is None:
+        if not snapshots:
+            raise LookupError(f"Нет снимков для {fds_path}")
+        snapshot = snapshots[-1]
+    else:
+        snapshot = next((item for item in snapshots if item['id'] == snapshot_id), None)
+        if snapshot is None:
+            raise LookupError(f"Снимок {snapshot_id} не найден для {fds_path}")
+
+    take_snapshot(fds_path, f"перед восстановлением снимка {snapshot['id']}")
+    store = store_path(fds_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with atomic_write(fds_path, encoding=None) as dst:
+        for chunk_hash in snapshot['chunks']:
+            with open(_chunk_path(store, chunk_hash), 'rb') as f:
+                chunk = zlib.decompress(f.read())
+            digest.update(chunk)
+            dst.write(chunk)
+        if digest.hexdigest() != snapshot['hash']:
+            # Исключение до выхода из atomic_write - исходный файл не заменяется
+            raise ValueError(f"Снимок {snapshot['id']} повреждён")
+    return snapshot
+
+
+def collect_chunks(store):
+    """
+    Удаляет фрагменты, на которые не ссылается ни один снимок хранилища.
+
+    :param store: Каталог хранилища (store_path).
+    :return: Число удалённых фрагментов.
+    :raises ValueError: Если список снимков какого-либо файла не читается
+                        (ссылки неизвестны - фрагменты не удаляются).
+    """
+    chunks_dir = os.path.join(store, 'chunks')
+    if not os.path.isdir(chunks_dir):
+        return 0
+    referenced = set()
+    for name in os.listdir(store):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(store, name), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Не читается список снимков {name}: {e}")
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Неизвестная версия списка снимков {name}")
+        for snapshot in data.get('snapshots', []):
+            referenced.update(snapshot['chunks'])
+
+    removed = 0
+    for prefix in os.listdir(chunks_dir):
+        directory = os.path.join(chunks_dir, prefix)
+        for name in os.listdir(directory):
+            # Временные файлы atomic_write ('.<имя>.*.tmp') принадлежат идущей записи
+            if name.startswith('.') or name in referenced:
+                continue
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
+
+
+def prune_snapshots(fds_path, keep=DEFAULT_KEEP):
+    """
+    Оставляет keep последних снимков файла и удаляет ненужные фрагменты хранилища.
+
+    :param fds_path: Путь к .fds файлу.
+    :param keep: Число сохраняемых снимков (0 - удалить все снимки файла).
+    :return: Кортеж (число удалённых снимков, число удалённых фрагментов).
+    :raises ValueError: При отрицательном keep или нечитаемом списке снимков (см. collect_chunks).
+    """
+    if keep < 0:
+        raise ValueError(f"Число сохраняемых снимков не может быть отрицательным: {keep}")
+    snapshots = load_snapshots(fds_path)
+    removed = max(0, len(snapshots) - keep)
+    if removed:
+        _save_snapshots(fds_path, snapshots[removed:])
+    return removed, collect_chunks(store_path(fds_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Снимки .fds файлов: список, восстановление и очистка.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    list_parser = subparsers.add_parser('list', help="Показать снимки файла")
+    list_parser.add_argument('fds_path', help="Путь к .fds файлу")
+    restore_parser = subparsers.add_parser('restore', help="Восстановить файл из снимка")
+    restore_parser.add_argument('fds_path', help="Путь к .fds файлу")
+    restore_parser.add_argument('id', type=int, nargs='?', default=None, help="ID снимка (по умолчанию - последний)")
+    prune_parser = subparsers.add_parser('prune', help="Удалить старые снимки файла и ненужные фрагменты")
+    prune_parser.add_argument('fds_path', help="Путь к .fds файлу")
+    prune_parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                              help=f"Число сохраняемых последних снимков (по умолчанию {DEFAULT_KEEP})")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        snapshots = load_snapshots(args.fds_path)
+        if not snapshots:
+            print(f"Нет снимков для {args.fds_path}")
+        for snapshot in snapshots:
+            print(f"{snapshot['id']:>4}  {snapshot['time']}  {snapshot['size']:>12}  {snapshot['label']}")
+        return 0
+
+    if args.command == 'prune':
+        try:
+            removed, chunks = prune_snapshots(args.fds_path, args.keep)
+        except (ValueError, OSError) as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            return 1
+        print(f"Удалено снимков: {removed}, фрагментов: {chunks}")
+        return 0
+
+    try:
+        snapshot = restore_snapshot(args.fds_path, args.id)
+    except (LookupError, ValueError, OSError, zlib.error) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    print(f"Восстановлен снимок {snapshot['id']} ({snapshot['time']}) -> {args.fds_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,533 @@
+"""
+Перезапись .fds файла минимальными правками (splice).
+
+Стадии конвейера fds_stream применяются к каждой записи, но в результат
+попадают только изменённые записи - в виде правок (начало, конец, новые байты).
+Неизменённые участки файла копируются блоками без разбора на строки:
+через os.copy_file_range (на файловых системах с reflink - без копирования
+данных) либо срезами отображённого в память (mmap) файла.
+
+Те же правки используются для предпросмотра (preview_surf_fix): unified diff
+строится только по изменённым записям и их контексту, файл не перезаписывается.
+
+Сжатый сценарий (.fds.gz, .fds.xz) распаковывается во временный файл, который
+отображается в память; результат сжимается заново потоком при записи.
+"""
+import bisect
+import difflib
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from fds_index import saved_index, scan_namelists
+from fds_records import make_record
+from fds_stream import (FDS_ENCODING, FIX_DIGEST_FILTERS, FIX_DIGEST_NAMES, MARKER_TAIL_SIZE, PRUNABLE_NAMES,
+                        CheckMarkerStage, ReferenceGraph, atomic_write, close_stages, compression_codec,
+                        decode_display, feed_stages, fix_records_digest, open_fds, read_check_hash,
+                        rewrite_fds_file, surf_fix_pipeline, to_crlf)
+
+COPY_BLOCK_SIZE = 16 << 20
+DIFF_CONTEXT = 3
+
+_HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class _MmapLines:
+    """Итератор строк участка [start, end) отображённого в память файла (для scan_namelists)."""
+
+    def __init__(self, mm, start=0, end=None):
+        self.mm = mm
+        self.start = start
+        self.end = len(mm) if end is None else end
+
+    def __iter__(self):
+        mm = self.mm
+        mm.seek(self.start)
+        if self.end >= len(mm):
+            return iter(mm.readline, b'')
+        return iter(lambda: mm.readline() if mm.tell() < self.end else b'', b'')
+
+
+@contextmanager
+def map_fds(fds_path):
+    """
+    Отображает содержимое .fds файла в память (только чтение).
+
+    Сжатый файл предварительно распаковывается во временный файл.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Контекстный менеджер, выдающий mmap или None для пустого файла.
+    """
+    if compression_codec(fds_path) is None:
+        if os.path.getsize(fds_path) == 0:
+            # Пустой файл нельзя отобразить в память
+            yield None
+            return
+        with open(fds_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+        return
+    with tempfile.TemporaryFile() as tmp:
+        with open_fds(fds_path, 'rb') as src:
+            shutil.copyfileobj(src, tmp, COPY_BLOCK_SIZE)
+        if tmp.tell() == 0:
+            yield None
+            return
+        tmp.flush()
+        with mmap.mmap(tmp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _stage_names(stages):
+    """
+    Группы, нужные стадиям (см. fds_stream.Stage.names и filters).
+
+    :return: {имя: кортеж фильтров по байтам записи или None - все записи группы};
+             None, если стадиям нужны все записи.
+    """
+    names = {}
+    for stage in stages:
+        if stage.names is None:
+            return None
+        for name in stage.names:
+            pattern = stage.filters.get(name)
+            if pattern is None:
+                names[name] = None
+            elif name not in names:
+                names[name] = (pattern,)
+            elif names[name] is not None:
+                names[name] += (pattern,)
+    return names
+
+
+def _wanted(mm, names, name, offset, end):
+    """Нужна ли стадиям запись name в [offset, end) по группам из _stage_names."""
+    if name not in names:
+        return False
+    patterns = names[name]
+    return patterns is None or any(pattern.search(mm, offset, end) for pattern in patterns)
+
+
+def _tail_start(mm, index):
+    """Начало последних MARKER_TAIL_SIZE байт файла, сдвинутое на начало строки и записи (по индексу)."""
+    start = mm.rfind(b'\n', 0, max(0, len(mm) - MARKER_TAIL_SIZE)) + 1
+    for entries in index.entries.values():
+        for offset, length, _ in reversed(entries):
+            if offset < start:
+                if offset + length > start:
+                    start = offset
+                break
+    return start
+
+
+def _scanned_records(mm, start, end, stages, names, tail):
+    """
+    Записи участка [start, end), которые нужно передать стадиям, по просмотру строк.
+
+    :return: Генератор кортежей (смещение, длина, имя).
+    """
+    for name, offset, length, _ in scan_namelists(_MmapLines(mm, start, end), start, include_text=True):
+        if (names is None or offset + length > tail or any(stage.needs_all for stage in stages)
+                or _wanted(mm, names, name, offset, offset + length)):
+            yield offset, length, name
+
+
+def _indexed_entries(mm, index, names):
+    """
+    Записи групп names по индексу, упорядоченные по смещению.
+
+    Для групп с фильтрами выражения ищутся по всему файлу, и выбираются
+    только записи, содержащие найденное (каждая запись не просматривается).
+
+    :return: Список кортежей (смещение, длина, имя).
+    """
+    selected = []
+    for name, patterns in names.items():
+        entries = index.entries.get(name, ())
+        if patterns is None:
+            selected.extend((entry[0], entry[1], name) for entry in entries)
+            continue
+        offsets = [entry[0] for entry in entries]
+        found = set()
+        for pattern in patterns:
+            for match in pattern.finditer(mm):
+                i = bisect.bisect_right(offsets, match.start()) - 1
+                if i >= 0 and match.end() <= offsets[i] + entries[i][1]:
+                    found.add(i)
+        selected.extend((entries[i][0], entries[i][1], name) for i in found)
+    selected.sort()
+    return selected
+
+
+def _indexed_records(mm, index, stages, names):
+    """
+    Записи, которые нужно передать стадиям, по смещениям из индекса.
+
+    Участки между выбранными записями пропускаются без чтения; они просматриваются
+    построчно, только если стадия требует всех записей (needs_all), а также
+    в последних MARKER_TAIL_SIZE байтах файла.
+
+    :return: Генератор кортежей (смещение, длина, имя).
+    """
+    size = len(mm)
+    tail = _tail_start(mm, index)
+    position = 0
+    for offset, length, name in _indexed_entries(mm, index, names) + [(size, 0, None)]:
+        if offset > position:
+            # Строки вне namelist и записи, не нужные стадиям
+            if any(stage.needs_all for stage in stages):
+                yield from _scanned_records(mm, position, offset, stages, names, tail)
+            elif offset > tail:
+                yield from _scanned_records(mm, max(position, tail), offset, stages, names, tail)
+        if offset >= size:
+            break
+        yield offset, length, name
+        position = offset + length
+
+
+def compute_edits(mm, stages, encoding=FDS_ENCODING, index=None, graph=None):
+    """
+    Вычисляет правки, которые стадии вносят в файл.
+
+    Разбираются и передаются стадиям только записи групп, нужных стадиям
+    (fds_stream.Stage.names), а также все записи последних MARKER_TAIL_SIZE байт
+    (метка CheckSURFFIX) и все записи, пока стадия требует их (needs_all, например
+    блок очага до '(end)'). Остальные записи не декодируются. С актуальным индексом
+    файла записи выбираются по смещениям без просмотра остальной части файла.
+
+    При заданном graph граф ссылок строится в том же проходе: разобранные записи
+    добавляются по результату стадий, неразобранные участки - по строкам в кавычках
+    (ReferenceGraph.add_raw). &CTRL/&RAMP, недостижимые после прохода, удаляются
+    правками так же, как их удалила бы PruneStage.
+
+    :param mm: Отображённый в память файл (mmap).
+    :param stages: Список стадий конвейера.
+    :param encoding: Кодировка записей для стадий (по умолчанию побайтовая FDS_ENCODING).
+    :param index: FdsIndex этого содержимого (актуальный) или None - выбор записей просмотром строк.
+    :param graph: ReferenceGraph для удаления недостижимых &CTRL/&RAMP или None.
+    :return: Список правок (начало, конец, новые байты), упорядоченный и без перекрытий.
+    """
+    crlf = mm[:mm.find(b'\n') + 1].endswith(b'\r\n')
+
+    def encode(records):
+        text = ''.join(record.text for record in records)
+        return (to_crlf(text) if crlf else text).encode(encoding)
+
+    names = _stage_names(stages)
+    if names is not None and graph is not None:
+        names.update(dict.fromkeys(PRUNABLE_NAMES))
+    if names is not None and index is not None:
+        records = _indexed_records(mm, index, stages, names)
+    else:
+        records = _scanned_records(mm, 0, len(mm), stages, names, len(mm) - MARKER_TAIL_SIZE)
+
+    edits = []
+    prunable = []
+    position = 0
+    for offset, length, name in records:
+        if graph is not None and offset > position:
+            graph.add_raw(mm, position, offset)
+        end = offset + length
+        position = end
+        record = make_record(name, mm[offset:end].decode(encoding))
+        out = feed_stages((record,), stages)
+        if graph is not None:
+            for item in out:
+                graph.add(item)
+            if any(item.name in PRUNABLE_NAMES for item in out):
+                # Удаление решается после прохода, когда известны все ссылки
+                prunable.append((offset, end, record, out))
+                continue
+        if len(out) == 1 and (out[0] is record or out[0].text == record.text):
+            continue
+        edits.append((offset, end, encode(out)))
+    if graph is not None:
+        if position < len(mm):
+            graph.add_raw(mm, position, len(mm))
+        dead = graph.unreachable()
+        for stage in stages:
+            if isinstance(stage, CheckMarkerStage):
+                # Удаляемые после прохода &CTRL/&RAMP не входят в хэш записей метки
+                stage.pruned = dead
+        for offset, end, record, out in prunable:
+            kept = [item for item in out if item.name not in PRUNABLE_NAMES or item.get_str('ID') not in dead]
+            if len(kept) != 1 or kept[0].text != record.text:
+                edits.append((offset, end, encode(kept)))
+        edits.sort(key=lambda edit: edit[0])
+
+    tail = list(close_stages(stages))
+    if tail:
+        size = len(mm)
+        edits.append((size, size, encode(tail)))
+
+    merged = []
+    for start, end, data in edits:
+        if merged and merged[-1][1] == start:
+            # Соседние правки объединяются в одну
+            merged[-1] = (merged[-1][0], end, merged[-1][2] + data)
+        else:
+            merged.append((start, end, data))
+    # Правка может воспроизвести исходные байты (например, метка удалена и дописана заново)
+    return [edit for edit in merged if mm[edit[0]:edit[1]] != edit[2]]
+
+
+def _line_start(mm, position, lines):
+    """Смещение начала строки, отстоящей на lines строк назад от строки с position."""
+    position = mm.rfind(b'\n', 0, position) + 1
+    for _ in range(lines):
+        if position == 0:
+            break
+        position = mm.rfind(b'\n', 0, position - 1) + 1
+    return position
+
+
+def _line_end(mm, position, lines):
+    """Смещение конца строки, отстоящей на lines строк вперёд от position (position - начало строки)."""
+    size = len(mm)
+    for _ in range(lines):
+        if position >= size:
+            return size
+        newline = mm.find(b'\n', position)
+        position = size if newline < 0 else newline + 1
+    return position
+
+
+def _shift_hunk_header(line, old_shift, new_shift):
+    """Сдвигает номера строк в заголовке фрагмента difflib на смещение участка в файле."""
+    match = _HUNK_RE.match(line)
+    old_start, old_len, new_start, new_len = match.groups()
+    old_len = 1 if old_len is None else int(old_len)
+    new_len = 1 if new_len is None else int(new_len)
+    # difflib нумерует пустой участок строкой перед ним, поэтому сдвиг одинаков
+    old_start = int(old_start) + old_shift
+    new_start = int(new_start) + new_shift
+    return f"@@ -{old_start},{old_len} +{new_start},{new_len} @@\n"
+
+
+def iter_diff(mm, edits, label='', context=DIFF_CONTEXT):
+    """
+    Генератор строк unified diff для правок, без чтения неизменённой части файла.
+
+    Соседние правки, контекст которых пересекается, объединяются в один участок;
+    difflib сравнивает только этот участок, номера строк пересчитываются на весь файл.
+    Каждый участок декодируется для отображения отдельно (decode_display).
+
+    :param mm: Отображённый в память файл (mmap).
+    :param edits: Список правок (начало, конец, новые байты) из compute_edits.
+    :param label: Имя файла для заголовков '---' / '+++'.
+    :param context: Число строк контекста.
+    :return: Генератор строк diff (с переводом строки в конце каждой).
+    """
+    if not edits:
+        return
+    yield f"--- {label}\n"
+    yield f"+++ {label} (SURF_FIX)\n"
+
+    groups = []
+    for edit in edits:
+        start = _line_start(mm, edit[0], context)
+        end = _line_end(mm, edit[1], context)
+        if groups and start <= groups[-1][1]:
+            groups[-1][1] = max(groups[-1][1], end)
+            groups[-1][2].append(edit)
+        else:
+            groups.append([start, end, [edit]])
+
+    line_number = 0
+    counted = 0
+    line_delta = 0
+    for start, end, group in groups:
+        line_number += mm[counted:start].count(b'\n')
+        counted = start
+
+        old = mm[start:end]
+        new = []
+        position = start
+        for edit_start, edit_end, data in group:
+            new.append(mm[position:edit_start])
+            new.append(data)
+            position = edit_end
+        new.append(mm[position:end])
+        new = b''.join(new)
+
+        old_lines = decode_display(old).splitlines(keepends=True)
+        new_lines = decode_display(new).splitlines(keepends=True)
+        for line in list(difflib.unified_diff(old_lines, new_lines, n=context))[2:]:
+            if line.startswith('@@'):
+                yield _shift_hunk_header(line, line_number, line_number + line_delta)
+            elif line.endswith('\n'):
+                yield line.replace('\r\n', '\n')
+            else:
+                yield line + '\n\\ No newline at end of file\n'
+        line_delta += len(new_lines) - len(old_lines)
+
+
+def _copy_range(src, dst, mm, start, end):
+    """
+    Копирует байты [start, end) исходного файла в dst, по возможности через copy_file_range.
+
+    При src=None (сжатый dst) байты копируются только срезами mm.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None) if src is not None else None
+    if copy_file_range is not None:
+        dst.flush()
+        src_fd = src.fileno()
+        dst_fd = dst.fileno()
+        position = start
+        try:
+            while position < end:
+                copied = copy_file_range(src_fd, dst_fd, min(end - position, COPY_BLOCK_SIZE), position)
+                if copied == 0:
+                    break
+                position += copied
+        except OSError:
+            # Файловая система не поддерживает copy_file_range - остаток копируется вручную
+            pass
+        dst.seek(0, os.SEEK_END)
+        if position == end:
+            return
+        start = position
+    view = memoryview(mm)
+    try:
+        for position in range(start, end, COPY_BLOCK_SIZE):
+            dst.write(view[position:min(end, position + COPY_BLOCK_SIZE)])
+    finally:
+        view.release()
+
+
+def apply_edits(fds_path, edits, fsync=False):
+    """
+    Применяет правки к файлу атомарно (временный файл + os.replace).
+
+    :param fds_path: Путь к .fds файлу.
+    :param edits: Список правок (начало, конец, новые байты).
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :return: Число применённых правок. Без правок файл не перезаписывается.
+    """
+    if not edits:
+        return 0
+    with open(fds_path, 'rb') as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with atomic_write(fds_path, fsync, encoding=None) as dst:
+            _write_edits(src, dst, mm, edits)
+    return len(edits)
+
+
+def _write_edits(src, dst, mm, edits):
+    """Пишет в dst содержимое mm с применёнными правками."""
+    position = 0
+    for start, end, data in edits:
+        if start > position:
+            _copy_range(src, dst, mm, position, start)
+        dst.write(data)
+        position = end
+    if position < len(mm):
+        _copy_range(src, dst, mm, position, len(mm))
+
+
+def splice_fds_file(fds_path, stages, fsync=False, graph=None):
+    """
+    Применяет стадии конвейера к .fds файлу, переписывая только изменённые записи.
+
+    Если рядом с файлом сохранён актуальный индекс (fds_index.saved_index), записи
+    выбираются по его смещениям; индекс не строится.
+
+    :param fds_path: Путь к .fds файлу.
+    :param stages: Список стадий конвейера.
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :param graph: ReferenceGraph для удаления недостижимых &CTRL/&RAMP в том же проходе (см. compute_edits).
+    :return: Число применённых правок.
+    """
+    compressed = compression_codec(fds_path) is not None
+    with map_fds(fds_path) as mm:
+        if mm is None:
+            rewrite_fds_file(fds_path, stages, fsync)
+            return 1
+        edits = compute_edits(mm, stages, index=saved_index(fds_path), graph=graph)
+        if compressed and edits:
+            # Сжатый файл пишется заново из распакованной копии
+            with atomic_write(fds_path, fsync, encoding=None) as dst:
+                _write_edits(None, dst, mm, edits)
+    if compressed:
+        return len(edits)
+    return apply_edits(fds_path, edits, fsync)
+
+
+def surf_fix_is_current(fds_path, params_hash):
+    """
+    Проверяет, обработан ли файл SURF_FIX с теми же параметрами.
+
+    Хэш параметров сравнивается с меткой CheckSURFFIX=Done HASH=... из последних
+    MARKER_TAIL_SIZE байт файла; без метки с хэшем (в том числе старая метка
+    CheckSURFFIX=Done) файл считается необработанным. Хэш записей, которые меняет
+    SURF_FIX (&SURF, &VENT, &CTRL, &RAMP и &OBST с CTRL_ID), сверяется только по
+    уже сохранённому актуальному индексу (fds_index.saved_index): записи читаются
+    по смещениям, индекс не строится. Без сохранённого индекса проверяется только
+    хэш параметров - правка этих записей вручную после SURF_FIX не обнаруживается.
+
+    :param fds_path: Путь к .fds файлу.
+    :param params_hash: Хэш параметров (fds_stream.surf_fix_hash).
+    :return: True, если повторная обработка ничего не изменит.
+    """
+    stored = read_check_hash(fds_path)
+    if stored is None or stored[0] != params_hash:
+        return False
+    index = saved_index(fds_path)
+    if index is None:
+        return True
+    names = {name: (FIX_DIGEST_FILTERS[name],) if name in FIX_DIGEST_FILTERS else None for name in FIX_DIGEST_NAMES}
+    with map_fds(fds_path) as mm:
+        if mm is None:
+            return False
+        texts = [mm[offset:offset + length].decode(FDS_ENCODING)
+                 for offset, length, _ in _indexed_entries(mm, index, names)]
+    return fix_records_digest(texts) == stored[1]
+
+
+def splice_surf_fix(fds_path, hrrpua, tau_q, fsync=False, marker_state=None, per_surf=None, params_hash=None,
+                    inventory=None):
+    """
+    SURF_FIX в режиме минимальных правок (аналог fds_stream.apply_surf_fix).
+
+    :param fds_path: Путь к .fds файлу.
+    :param hrrpua: Значение HRRPUA, кВт/м² (None - только очаги из per_surf).
+    :param tau_q: Значение TAU_Q (отрицательное), сек.
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :param marker_state: Если задано, метка CheckSURFFIX записывается в том же проходе.
+    :param per_surf: Словарь {ID &SURF: (HRRPUA, TAU_Q)} для отдельных очагов.
+    :param params_hash: Хэш параметров для метки (см. surf_fix_is_current).
+    :param inventory: FireInventory для сводки очагов (заполняется в том же проходе).
+    :return: Итоговое состояние метки CheckSURFFIX или None.
+    """
+    # Граф ссылок для удаления &CTRL/&RAMP строится в том же проходе (compute_edits)
+    stages = surf_fix_pipeline(fds_path, hrrpua, tau_q, marker_state, per_surf, prune=False,
+                               params_hash=params_hash, inventory=inventory)
+    splice_fds_file(fds_path, stages, fsync, ReferenceGraph())
+    return stages[-1].state if marker_state is not None else None
+
+
+def preview_surf_fix(fds_path, hrrpua, tau_q, marker_state=None, context=DIFF_CONTEXT, per_surf=None,
+                     params_hash=None):
+    """
+    Предпросмотр SURF_FIX: unified diff изменений без записи файла.
+
+    :param fds_path: Путь к .fds файлу.
+    :param hrrpua: Значение HRRPUA, кВт/м² (None - только очаги из per_surf).
+    :param tau_q: Значение TAU_Q (отрицательное), сек.
+    :param marker_state: Если задано, в diff попадает и метка CheckSURFFIX.
+    :param context: Число строк контекста.
+    :param per_surf: Словарь {ID &SURF: (HRRPUA, TAU_Q)} для отдельных очагов.
+    :param params_hash: Хэш параметров для метки (см. surf_fix_is_current).
+    :return: Генератор строк diff; пустой, если файл не изменится.
+    """
+    stages = surf_fix_pipeline(fds_path, hrrpua, tau_q, marker_state, per_surf, prune=False, params_hash=params_hash)
+    with map_fds(fds_path) as mm:
+        if mm is None:
+            tail = decode_display(''.join(record.text for record in close_stages(stages)).encode(FDS_ENCODING))
+            if tail:
+                label = os.path.basename(fds_path)
+                yield from difflib.unified_diff([], tail.splitlines(keepends=True), label, f"{label} (SURF_FIX)")
+            return
+        edits = compute_edits(mm, stages, index=saved_index(fds_path), graph=ReferenceGraph())
+        yield from iter_diff(mm, edits, os.path.basename(fds_path), context)
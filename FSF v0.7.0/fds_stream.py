@@ -0,0 +1,1144 @@
+"""
+Потоковая обработка .fds файлов без загрузки всего сценария в память.
+
+Файл сценария разбивается на записи: namelist-группа (&SURF, &VENT, &OBST, ...),
+которая может занимать несколько строк и заканчивается символом '/',
+либо одна строка произвольного текста (комментарии, пустые строки, служебные метки).
+Записи выдаются генератором по одной, поэтому объём памяти не зависит от размера файла.
+Записи типизированы (fds_records): параметры разбираются только при обращении к ним.
+
+Преобразования (SURF_FIX, DEVC для INIT_md, замена MESH, метка CheckSURFFIX)
+оформлены как стадии конвейера и применяются за один проход чтения/записи:
+
+    rewrite_fds_file(fds_path, surf_fix_stages(hrrpua, tau_q) + [CheckMarkerStage("Done")])
+
+Полная подготовка сценария (SURF_FIX, DEVC, MESH и метка) выполняется одной
+перезаписью - prepare_scenario (стадии MESH строит fds_mesh).
+
+Файл читается и пишется в кодировке FDS_ENCODING (latin-1): каждый байт
+отображается в один символ и обратно без изменений. Ключевые слова и имена
+параметров FDS - ASCII, поэтому стадии работают одинаково для UTF-8, cp1251
+(экспорт Fenix+/Pyrosim) и файлов со смешанной кодировкой, а комментарии и
+строковые значения на кириллице сохраняются байт в байт. Настоящая кодировка
+определяется только для отображения (decode_display, to_display).
+Переводы строки не преобразуются (newline=''): '\r\n' файлов Windows и
+одиночный '\r' сохраняются как есть, а записи, созданные стадиями, получают
+перевод строки файла (to_crlf).
+
+Сжатые сценарии (.fds.gz, .fds.xz) читаются и пишутся потоком без распаковки
+на диск: open_fds и atomic_write выбирают кодек по расширению файла.
+"""
+import codecs
+import configparser
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import re
+import shutil
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain, islice
+
+from fds_records import Record, make_record
+
+READ_BUFFER_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+FDS_ENCODING = 'latin-1'
+DISPLAY_FALLBACK_ENCODING = 'cp1251'
+DEFAULT_CHUNKSIZE = 50000
+COMPRESSION_CODECS = {'.gz': gzip, '.xz': lzma}
+DEFAULT_BATCHSIZE = 1
+
+
+def compression_codec(path):
+    """
+    Модуль сжатия (gzip, lzma) по расширению файла.
+
+    :param path: Путь к файлу.
+    :return: Модуль из COMPRESSION_CODECS или None для несжатого файла.
+    """
+    return COMPRESSION_CODECS.get(os.path.splitext(path)[1].lower())
+
+
+def open_fds(fds_path, mode='r', encoding=FDS_ENCODING):
+    """
+    Открывает .fds файл на чтение, распаковывая .fds.gz / .fds.xz на лету.
+
+    :param fds_path: Путь к файлу.
+    :param mode: 'r' - текст в кодировке encoding (строки с исходными переводами строки), 'rb' - байты.
+    :param encoding: Кодировка текстового режима.
+    :return: Открытый файл.
+    """
+    codec = compression_codec(fds_path)
+    if 'b' in mode:
+        if codec is None:
+            return open(fds_path, 'rb', buffering=READ_BUFFER_SIZE)
+        return codec.open(fds_path, 'rb')
+    if codec is None:
+        return open(fds_path, 'r', encoding=encoding, newline='', buffering=READ_BUFFER_SIZE)
+    return codec.open(fds_path, 'rt', encoding=encoding, newline='')
+
+
+def to_crlf(text):
+    """
+    Приводит переводы строки текста к виду '\r\n' (файлы Windows).
+
+    :param text: Текст записи, созданной стадией (переводы строки '\n').
+    :return: Текст с переводами строки '\r\n'.
+    """
+    return text.replace('\r\n', '\n').replace('\n', '\r\n')
+
+
+def read_chunk_settings(ini_path):
+    """
+    Чтение [chunksize] и [batchsize] из filePath.ini (UTF-16), заданных лаунчером.
+
+    chunksize - число строк/записей, обрабатываемых за один шаг;
+    batchsize - число шагов (процессов), выполняемых одновременно.
+
+    :param ini_path: Путь к filePath.ini или filePath_{ProcessID}.ini.
+    :return: Кортеж (chunksize, batchsize); при отсутствии значений - DEFAULT_CHUNKSIZE, DEFAULT_BATCHSIZE.
+    """
+    config = configparser.ConfigParser()
+    try:
+        with open(ini_path, 'r', encoding='utf-16') as f:
+            config.read_file(f)
+        chunksize = config.getint('chunksize', 'chunksize', fallback=DEFAULT_CHUNKSIZE)
+        batchsize = config.getint('batchsize', 'batchsize', fallback=DEFAULT_BATCHSIZE)
+    except (OSError, UnicodeError, ValueError, configparser.Error):
+        return DEFAULT_CHUNKSIZE, DEFAULT_BATCHSIZE
+    return max(1, chunksize), max(1, batchsize)
+
+
+def decode_display(data):
+    """
+    Декодирует байты .fds файла для отображения: UTF-8, а при ошибке - cp1251.
+
+    :param data: Байты (фрагмент файла).
+    :return: Строка.
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode(DISPLAY_FALLBACK_ENCODING, errors='replace')
+
+
+def to_display(text):
+    """Текст записи (FDS_ENCODING) в строку для отображения."""
+    return text if text.isascii() else decode_display(text.encode(FDS_ENCODING))
+
+
+def detect_encoding(fds_path):
+    """
+    Кодировка .fds файла для отображения и ввода: 'utf-8' или DISPLAY_FALLBACK_ENCODING.
+
+    Файл читается блоками; ASCII-блоки не декодируются.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Имя кодировки.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open_fds(fds_path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+            if block.isascii() and not decoder.getstate()[0]:
+                continue
+            try:
+                decoder.decode(block)
+            except UnicodeDecodeError:
+                return DISPLAY_FALLBACK_ENCODING
+    return 'utf-8'
+
+
+def to_fds_text(text, encoding):
+    """
+    Строка, введённая пользователем (например, ID &SURF), в представлении FDS_ENCODING.
+
+    :param text: Строка.
+    :param encoding: Кодировка файла (см. detect_encoding).
+    :return: Строка, сравнимая с текстом записей.
+    """
+    return text if text.isascii() else text.encode(encoding, errors='replace').decode(FDS_ENCODING)
+
+
+_NAME_RE = re.compile(r'&(\w+)')
+
+
+def _find_terminator(line, quote=None):
+    """
+    Ищет символ '/', завершающий namelist, пропуская строки в кавычках.
+
+    :param line: Строка для поиска.
+    :param quote: Открытая кавычка, перенесённая с предыдущей строки, или None.
+    :return: Кортеж (индекс '/' или -1, незакрытая кавычка или None).
+    """
+    if quote is None and "'" not in line and '"' not in line:
+        return line.find('/'), None
+    i = 0
+    n = len(line)
+    while i < n:
+        char = line[i]
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char == "'" or char == '"':
+            quote = char
+        elif char == '/':
+            return i, None
+        i += 1
+    return -1, quote
+
+
+def iter_namelists(stream):
+    """
+    Генератор записей .fds файла.
+
+    Строка, начинающаяся с '&', открывает namelist-группу; группа продолжается
+    до первого '/' вне кавычек, включая многострочные записи. Остаток строки
+    после '/' (обычно комментарий) остаётся в той же записи.
+
+    :param stream: Итерируемый источник строк (открытый текстовый файл).
+    :return: Генератор объектов Record (типизированных через make_record).
+    """
+    pending = None
+    name = None
+    quote = None
+    for line in stream:
+        if pending is None:
+            stripped = line.lstrip()
+            if not stripped.startswith('&'):
+                yield Record(None, line)
+                continue
+            match = _NAME_RE.match(stripped)
+            name = match.group(1).upper() if match else ''
+            start = len(line) - len(stripped) + 1
+            end, quote = _find_terminator(line[start:])
+            if end >= 0:
+                yield make_record(name, line)
+                continue
+            pending = [line]
+            continue
+
+        pending.append(line)
+        end, quote = _find_terminator(line, quote)
+        if end >= 0:
+            yield make_record(name, ''.join(pending))
+            pending = None
+            quote = None
+
+    if pending is not None:
+        # Незавершённая группа в конце файла выдаётся как есть
+        yield make_record(name, ''.join(pending))
+
+
+class Stage:
+    """
+    Стадия конвейера перезаписи .fds.
+
+    feed() получает очередную запись и возвращает последовательность записей,
+    которые передаются следующей стадии (пустая последовательность удаляет запись).
+    close() вызывается после последней записи и может дописать записи в конец.
+
+    names - имена namelist-групп, которые стадия изменяет или учитывает; None -
+    все записи, включая строки вне namelist. Режим минимальных правок
+    (fds_splice.compute_edits) разбирает только записи этих групп, остальные
+    проходят мимо стадий без изменений, пока ни одна стадия не требует
+    всех записей (needs_all). filters - {имя группы: регулярное выражение по
+    байтам записи}: запись группы нужна стадии, только если выражение в ней
+    найдено (например, &OBST с CTRL_ID).
+    """
+
+    names = None
+    filters = {}
+
+    @property
+    def needs_all(self):
+        return self.names is None
+
+    def feed(self, record):
+        return (record,)
+
+    def close(self):
+        return ()
+
+
+def feed_stages(batch, stages):
+    """
+    Передаёт записи через последовательность стадий.
+
+    :param batch: Последовательность Record.
+    :param stages: Стадии в порядке применения.
+    :return: Последовательность результирующих Record.
+    """
+    for stage in stages:
+        out = []
+        for record in batch:
+            out.extend(stage.feed(record))
+        batch = out
+        if not batch:
+            break
+    return batch
+
+
+def close_stages(stages):
+    """
+    Завершает стадии: записи, дописанные close(), проходят через последующие стадии.
+
+    :param stages: Стадии в порядке применения.
+    :return: Генератор дописанных Record.
+    """
+    for index, stage in enumerate(stages):
+        yield from feed_stages(stage.close(), stages[index + 1:])
+
+
+def run_pipeline(records, stages):
+    """
+    Пропускает поток записей через стадии конвейера.
+
+    :param records: Итерируемый источник Record.
+    :param stages: Список стадий в порядке применения.
+    :return: Генератор результирующих Record.
+    """
+    for record in records:
+        yield from feed_stages((record,), stages)
+    yield from close_stages(stages)
+
+
+@contextmanager
+def atomic_write(path, fsync=False, encoding='utf-8'):
+    """
+    Атомарная запись файла через временный файл в той же директории.
+
+    Файл публикуется через os.replace() только после успешной записи,
+    поэтому сбой посреди записи не оставляет усечённый сценарий.
+    Запись идёт через буфер WRITE_BUFFER_SIZE, что сокращает число
+    мелких операций записи на сетевых дисках. Файлы .gz / .xz сжимаются
+    при записи (см. compression_codec).
+
+    :param path: Путь к итоговому файлу.
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :param encoding: Кодировка текстового файла (переводы строки пишутся как есть); None - двоичный режим.
+    :return: Контекстный менеджер, выдающий открытый на запись файл.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    codec = compression_codec(path)
+    try:
+        if codec is None:
+            with open(fd, 'wb' if encoding is None else 'w', encoding=encoding,
+                      newline=None if encoding is None else '', buffering=WRITE_BUFFER_SIZE) as dst:
+                yield dst
+                if fsync:
+                    dst.flush()
+                    os.fsync(dst.fileno())
+        else:
+            with open(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as raw:
+                with codec.open(raw, 'wb') as packed:
+                    if encoding is None:
+                        yield packed
+                    else:
+                        dst = io.TextIOWrapper(packed, encoding=encoding, newline='')
+                        yield dst
+                        dst.flush()
+                        dst.detach()
+                if fsync:
+                    raw.flush()
+                    os.fsync(raw.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def iter_chunks(records, chunksize):
+    """
+    Группирует поток записей в списки не длиннее chunksize.
+
+    :param records: Итерируемый источник записей.
+    :param chunksize: Размер группы.
+    :return: Генератор списков.
+    """
+    records = iter(records)
+    return iter(lambda: list(islice(records, chunksize)), [])
+
+
+def _output_texts(lines, stages):
+    """
+    Тексты записей на выходе стадий.
+
+    Записи исходного файла выдаются без изменений; в файле с переводом строки
+    '\r\n' (по первой строке) записи, изменённые или созданные стадиями,
+    переводятся в '\r\n' (как правки fds_splice).
+
+    :param lines: Итерируемый источник строк.
+    :param stages: Список стадий конвейера.
+    :return: Генератор строк.
+    """
+    lines = iter(lines)
+    first = next(lines, '')
+    crlf = first.endswith('\r\n')
+    for record in iter_namelists(chain((first,), lines)):
+        for out in feed_stages((record,), stages):
+            yield to_crlf(out.text) if crlf and out is not record else out.text
+    for out in close_stages(stages):
+        yield to_crlf(out.text) if crlf else out.text
+
+
+def rewrite_fds_file(fds_path, stages, fsync=False, chunksize=None):
+    """
+    Перезаписывает .fds файл за один проход, применяя все стадии.
+
+    Записи читаются и сразу пишутся во временный файл рядом с исходным
+    (см. atomic_write). При заданном chunksize записи обрабатываются группами
+    по chunksize и каждая группа пишется одной операцией - в памяти находится
+    не больше одной группы. Стадии хранят состояние между записями
+    (блок очага, счётчики DEVC), поэтому группы обрабатываются по порядку.
+
+    :param fds_path: Путь к .fds файлу.
+    :param stages: Список стадий конвейера.
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :param chunksize: Число записей в группе (см. read_chunk_settings); None - по одной.
+    """
+    with open_fds(fds_path) as src, atomic_write(fds_path, fsync, encoding=FDS_ENCODING) as dst:
+        if not chunksize:
+            for text in _output_texts(src, stages):
+                dst.write(text)
+            return
+        for chunk in iter_chunks(_output_texts(src, stages), chunksize):
+            dst.write(''.join(chunk))
+
+
+def rewrite_lines(lines, stages):
+    """
+    Применяет стадии к содержимому, уже загруженному в память.
+
+    :param lines: Список строк .fds файла.
+    :param stages: Список стадий конвейера.
+    :return: Модифицированное содержимое в виде списка строк (с исходными переводами строки).
+    """
+    text = ''.join(_output_texts(lines, stages))
+    return io.StringIO(text, newline='').readlines()
+
+
+class SurfHrrpuaStage(Stage):
+    """
+    Замена &SURF с HRRPUA на запись с рассчитанными HRRPUA и TAU_Q.
+
+    После такой &SURF сохраняются только &VENT и строка с '(end)',
+    остальные записи очага отбрасываются. Атрибут claimed показывает,
+    что последняя запись относилась к блоку &SURF.
+
+    Значения для отдельных очагов задаются в per_surf по ID &SURF; остальные
+    очаги получают hrrpua/tau_q, а при hrrpua=None остаются без изменений.
+    ID всех найденных очагов (&SURF с HRRPUA) собираются в fire_surfaces.
+    """
+
+    names = ('SURF', 'VENT')
+
+    def __init__(self, hrrpua, tau_q, per_surf=None):
+        self.hrrpua = hrrpua
+        self.tau_q = tau_q
+        self.per_surf = per_surf or {}
+        self.fire_surfaces = []
+        self.inside_surf_block = False
+        self.hrrpua_found = False
+        self.surf_id = None
+        self.claimed = False
+
+    @property
+    def needs_all(self):
+        # Внутри блока очага отбрасываются любые записи до строки '(end)'
+        return self.inside_surf_block and self.hrrpua_found
+
+    def feed(self, record):
+        name = record.name
+        self.claimed = True
+        if name == 'SURF':
+            if record.id is not None:
+                self.surf_id = record.id
+
+            self.inside_surf_block = True
+            if record.has('HRRPUA'):
+                self.fire_surfaces.append(self.surf_id)
+                hrrpua, tau_q = self.per_surf.get(self.surf_id, (self.hrrpua, self.tau_q))
+                if hrrpua is not None:
+                    self.hrrpua_found = True
+                    return (make_record('SURF', f"&SURF ID='{self.surf_id}', HRRPUA={hrrpua}, COLOR='RED', TAU_Q={tau_q}/\n"),)
+            self.hrrpua_found = False
+            return (record,)
+
+        if self.inside_surf_block and self.hrrpua_found:
+            if name == 'VENT':
+                return (record,)
+            if '(end)' in record.text:
+                self.inside_surf_block = False
+                return (record,)
+            return ()
+
+        self.claimed = False
+        return (record,)
+
+
+class VentStripStage(Stage):
+    """Удаление CTRL_ID и SPREAD_RATE из &VENT очага пожара."""
+
+    names = ('VENT',)
+
+    def __init__(self, surf_stage):
+        self.surf_stage = surf_stage
+
+    def feed(self, record):
+        if record.name != 'VENT' or not self.surf_stage.claimed:
+            return (record,)
+        return (record.without_param('CTRL_ID').without_param('SPREAD_RATE'),)
+
+
+class ObstCtrlStage(Stage):
+    """
+    Удаление CTRL_ID из &OBST.
+
+    &CTRL/&RAMP, на которые после этого не осталось ссылок, удаляет PruneStage.
+    """
+
+    names = ('OBST',)
+    filters = {'OBST': re.compile(rb'CTRL_ID', re.IGNORECASE)}
+
+    def __init__(self, surf_stage=None):
+        self.surf_stage = surf_stage
+
+    def feed(self, record):
+        if self.surf_stage is not None and self.surf_stage.claimed:
+            return (record,)
+        if record.name == 'OBST' and record.has('CTRL_ID'):
+            return (record.without_param('CTRL_ID'),)
+        return (record,)
+
+
+PRUNABLE_NAMES = ('CTRL', 'RAMP')
+_ROOT_FUNCTION_TYPES = ('KILL', 'RESTART')
+_QUOTED_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+_RAW_REFERENCE_RE = re.compile(rb"\bID\s*=\s*(?:'[^']*'|\"[^\"]*\")|'([^']*)'|\"([^\"]*)\"", re.IGNORECASE)
+
+
+def record_references(record):
+    """
+    Идентификаторы, на которые ссылается запись: строки в кавычках во всех параметрах, кроме ID.
+
+    Учитываются любые параметры (CTRL_ID, RAMP_Q, INPUT_ID, SURF_ID, PROP_ID, DEVC_ID, ...),
+    поэтому ссылка не теряется и для параметров, которые не перечислены явно.
+
+    :param record: Запись .fds.
+    :return: Множество строк.
+    """
+    references = set()
+    for key, value in record.params.items():
+        if key != 'ID':
+            for single, double in _QUOTED_RE.findall(value):
+                references.add(single or double)
+    return references
+
+
+class ReferenceGraph:
+    """
+    Граф ссылок между namelist-группами.
+
+    Вершины - ID групп &CTRL и &RAMP (все точки &RAMP с одним ID - одна вершина).
+    Остальные группы (&OBST, &VENT, &SURF, &DEVC, &PROP, ...) всегда сохраняются
+    и служат корнями: всё, на что они ссылаются, достижимо. &CTRL с
+    FUNCTION_TYPE='KILL'/'RESTART' действуют без ссылок и тоже считаются корнями.
+    """
+
+    def __init__(self):
+        self.defined = set()
+        self.edges = defaultdict(set)
+        self.roots = set()
+
+    def add(self, record):
+        name = record.name
+        if name is None:
+            return
+        text = record.text
+        quoted = "'" in text or '"' in text
+        if name in PRUNABLE_NAMES:
+            record_id = record.get_str('ID')
+            if record_id is None:
+                return
+            self.defined.add(record_id)
+            if quoted:
+                self.edges[record_id].update(record_references(record))
+            if name == 'CTRL' and (record.get_str('FUNCTION_TYPE') or '').upper() in _ROOT_FUNCTION_TYPES:
+                self.roots.add(record_id)
+        elif quoted:
+            self.roots.update(record_references(record))
+
+    def add_raw(self, data, start=0, end=None):
+        """
+        Ссылки неразобранного участка файла без &CTRL/&RAMP: строки в кавычках, кроме значений ID.
+
+        Участок может содержать несколько записей и строки вне namelist. Строки
+        в кавычках из комментариев тоже считаются ссылками - &CTRL/&RAMP из-за
+        этого могут быть сохранены, но не удалены ошибочно.
+
+        :param data: Байты файла в FDS_ENCODING (bytes или mmap).
+        :param start: Начало участка.
+        :param end: Конец участка (по умолчанию - конец data).
+        """
+        end = len(data) if end is None else end
+        found = {match.group(1) or match.group(2) for match in _RAW_REFERENCE_RE.finditer(data, start, end)}
+        self.roots.update(reference.decode(FDS_ENCODING) for reference in found if reference)
+
+    def unreachable(self):
+        """
+        ID &CTRL/&RAMP, недостижимые из корней (обход за линейное время).
+
+        :return: Множество ID.
+        """
+        stack = [record_id for record_id in self.roots if record_id in self.defined]
+        reached = set(stack)
+        while stack:
+            for reference in self.edges.get(stack.pop(), ()):
+                if reference in self.defined and reference not in reached:
+                    reached.add(reference)
+                    stack.append(reference)
+        return self.defined - reached
+
+
+class ReferenceGraphStage(Stage):
+    """Построение ReferenceGraph по проходящим записям (записи не изменяются)."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def feed(self, record):
+        self.graph.add(record)
+        return (record,)
+
+
+class PruneStage(Stage):
+    """Удаление &CTRL/&RAMP с ID из множества dead (см. ReferenceGraph.unreachable)."""
+
+    names = PRUNABLE_NAMES
+
+    def __init__(self, dead):
+        self.dead = dead
+
+    def feed(self, record):
+        if self.dead and record.name in PRUNABLE_NAMES and record.get_str('ID') in self.dead:
+            return ()
+        return (record,)
+
+
+def build_reference_graph(fds_path, stages=()):
+    """
+    Строит граф ссылок .fds файла после применения стадий (файл не изменяется).
+
+    :param fds_path: Путь к .fds файлу.
+    :param stages: Стадии, результат которых анализируется (новые экземпляры).
+    :return: ReferenceGraph.
+    """
+    graph = ReferenceGraph()
+    with open_fds(fds_path) as src:
+        for _ in run_pipeline(iter_namelists(src), list(stages) + [ReferenceGraphStage(graph)]):
+            pass
+    return graph
+
+
+def vent_area(xb):
+    """
+    Площадь прямоугольника &VENT: произведение двух наибольших размеров XB.
+
+    :param xb: [x1, x2, y1, y2, z1, z2].
+    :return: Площадь, м².
+    """
+    extents = sorted(abs(xb[i + 1] - xb[i]) for i in (0, 2, 4))
+    return extents[1] * extents[2]
+
+
+class FireInventory:
+    """
+    Сводка очагов пожара: площадь горелок, пиковая мощность и центр очага.
+
+    HRRPUA берётся из &SURF с HRRPUA, прямоугольники - из XB &VENT с SURF_ID
+    этих &SURF (порядок &SURF и &VENT в файле не важен). Центр очага -
+    среднее центров &VENT, взвешенное по мощности (по площади, если мощность нулевая).
+    """
+
+    def __init__(self):
+        self.hrrpua = {}
+        self.vents = defaultdict(list)
+
+    def add(self, record):
+        name = record.name
+        if name == 'SURF':
+            if record.has('HRRPUA') and record.id is not None:
+                self.hrrpua[record.id] = record.hrrpua or 0.0
+        elif name == 'VENT':
+            surf_id = record.surf_id
+            xb = record.xb
+            if surf_id is not None and xb is not None:
+                self.vents[surf_id].append(xb)
+
+    def surfaces(self):
+        """
+        Очаги в порядке &SURF в файле.
+
+        :return: Список словарей {'id', 'hrrpua', 'area', 'hrr', 'centroid', 'vents'};
+                 площадь в м², мощность в кВт, centroid - (x, y, z) или None.
+        """
+        surfaces = []
+        for surf_id, hrrpua in self.hrrpua.items():
+            vents = self.vents.get(surf_id, [])
+            area = sum(vent_area(xb) for xb in vents)
+            surfaces.append({
+                'id': surf_id,
+                'hrrpua': hrrpua,
+                'area': area,
+                'hrr': hrrpua * area,
+                'centroid': _weighted_centroid([(vent_area(xb), xb) for xb in vents]),
+                'vents': len(vents),
+            })
+        return surfaces
+
+    def report(self):
+        """
+        Сводка по всем очагам.
+
+        :return: Словарь {'area', 'hrr', 'centroid', 'surfaces'} (см. surfaces()).
+        """
+        surfaces = self.surfaces()
+        weighted = [(vent_area(xb) * surface['hrrpua'], xb)
+                    for surface in surfaces for xb in self.vents.get(surface['id'], [])]
+        centroid = _weighted_centroid(weighted)
+        if centroid is None:
+            centroid = _weighted_centroid([(vent_area(xb), xb)
+                                           for surface in surfaces for xb in self.vents.get(surface['id'], [])])
+        return {
+            'area': sum(surface['area'] for surface in surfaces),
+            'hrr': sum(surface['hrr'] for surface in surfaces),
+            'centroid': centroid,
+            'surfaces': surfaces,
+        }
+
+
+def _weighted_centroid(items):
+    """Взвешенный центр прямоугольников [(вес, xb), ...] или None при нулевом суммарном весе."""
+    total = sum(weight for weight, _ in items)
+    if total <= 0:
+        return None
+    return tuple(sum(weight * (xb[i] + xb[i + 1]) / 2 for weight, xb in items) / total for i in (0, 2, 4))
+
+
+class FireInventoryStage(Stage):
+    """Заполнение FireInventory по проходящим записям (записи не изменяются)."""
+
+    names = ('SURF', 'VENT')
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+
+    def feed(self, record):
+        self.inventory.add(record)
+        return (record,)
+
+
+def fire_inventory(fds_path):
+    """
+    Сводка очагов пожара .fds файла за один проход чтения (файл не изменяется).
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Словарь FireInventory.report().
+    """
+    inventory = FireInventory()
+    with open_fds(fds_path) as src:
+        for _ in run_pipeline(iter_namelists(src), [FireInventoryStage(inventory)]):
+            pass
+    return inventory.report()
+
+
+def surf_fix_stages(hrrpua, tau_q, per_surf=None):
+    """
+    Стадии исправления SURF_FIX.
+
+    :param hrrpua: Значение HRRPUA, кВт/м² (None - только очаги из per_surf).
+    :param tau_q: Значение TAU_Q (отрицательное), сек.
+    :param per_surf: Словарь {ID &SURF: (HRRPUA, TAU_Q)} для отдельных очагов.
+    :return: Список стадий для rewrite_fds_file(); первая - SurfHrrpuaStage.
+    """
+    surf_stage = SurfHrrpuaStage(hrrpua, tau_q, per_surf)
+    return [surf_stage, VentStripStage(surf_stage), ObstCtrlStage(surf_stage)]
+
+
+def surf_fix_pipeline(fds_path, hrrpua, tau_q, marker_state=None, per_surf=None, prune=True, params_hash=None,
+                      inventory=None):
+    """
+    Стадии SURF_FIX для файла, при необходимости с меткой CheckSURFFIX последней стадией.
+
+    При prune=True файл предварительно читается для построения графа ссылок
+    (см. ReferenceGraph) по результату SURF_FIX, и &CTRL/&RAMP, на которые
+    больше нет ссылок, удаляются при перезаписи. Режим минимальных правок
+    строит граф в том же проходе (prune=False и ReferenceGraph в fds_splice.compute_edits).
+
+    :param fds_path: Путь к .fds файлу (для графа ссылок и существующей метки).
+    :param hrrpua: Значение HRRPUA, кВт/м² (None - только очаги из per_surf).
+    :param tau_q: Значение TAU_Q (отрицательное), сек.
+    :param marker_state: Если задано, добавляется CheckMarkerStage.
+    :param per_surf: Словарь {ID &SURF: (HRRPUA, TAU_Q)} для отдельных очагов.
+    :param prune: Удалять недостижимые &CTRL/&RAMP.
+    :param params_hash: Хэш параметров (surf_fix_hash) для записи в метку.
+    :param inventory: FireInventory, заполняемый по результату SURF_FIX в том же проходе.
+    :return: Список стадий; первая - SurfHrrpuaStage, последняя - CheckMarkerStage (если задана).
+    """
+    stages = surf_fix_stages(hrrpua, tau_q, per_surf)
+    if prune:
+        graph = build_reference_graph(fds_path, surf_fix_stages(hrrpua, tau_q, per_surf))
+        stages.append(PruneStage(graph.unreachable()))
+    if inventory is not None:
+        stages.append(FireInventoryStage(inventory))
+    if marker_state is not None:
+        stages.append(CheckMarkerStage(marker_state, read_check_marker(fds_path), params_hash))
+    return stages
+
+
+def apply_surf_fix(fds_path, hrrpua, tau_q, fsync=False, marker_state=None, per_surf=None, chunksize=None,
+                   inventory=None):
+    """
+    Потоково и атомарно переписывает .fds файл с исправлением SURF_FIX.
+
+    :param fds_path: Путь к .fds файлу.
+    :param hrrpua: Значение HRRPUA, кВт/м² (None - только очаги из per_surf).
+    :param tau_q: Значение TAU_Q (отрицательное), сек.
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :param marker_state: Если задано, метка CheckSURFFIX записывается в том же проходе.
+    :param per_surf: Словарь {ID &SURF: (HRRPUA, TAU_Q)} для отдельных очагов.
+    :param chunksize: Число записей в группе при перезаписи (см. rewrite_fds_file).
+    :param inventory: FireInventory для сводки очагов (заполняется в том же проходе).
+    :return: Итоговое состояние метки CheckSURFFIX или None.
+    """
+    stages = surf_fix_pipeline(fds_path, hrrpua, tau_q, marker_state, per_surf, inventory=inventory)
+    rewrite_fds_file(fds_path, stages, fsync, chunksize)
+    return stages[-1].state if marker_state is not None else None
+
+
+_TEMPERATURE_GROUP_RE = re.compile(r'^\d+\.(\d+)$')
+
+
+class DevcInjectStage(Stage):
+    """
+    Добавление &DEVC для расчёта СПДЗ (INIT_md) после каждой &INIT с TEMPERATURE.
+
+    Дробная часть TEMPERATURE задаёт группу помещений; для каждой &INIT
+    создаются DEVC высоты слоя, плотности и температуры, а для первой &INIT
+    группы также DEVC массового расхода.
+    """
+
+    names = ('INIT',)
+
+    def __init__(self, delta_z):
+        self.delta_z = delta_z
+        self.counters = defaultdict(int)
+        self.mass_flow_created = set()
+
+    def feed(self, record):
+        if record.name != 'INIT':
+            return (record,)
+        # Группа задаётся дробной частью TEMPERATURE в записи файла (20.0001 -> '0001')
+        suffix_match = _TEMPERATURE_GROUP_RE.match(record.get('TEMPERATURE') or '')
+        if not suffix_match:
+            return (record,)
+        xb = record.xb
+        if xb is None:
+            return (record,)
+        x1, x2, y1, y2, z1, z2 = xb
+        z2_adjusted = z2 - self.delta_z
+        group_key = suffix_match.group(1)
+        self.counters[group_key] += 1
+        devc_id_suffix = f"_{group_key}_{self.counters[group_key]}"
+        devc_ids = [
+            f"h{devc_id_suffix}",
+            f"Density_VM{devc_id_suffix}",
+            f"Tg 3D{devc_id_suffix}"
+        ]
+        devc_lines = [
+            f"&DEVC ID='{devc_ids[0]}', QUANTITY='LAYER HEIGHT', XB={x1},{x2},{y1},{y2},{z1},{z2_adjusted}/\n",
+            f"&DEVC ID='{devc_ids[1]}', QUANTITY='DENSITY', STATISTICS='VOLUME MEAN', XB={x1},{x2},{y1},{y2},{z1},{z2_adjusted}/\n",
+            f"&DEVC ID='{devc_ids[2]}', QUANTITY='GAS TEMPERATURE', STATISTICS='MEAN', XB={x1},{x2},{y1},{y2},{z1},{z2_adjusted}/\n",
+        ]
+        if group_key not in self.mass_flow_created:
+            devc_ids_mass_flow = f"MFLOW+{devc_id_suffix}"
+            devc_lines.append(f"&DEVC ID='{devc_ids_mass_flow}', QUANTITY='MASS FLOW +', XB={x1},{x2},{y1},{y2},{z2_adjusted},{z2_adjusted}/\n")
+            self.mass_flow_created.add(group_key)
+        return (record,) + tuple(make_record('DEVC', line) for line in devc_lines)
+
+
+class MeshReplaceStage(Stage):
+    """
+    Замена &MESH по порядковому номеру в файле.
+
+    :param replacements: Словарь {номер &MESH (с 0): текст замены}; пустая строка удаляет запись.
+    :param default: Текст для &MESH, отсутствующих в replacements; None сохраняет исходную запись.
+    :param drop_names: Имена namelist-групп, которые удаляются целиком (например, ('VENT',)).
+    """
+
+    def __init__(self, replacements, default=None, drop_names=()):
+        self.replacements = replacements
+        self.default = default
+        self.drop_names = drop_names
+        self.mesh_index = 0
+        self.names = ('MESH',) + tuple(drop_names)
+
+    def feed(self, record):
+        name = record.name
+        if name in self.drop_names:
+            return ()
+        if name != 'MESH':
+            return (record,)
+        text = self.replacements.get(self.mesh_index, self.default)
+        self.mesh_index += 1
+        if text is None:
+            return (record,)
+        if not text:
+            return ()
+        return (make_record('MESH', text),)
+
+
+_CHECK_MARKER_RE = re.compile(r'^CheckSURFFIX=(Done|None)(?:[ \t]+HASH=\S*)?\s*$')
+
+
+def surf_fix_hash(*values):
+    """
+    Хэш входных параметров SURF_FIX для метки CheckSURFFIX.
+
+    :param values: Параметры расчёта (k, Fpom, v, ..., диалект FDS) в фиксированном порядке.
+    :return: Шестнадцатеричная строка.
+    """
+    return hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).hexdigest()
+
+
+# Записи, которые меняет SURF_FIX: их текст входит в хэш метки CheckSURFFIX; &OBST - только со ссылкой на &CTRL
+FIX_DIGEST_NAMES = ('SURF', 'VENT', 'OBST') + PRUNABLE_NAMES
+FIX_DIGEST_FILTERS = {'OBST': ObstCtrlStage.filters['OBST']}
+
+
+def is_fix_digest_record(name, text):
+    """Входит ли запись в хэш записей SURF_FIX (см. FIX_DIGEST_NAMES и FIX_DIGEST_FILTERS)."""
+    if name not in FIX_DIGEST_NAMES:
+        return False
+    pattern = FIX_DIGEST_FILTERS.get(name)
+    return pattern is None or pattern.search(text.encode(FDS_ENCODING)) is not None
+
+
+def fix_records_digest(texts):
+    """
+    Хэш текста записей, которые меняет SURF_FIX (без учёта вида перевода строки).
+
+    :param texts: Тексты записей (is_fix_digest_record) в FDS_ENCODING в порядке следования в файле.
+    :return: Шестнадцатеричная строка.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for text in texts:
+        digest.update(text.replace('\r\n', '\n').encode(FDS_ENCODING))
+    return digest.hexdigest()
+
+
+class CheckMarkerStage(Stage):
+    """
+    Метка CheckSURFFIX=state в конце .fds файла.
+
+    Существующая метка удаляется из потока и дописывается в конец файла.
+    Состояние, уже записанное в файле, имеет приоритет над переданным.
+
+    При заданном params_hash метка "Done" записывается как
+    CheckSURFFIX=state HASH=<хэш параметров>:<хэш записей>, где хэш записей
+    покрывает итоговые &SURF, &VENT, &CTRL, &RAMP и &OBST с CTRL_ID
+    (fix_records_digest), что позволяет
+    при повторном запуске с теми же параметрами не переписывать файл
+    (см. read_check_hash, fds_splice.surf_fix_is_current). Строка по-прежнему
+    начинается с CheckSURFFIX=Done, поэтому проверки по подстроке (read_check_marker,
+    update_check_marker, запускающие программы) читают обе формы; старая метка
+    без хэша читается как состояние без хэша.
+
+    :param state: Состояние ("Done" или "None").
+    :param existing: Состояние, заранее прочитанное из файла, или None.
+    :param params_hash: Хэш параметров (surf_fix_hash) или None.
+    """
+
+    def __init__(self, state, existing=None, params_hash=None):
+        self.state = existing or state
+        self.found = existing is not None
+        self.last_text = ''
+        self.params_hash = params_hash
+        self.digest_records = []
+        # ID &CTRL/&RAMP, удаляемых после прохода (fds_splice.compute_edits с графом ссылок)
+        self.pruned = frozenset()
+        # Метка ищется в последних MARKER_TAIL_SIZE байтах (см. read_check_marker), которые
+        # compute_edits всегда разбирает целиком; из остального файла нужны только записи для хэша
+        self.names = FIX_DIGEST_NAMES if params_hash is not None else ()
+        self.filters = FIX_DIGEST_FILTERS if params_hash is not None else {}
+
+    def feed(self, record):
+        if self.params_hash is not None and is_fix_digest_record(record.name, record.text):
+            self.digest_records.append(record)
+        if record.name is None:
+            match = _CHECK_MARKER_RE.match(record.text)
+            if match:
+                if not self.found or match.group(1) == "Done":
+                    self.state = match.group(1)
+                    self.found = True
+                return ()
+        self.last_text = record.text
+        return (record,)
+
+    def close(self):
+        prefix = '' if self.found else '\n'
+        if self.last_text and not self.last_text.endswith('\n'):
+            prefix = '\n' + prefix
+        marker = f'CheckSURFFIX={self.state}'
+        if self.params_hash is not None and self.state == "Done":
+            texts = [record.text for record in self.digest_records
+                     if record.name not in PRUNABLE_NAMES or record.get_str('ID') not in self.pruned]
+            marker += f' HASH={self.params_hash}:{fix_records_digest(texts)}'
+        return (Record(None, f'{prefix}{marker}\n'),)
+
+
+MARKER_TAIL_SIZE = 4096
+_CHECK_MARKER_BYTES_RE = re.compile(rb'CheckSURFFIX=(Done|None)')
+_CHECK_HASH_BYTES_RE = re.compile(rb'CheckSURFFIX=Done[ \t]+HASH=([0-9a-f]+):([0-9a-f]+)')
+
+
+def _read_tail(fds_path):
+    """Последние MARKER_TAIL_SIZE байт (распакованного) файла."""
+    if compression_codec(fds_path) is not None:
+        # В сжатом потоке нет перехода к концу - файл распаковывается до конца, хранится только хвост
+        tail = b''
+        with open_fds(fds_path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+                tail = (tail + block)[-MARKER_TAIL_SIZE:]
+    else:
+        with open(fds_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - MARKER_TAIL_SIZE))
+            tail = f.read()
+    return tail
+
+
+def read_check_marker(fds_path):
+    """
+    Читает состояние метки CheckSURFFIX из последних MARKER_TAIL_SIZE байт файла.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: "Done", "None" или None, если метка не найдена.
+    """
+    matches = _CHECK_MARKER_BYTES_RE.findall(_read_tail(fds_path))
+    if b'Done' in matches:
+        return "Done"
+    if matches:
+        return "None"
+    return None
+
+
+def read_check_hash(fds_path):
+    """
+    Читает хэш из метки CheckSURFFIX=Done HASH=... в конце файла.
+
+    :param fds_path: Путь к .fds файлу.
+    :return: Кортеж (хэш параметров, хэш записей SURF_FIX) или None, если хэша нет.
+    """
+    matches = _CHECK_HASH_BYTES_RE.findall(_read_tail(fds_path))
+    if not matches:
+        return None
+    params_hash, surf_hash = matches[-1]
+    return params_hash.decode('ascii'), surf_hash.decode('ascii')
+
+
+def update_check_marker(fds_path, state):
+    """
+    Обновляет метку CheckSURFFIX, переписывая только конец файла.
+
+    Состояние, уже записанное в файле, имеет приоритет над переданным.
+    Если метки нет в последних MARKER_TAIL_SIZE байтах, она дописывается в конец.
+    Сжатый файл нельзя изменить на месте, поэтому он перезаписывается целиком.
+
+    :param fds_path: Путь к .fds файлу.
+    :param state: Состояние ("Done" или "None").
+    :return: Итоговое состояние метки.
+    """
+    if compression_codec(fds_path) is not None:
+        stage = CheckMarkerStage(state)
+        rewrite_fds_file(fds_path, [stage])
+        return stage.state
+    with open(fds_path, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        tail_start = max(0, f.tell() - MARKER_TAIL_SIZE)
+        f.seek(tail_start)
+        tail = f.read()
+        matches = _CHECK_MARKER_BYTES_RE.findall(tail)
+        if matches:
+            state = "Done" if b'Done' in matches else "None"
+            f.seek(tail_start)
+            f.write(_CHECK_MARKER_BYTES_RE.sub(b'CheckSURFFIX=' + state.encode('ascii'), tail))
+            f.truncate()
+        else:
+            newline = b'\r\n' if b'\r\n' in tail else b'\n'
+            f.write(newline + b'CheckSURFFIX=' + state.encode('ascii') + newline)
+    return state
+
+
+def scenario_pipeline(fds_path, hrrpua=None, tau_q=None, per_surf=None, delta_z=None, mesh_stage=None,
+                      marker_state=None, params_hash=None, prune=True, inventory=None):
+    """
+    Стадии подготовки сценария за один проход: SURF_FIX, DEVC для INIT_md, замена &MESH и метка CheckSURFFIX.
+
+    Каждое преобразование необязательно; метка добавляется последней стадией,
+    поэтому её хэш покрывает итоговые записи (см. CheckMarkerStage).
+
+    :param fds_path: Путь к .fds файлу (для графа ссылок и существующей метки).
+    :param hrrpua: Значение HRRPUA, кВт/м²; None и пустой per_surf - без SURF_FIX.
+    :param tau_q: Значение TAU_Q (отрицательное), сек.
+    :param per_surf: Словарь {ID &SURF: (HRRPUA, TAU_Q)} для отдельных очагов.
+    :param delta_z: Если задано, добавляется DevcInjectStage(delta_z).
+    :param mesh_stage: Стадия замены &MESH (fds_mesh.partition_mesh_stage и др.) или None.
+    :param marker_state: Если задано, добавляется CheckMarkerStage.
+    :param params_hash: Хэш параметров (surf_fix_hash) для записи в метку.
+    :param prune: Удалять недостижимые &CTRL/&RAMP (см. surf_fix_pipeline).
+    :param inventory: FireInventory, заполняемый по результату SURF_FIX в том же проходе.
+    :return: Список стадий для rewrite_fds_file() или fds_splice.splice_fds_file().
+    """
+    stages = []
+    if hrrpua is not None or per_surf:
+        stages = surf_fix_pipeline(fds_path, hrrpua, tau_q, per_surf=per_surf, prune=prune, inventory=inventory)
+    if delta_z is not None:
+        stages.append(DevcInjectStage(delta_z))
+    if mesh_stage is not None:
+        stages.append(mesh_stage)
+    if marker_state is not None:
+        stages.append(CheckMarkerStage(marker_state, read_check_marker(fds_path), params_hash))
+    return stages
+
+
+def prepare_scenario(fds_path, hrrpua=None, tau_q=None, per_surf=None, delta_z=None, mesh_stage=None,
+                     marker_state=None, params_hash=None, fsync=False, chunksize=None):
+    """
+    Подготавливает сценарий одной перезаписью файла (стадии scenario_pipeline).
+
+    Вместо отдельных проходов SURF_FIX, INIT_md и инструментов MESH файл
+    читается и пишется один раз. Записи &MESH для mesh_stage читаются заранее
+    по индексу (fds_mesh.read_mesh_records); граф ссылок для удаления
+    &CTRL/&RAMP строится предварительным чтением (см. surf_fix_pipeline).
+    Параметры преобразований - как у scenario_pipeline.
+
+    :param fds_path: Путь к .fds файлу.
+    :param fsync: Если True, данные сбрасываются на диск до подмены файла.
+    :param chunksize: Число записей в группе при перезаписи (см. rewrite_fds_file).
+    :return: Список применённых стадий (состояние метки - stages[-1].state).
+    """
+    stages = scenario_pipeline(fds_path, hrrpua, tau_q, per_surf, delta_z, mesh_stage, marker_state, params_hash)
+    rewrite_fds_file(fds_path, stages, fsync, chunksize)
+    return stages
@@ -0,0 +1,322 @@
+"""
+Пакетный SURF_FIX для каталога сценариев без графического интерфейса.
+
+Манифест (JSON или CSV) задаёт параметры Приложения 1 Методики 1140 для каждого
+файла или шаблона пути (glob). Пути задаются относительно манифеста; более
+поздние строки манифеста переопределяют более ранние для одних и тех же файлов.
+
+JSON:
+    [{"path": "variants/*/fds/*.fds", "k": 2, "Fpom": 39, "v": 0.042,
+      "psi_ud": 0.0129, "m": 0, "HOC": 14000, "dialect": "fds6"}, ...]
+
+Для сценариев с несколькими очагами параметры задаются по ID &SURF в "sources";
+недостающие поля берутся из записи. Очаги без своих параметров получают
+параметры записи, а если в записи они не заданы - остаются без изменений:
+    {"path": "two_rooms.fds", "k": 2, "psi_ud": 0.0129, "v": 0.042, "HOC": 14000,
+     "sources": {"FIRE1": {"Fpom": 39}, "FIRE2": {"Fpom": 12, "v": 0.0055}}}
+
+CSV (заголовок обязателен; необязательная колонка surf_id задаёт параметры очага):
+    path,surf_id,k,Fpom,v,psi_ud,m,HOC,dialect
+
+Запуск:
+    python fsf_batch.py manifest.json [--workers N] [--summary summary.json] [--splice]
+    python fsf_batch.py manifest.json --dry-run    (unified diff в stdout, файлы не меняются)
+
+Результат SURF_FIX проверяется в том же проходе (fds_lint); найденные ошибки
+попадают в поле lint сводки, а статус файла становится warning.
+
+В том же проходе собирается сводка очагов (fds_stream.FireInventory): площадь
+горелок fire_area (м²), пиковая мощность fire_hrr (кВт) и центр очага fire_centroid (x;y;z).
+
+Перед перезаписью каждого файла сохраняется снимок (fds_snapshot); --no-snapshot отключает снимки.
+
+Код возврата: 0 - все файлы обработаны (в том числе с предупреждениями lint),
+1 - есть ошибки, 2 - ошибка манифеста.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fds_stream import (FireInventory, ReferenceGraph, detect_encoding, rewrite_fds_file, surf_fix_pipeline,
+                        to_display, to_fds_text)
+from fds_splice import preview_surf_fix, splice_fds_file
+from fds_snapshot import take_snapshot
+from fds_lint import LintStage
+from appendix1 import DIALECTS, calculate_fire_parameters
+
+REQUIRED_FIELDS = ('k', 'Fpom', 'v', 'psi_ud', 'HOC')
+SUMMARY_FIELDS = ('path', 'status', 'tmax', 'Psi', 'HRRPUA', 'TAU_Q', 'fire_surfaces', 'fire_area', 'fire_hrr',
+                  'fire_centroid', 'lint', 'seconds', 'error')
+
+
+def _parse_params(fields, label, inherited=None):
+    """
+    Разбирает параметры Приложения 1 из записи манифеста.
+
+    :param fields: Поля записи (словарь).
+    :param label: Описание записи для сообщений об ошибках.
+    :param inherited: Параметры, которые дополняются полями записи.
+    :return: Кортеж (параметры, список незаданных обязательных полей).
+    :raises ValueError: Если значение некорректно.
+    """
+    params = dict(inherited or {})
+    for field in REQUIRED_FIELDS + ('m',):
+        value = fields.get(field)
+        if value in (None, ''):
+            continue
+        try:
+            params[field] = float(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{label}: некорректное число ({e})")
+    params.setdefault('m', 0.0)
+    params['dialect'] = (fields.get('dialect') or params.get('dialect') or 'fds6').lower()
+    if params['dialect'] not in DIALECTS:
+        raise ValueError(f"{label}: неизвестный dialect '{params['dialect']}'")
+    return params, [field for field in REQUIRED_FIELDS if field not in params]
+
+
+def read_manifest(manifest_path):
+    """
+    Читает манифест и разворачивает шаблоны путей.
+
+    :param manifest_path: Путь к манифесту (.json или .csv).
+    :return: Словарь {абсолютный путь .fds: {'defaults': параметры или None, 'sources': {ID &SURF: параметры}}}.
+    :raises ValueError: Если манифест некорректен.
+    """
+    if manifest_path.lower().endswith('.csv'):
+        with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+            entries = list(csv.DictReader(f))
+    else:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = [entries]
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = {}
+    for number, entry in enumerate(entries, 1):
+        label = f"Запись {number}"
+        if entry.get('path') in (None, ''):
+            raise ValueError(f"{label}: не задано поле path")
+        params, missing = _parse_params(entry, label)
+        sources = dict(entry.get('sources') or {})
+        surf_id = entry.get('surf_id')
+        if surf_id:
+            # Строка CSV с surf_id задаёт параметры одного очага
+            if missing:
+                raise ValueError(f"{label}: не заданы поля {', '.join(missing)}")
+            sources, params, missing = {surf_id: params}, None, []
+        elif missing and not sources:
+            raise ValueError(f"{label}: не заданы поля {', '.join(missing)}")
+        parsed_sources = {}
+        for source_id, fields in sources.items():
+            if not isinstance(fields, dict):
+                raise ValueError(f"{label}, SURF '{source_id}': параметры очага должны быть объектом")
+            source_params, source_missing = _parse_params(fields, f"{label}, SURF '{source_id}'", params)
+            if source_missing:
+                raise ValueError(f"{label}, SURF '{source_id}': не заданы поля {', '.join(source_missing)}")
+            parsed_sources[source_id] = source_params
+
+        pattern = os.path.join(base_dir, entry['path'])
+        for fds_path in sorted(glob.glob(pattern, recursive=True)):
+            if os.path.isfile(fds_path):
+                job = jobs.setdefault(os.path.abspath(fds_path), {'defaults': None, 'sources': {}})
+                if params is not None and not missing:
+                    job['defaults'] = params
+                job['sources'].update(parsed_sources)
+    return jobs
+
+
+def _fire_values(params):
+    """Параметры пожара для набора параметров манифеста; Ψ и tmax должны быть ненулевыми."""
+    values = calculate_fire_parameters(params['k'], params['Fpom'], params['v'], params['psi_ud'],
+                                       params['m'], params['HOC'], params['dialect'])
+    if not values['Psi'] or not values['TAU_Q']:
+        raise ValueError("Ψ и tmax не должны быть нулевыми")
+    return values
+
+
+def scenario_values(job):
+    """
+    Рассчитывает параметры пожара сценария.
+
+    :param job: Задание из read_manifest().
+    :return: Кортеж (значения по умолчанию или None, {ID &SURF: значения}).
+    """
+    defaults = _fire_values(job['defaults']) if job['defaults'] is not None else None
+    sources = {surf_id: _fire_values(params) for surf_id, params in job['sources'].items()}
+    return defaults, sources
+
+
+def _fix_arguments(fds_path, defaults, sources):
+    """
+    Аргументы hrrpua, tau_q и per_surf для surf_fix_pipeline().
+
+    ID &SURF с кириллицей переводятся в представление текста записей (fds_stream.FDS_ENCODING)
+    по кодировке файла; для ASCII-идентификаторов файл не читается.
+    """
+    encoding = None
+    if not all(surf_id.isascii() for surf_id in sources):
+        encoding = detect_encoding(fds_path)
+    per_surf = {to_fds_text(surf_id, encoding): (values['HRRPUA'], values['TAU_Q'])
+                for surf_id, values in sources.items()}
+    if defaults is None:
+        return None, None, per_surf
+    return defaults['HRRPUA'], defaults['TAU_Q'], per_surf
+
+
+def process_scenario(fds_path, job, splice=False, snapshot=True):
+    """
+    Рассчитывает параметры и применяет SURF_FIX к одному файлу за один проход.
+
+    :param fds_path: Путь к .fds файлу.
+    :param job: Задание из read_manifest().
+    :param splice: Переписывать только изменённые записи (fds_splice).
+    :param snapshot: Сохранять снимок файла перед перезаписью.
+    :return: Словарь с результатом для сводки.
+    """
+    started = time.perf_counter()
+    result = {'path': fds_path, 'status': 'ok', 'error': ''}
+    try:
+        defaults, sources = scenario_values(job)
+        hrrpua, tau_q, per_surf = _fix_arguments(fds_path, defaults, sources)
+        inventory = FireInventory()
+        # В режиме splice недостижимые &CTRL/&RAMP удаляются в том же проходе (fds_splice.compute_edits)
+        stages = surf_fix_pipeline(fds_path, hrrpua, tau_q, marker_state="Done", per_surf=per_surf,
+                                   prune=not splice, inventory=inventory)
+        lint = LintStage()
+        stages.append(lint)
+        if snapshot:
+            take_snapshot(fds_path, "SURF_FIX (batch)")
+        if splice:
+            splice_fds_file(fds_path, stages, graph=ReferenceGraph())
+        else:
+            rewrite_fds_file(fds_path, stages)
+
+        fire_surfaces = [to_display(surf_id) for surf_id in stages[0].fire_surfaces if surf_id is not None]
+        result['fire_surfaces'] = ';'.join(fire_surfaces)
+        report = inventory.report()
+        result['fire_area'] = round(report['area'], 4)
+        result['fire_hrr'] = round(report['hrr'], 2)
+        result['fire_centroid'] = ';'.join(f"{value:.3f}" for value in report['centroid'] or ())
+        result['fires'] = {to_display(surface['id']): {'area': round(surface['area'], 4),
+                                                       'hrr': round(surface['hrr'], 2),
+                                                       'centroid': [round(value, 3) for value in surface['centroid'] or ()],
+                                                       'vents': surface['vents']}
+                           for surface in report['surfaces']}
+        if defaults is not None:
+            result.update({key: defaults[key] for key in ('tmax', 'Psi', 'HRRPUA', 'TAU_Q')})
+        if sources:
+            result['sources'] = {surf_id: {key: values[key] for key in ('tmax', 'Psi', 'HRRPUA', 'TAU_Q')}
+                                 for surf_id, values in sources.items()}
+        result['lint'] = '; '.join(f"{code}: {message}" for code, message in lint.issues)
+        if lint.issues:
+            result['status'] = 'warning'
+        unknown = [surf_id for surf_id in sources if surf_id not in fire_surfaces]
+        if unknown:
+            result['status'] = 'warning'
+            result['error'] = f"Очаги не найдены в файле: {', '.join(unknown)}"
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def preview_batch(jobs, out=sys.stdout):
+    """
+    Выводит unified diff SURF_FIX для всех файлов, ничего не записывая.
+
+    :param jobs: Словарь заданий из read_manifest().
+    :param out: Поток вывода diff.
+    :return: Список путей, для которых расчёт или чтение завершились ошибкой.
+    """
+    failed = []
+    for fds_path in sorted(jobs):
+        try:
+            hrrpua, tau_q, per_surf = _fix_arguments(fds_path, *scenario_values(jobs[fds_path]))
+            out.writelines(preview_surf_fix(fds_path, hrrpua, tau_q, marker_state="Done", per_surf=per_surf))
+        except Exception as e:
+            print(f"[error] {fds_path} {e}", file=sys.stderr)
+            failed.append(fds_path)
+    return failed
+
+
+def run_batch(jobs, workers=None, splice=False, snapshot=True):
+    """
+    Обрабатывает файлы параллельно в пуле процессов.
+
+    :param jobs: Словарь заданий из read_manifest().
+    :param workers: Число процессов (по умолчанию - число ядер).
+    :param splice: Переписывать только изменённые записи (fds_splice).
+    :param snapshot: Сохранять снимки файлов перед перезаписью.
+    :return: Список результатов в порядке путей.
+    """
+    paths = sorted(jobs)
+    if not paths:
+        return []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        return [process_scenario(path, jobs[path], splice, snapshot) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(process_scenario, paths, [jobs[path] for path in paths],
+                                 [splice] * len(paths), [snapshot] * len(paths)))
+
+
+def write_summary(results, summary_path):
+    """Записывает сводку в JSON или CSV (по расширению файла)."""
+    if summary_path.lower().endswith('.csv'):
+        with open(summary_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный SURF_FIX по манифесту (JSON или CSV).")
+    parser.add_argument('manifest', help="Путь к манифесту .json или .csv")
+    parser.add_argument('--workers', type=int, default=None, help="Число процессов (по умолчанию - число ядер)")
+    parser.add_argument('--summary', default=None, help="Файл сводки .json или .csv (по умолчанию <манифест>.summary.json)")
+    parser.add_argument('--splice', action='store_true', help="Переписывать только изменённые записи (режим минимальных правок)")
+    parser.add_argument('--dry-run', action='store_true', help="Только показать изменения (unified diff), не записывая файлы")
+    parser.add_argument('--no-snapshot', action='store_true', help="Не сохранять снимки файлов перед перезаписью")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка манифеста: {e}", file=sys.stderr)
+        return 2
+    if not jobs:
+        print("Манифест не содержит ни одного существующего .fds файла.", file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        return 1 if preview_batch(jobs) else 0
+
+    results = run_batch(jobs, args.workers, args.splice, not args.no_snapshot)
+    summary_path = args.summary or os.path.splitext(args.manifest)[0] + '.summary.json'
+    write_summary(results, summary_path)
+
+    # Предупреждения lint не считаются ошибками: файл обработан, замечания - в сводке
+    failed = [result for result in results if result['status'] == 'error']
+    warnings = [result for result in results if result['status'] == 'warning']
+    for result in results:
+        print(f"[{result['status']}] {result['path']} {result['error']}".rstrip())
+        if result.get('lint'):
+            print(f"    {result['lint']}")
+    print(f"Обработано: {len(results) - len(failed)}, предупреждений: {len(warnings)}, ошибок: {len(failed)}. "
+          f"Сводка: {summary_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,23 @@ import re
 import configparser
 import json
 import logging
-from math import sqrt, pi
 
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel,
                              QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton,
-                             QMessageBox, QGroupBox, QStatusBar, QSizePolicy)
+                             QMessageBox, QGroupBox, QStatusBar, QSizePolicy,
+                             QDialog, QPlainTextEdit, QDialogButtonBox)
 from PyQt6.QtGui import QPalette, QColor, QFont
 from PyQt6.QtCore import Qt, QTimer
 
+from fds_stream import FireInventory, fire_inventory, surf_fix_hash, update_check_marker
+from fds_splice import splice_surf_fix, preview_surf_fix, surf_fix_is_current
+from fds_snapshot import take_snapshot
+from fds_lint import lint_fds_file
+from appendix1 import RoomInput, calculate, hrrpua
+
+PREVIEW_MAX_LINES = 5000
+LINT_MAX_ISSUES = 30
+
 def setup_app_palette(app_instance: QMainWindow):
     """Установка цветовой палитры для приложения."""
     palette = QPalette()
@@ -249,25 +258,15 @@ def calculate_common(app_instance, k_entry, fpom_entry, psyd_entry, v_entry, m_e
         psi_ud = safe_eval(psyd_entry[1].text())
         m = safe_eval(m_entry[1].text())
 
-        tmax = sqrt((k * Fpom) / (pi * v**2))
-        Psi = psi_ud * pi * v**2 * tmax**2
-        Stt = pi * (v * tmax)**2
         HEAT_OF_COMBUSTION = float(read_ini_file_hoc_func(ini_path_hoc))
-        Hc = HEAT_OF_COMBUSTION / 1000
-
-        if m > 0:
-            bigM = Psi * tmax
-            Psi = m / tmax
-            bigM = m
-            HRRPUA = Hc * Psi * 0.93 * 1000
-        else:
-            bigM = Psi * tmax
-            HRRPUA = Hc * Psi * 0.93 * 1000
+        result = calculate(RoomInput(k, Fpom, v, psi_ud, m, HEAT_OF_COMBUSTION, 'fds6'))
+        tmax = result.tmax
         tmax_entry[1].setText(f"{tmax:.4f}")
-        psy_entry[1].setText(f"{Psi:.4f}")
-        hrr_entry[1].setText(f"{HRRPUA:.4f}")
-        stt_entry[1].setText(f"{Stt:.4f}")
-        bigM_entry[1].setText(f"{bigM:.4f}")
+        psy_entry[1].setText(f"{result.Psi:.4f}")
+        hrr_entry[1].setText(f"{result.HRRPUA:.4f}")
+        stt_entry[1].setText(f"{result.Stt:.4f}")
+        bigM_entry[1].setText(f"{result.bigM:.4f}")
+        app_instance.appendix1_result = result
 
         stt_entry[1].setToolTip(f"Площадь поверхности горючей нагрузки в помещении, охватываемая пожаром за время tmax = {tmax:.4f} м²")
         process_button.setEnabled(True)
@@ -291,27 +290,16 @@ def calculate_fds5(app_instance, k_entry, fpom_entry, psyd_entry, v_entry, m_ent
         psi_ud = safe_eval(psyd_entry.findChild(QLineEdit).text())
         m = safe_eval(m_entry.findChild(QLineEdit).text())
 
-        tmax = sqrt((k * Fpom) / (pi * v**2))
-        Psi = psi_ud * pi * v**2 * tmax**2
-        Stt = pi * (v * tmax)**2
         HEAT_OF_COMBUSTION = float(read_ini_file_hoc_func(ini_path_hoc))
-        Hc = HEAT_OF_COMBUSTION / 1000
-
-        if m > 0:
-            bigM = Psi * tmax
-            Psi = m / tmax
-            bigM = m
-            HRRPUA = Hc * Psi * 0.93 * 1000
-        else:
-            bigM = Psi * tmax
-            Psi = 0.45 * (1 / k) * (bigM / tmax)
-            HRRPUA = Hc * Psi * 0.93 * 1000
+        result = calculate(RoomInput(k, Fpom, v, psi_ud, m, HEAT_OF_COMBUSTION, 'fds5'))
+        tmax = result.tmax
 
         tmax_entry.findChild(QLineEdit).setText(f"{tmax:.4f}")
-        psy_entry.findChild(QLineEdit).setText(f"{Psi:.4f}")
-        hrr_entry.findChild(QLineEdit).setText(f"{HRRPUA:.4f}")
-        stt_entry.findChild(QLineEdit).setText(f"{Stt:.4f}")
-        bigM_entry.findChild(QLineEdit).setText(f"{bigM:.4f}")
+        psy_entry.findChild(QLineEdit).setText(f"{result.Psi:.4f}")
+        hrr_entry.findChild(QLineEdit).setText(f"{result.HRRPUA:.4f}")
+        stt_entry.findChild(QLineEdit).setText(f"{result.Stt:.4f}")
+        bigM_entry.findChild(QLineEdit).setText(f"{result.bigM:.4f}")
+        app_instance.appendix1_result = result
 
         stt_entry.findChild(QLineEdit).setToolTip(f"Площадь поверхности горючей нагрузки в помещении, охватываемая пожаром за время tₘₐₓ = {tmax:.4f} м²")
 
@@ -325,6 +313,19 @@ def calculate_fds5(app_instance, k_entry, fpom_entry, psyd_entry, v_entry, m_ent
         QMessageBox.critical(app_instance, "Ошибка", f"Произошла ошибка: {ex}")
         status_bar.showMessage("Произошла критическая ошибка.")
 
+def precise_appendix1(app_instance, tmax_text, psi_text):
+    """
+    Результат последнего расчёта Приложения 1 с полной точностью (appendix1.FireParameters).
+
+    Поля tmax и Psi показывают значения, округлённые до 4 знаков; если они не
+    изменены вручную после расчёта, для .fds используются точные значения.
+    Иначе возвращается None и используются значения полей.
+    """
+    result = getattr(app_instance, 'appendix1_result', None)
+    if result is None or tmax_text != f"{result.tmax:.4f}" or psi_text != f"{result.Psi:.4f}":
+        return None
+    return result
+
 def save_to_ini_common(k, Fpom, v, psi_ud, m, tmax, Psi, Stt, bigM, HRRPUA):
     """Сохранение значений в INI файл для common."""
     config = configparser.ConfigParser()
@@ -364,7 +365,7 @@ def read_ini_file_hoc(ini_file):
         config.read_file(f)
     return config['HEAT_OF_COMBUSTION']['HEAT_OF_COMBUSTION']
 
-def process_fds_file_common(app_instance, k_entry, fpom_entry, psyd_entry, v_entry, m_entry, tmax_entry, psy_entry, hrr_entry, stt_entry, bigM_entry, process_button, process_id, read_ini_file_path_func, read_ini_file_hoc_func):
+def process_fds_file_common(app_instance, k_entry, fpom_entry, psyd_entry, v_entry, m_entry, tmax_entry, psy_entry, hrr_entry, stt_entry, bigM_entry, process_button, process_id, read_ini_file_path_func, read_ini_file_hoc_func, fds_dialect="FDS6"):
     """Обработка FDS файла для common."""
     k = k_entry[1].text()
     Fpom = fpom_entry[1].text()
@@ -387,85 +388,34 @@ def process_fds_file_common(app_instance, k_entry, fpom_entry, psyd_entry, v_ent
 
     try:
         HEAT_OF_COMBUSTION = float(read_ini_file_hoc_func(ini_path_hoc))
-        Hc = HEAT_OF_COMBUSTION / 1000
         v_val = safe_convert_to_float(v_val_str)
         m_val = safe_convert_to_float(m_val_str)
-        TAU_Q = -safe_convert_to_float(tmax)
+        precise = precise_appendix1(app_instance, tmax, Psi_str)
+        TAU_Q = precise.TAU_Q if precise is not None else -safe_convert_to_float(tmax)
 
         fds_path = read_ini_file_path_func(ini_path)
 
         if m_val > 0:
             MLRPUA = m_val / -TAU_Q
         else:
-            MLRPUA = safe_convert_to_float(Psi_str)
-        HRRPUA_val = Hc * MLRPUA * 0.93 * 1000
+            MLRPUA = precise.Psi if precise is not None else safe_convert_to_float(Psi_str)
+        HRRPUA_val = hrrpua(HEAT_OF_COMBUSTION, MLRPUA)
         if not MLRPUA or not TAU_Q:
             raise ValueError("Поля не должны быть пустыми")
 
-        modified_lines = []
-        inside_surf_block = False
-        vent_seen = False
-        surf_id = None
-        hrrpua_found = False
-        remove_ctrl_ramp = False
-        with open(fds_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-            for line in lines:
-                if line.strip().startswith('&SURF'):
-                    match = re.search(r"ID='([^']*)'", line)
-                    if match:
-                        surf_id = match.group(1)
-
-                    inside_surf_block = True
-                    vent_seen = False
-                    if 'HRRPUA' in line:
-                        hrrpua_found = True
-                        modified_lines.append(f"&SURF ID='{surf_id}', ")
-                        modified_lines.append(f"HRRPUA={HRRPUA_val}, ")
-                        modified_lines.append(f"COLOR='RED', ")
-                        modified_lines.append(f"TAU_Q={TAU_Q}/\n")
-                    else:
-                        hrrpua_found = False
-                        modified_lines.append(line)
-                    continue
-
-                if inside_surf_block and hrrpua_found:
-                    if line.strip().startswith('&VENT'):
-                        line = re.sub(r"CTRL_ID='[^']*'\s*", '', line)
-                        if 'SPREAD_RATE' in line:
-                            line = re.sub(r"SPREAD_RATE=[^\s]*\s*", '', line)
-                        modified_lines.append(line)
-                        vent_seen = True
-                        continue
-
-                    if '(end)' in line:
-                        inside_surf_block = False
-                        modified_lines.append(line)
-                        continue
-
-                    continue
-
-                if line.strip().startswith('&OBST'):
-                    if 'CTRL_ID' in line:
-                        line = re.sub(r"CTRL_ID='[^']*'\s*", '', line)
-                        remove_ctrl_ramp = True
-
-                    modified_lines.append(line)
-                    continue
-
-                if remove_ctrl_ramp and (line.strip().startswith('&CTRL') or line.strip().startswith('&RAMP')):
-                    continue
-                else:
-                    remove_ctrl_ramp = False
-
-                modified_lines.append(line)
-
-        output_dir = os.path.dirname(fds_path)
-        os.makedirs(output_dir, exist_ok=True)
-        with open(fds_path, 'w', encoding='utf-8') as file:
-            file.writelines(modified_lines)
-        QMessageBox.information(app_instance, "Успех", f"Модифицированный .fds файл сохранён:\n\n{fds_path}")
-        create_check_ini_file(process_id, "Done")
+        # Повторный запуск с теми же параметрами определяется по метке в конце файла - файл не переписывается
+        params_hash = surf_fix_hash(fds_dialect, k, Fpom, v_val_str, psi_ud, m_val_str, tmax, Psi_str, HEAT_OF_COMBUSTION, HRRPUA_val, TAU_Q)
+        if surf_fix_is_current(fds_path, params_hash):
+            check_state = "Done"
+            report = fire_inventory(fds_path)
+            QMessageBox.information(app_instance, "Успех", f"Файл уже обработан с этими параметрами:\n\n{fds_path}" + format_fire_inventory(report))
+        else:
+            take_snapshot(fds_path, "SURF_FIX")
+            inventory = FireInventory()
+            check_state = splice_surf_fix(fds_path, HRRPUA_val, TAU_Q, marker_state="Done", params_hash=params_hash, inventory=inventory)
+            QMessageBox.information(app_instance, "Успех", f"Модифицированный .fds файл сохранён:\n\n{fds_path}" + format_fire_inventory(inventory.report()))
+        show_lint_issues(app_instance, fds_path)
+        create_check_ini_file(process_id, check_state, update_fds=False)
         QTimer.singleShot(1000, app_instance.close)
 
     except Exception as e:
@@ -495,91 +445,122 @@ def process_fds_file_fds5(app_instance, k_entry, fpom_entry, psyd_entry, v_entry
 
     try:
         HEAT_OF_COMBUSTION = float(read_ini_file_hoc_func(ini_path_hoc))
-        Hc = HEAT_OF_COMBUSTION / 1000
         v_val = safe_convert_to_float(v_val_str)
         m_val = safe_convert_to_float(m_val_str)
-        TAU_Q = -safe_convert_to_float(tmax)
+        precise = precise_appendix1(app_instance, tmax, Psi_str)
+        TAU_Q = precise.TAU_Q if precise is not None else -safe_convert_to_float(tmax)
         fds_path = read_ini_file_path_func(ini_path)
 
         if m_val > 0:
             MLRPUA = m_val / -TAU_Q
         else:
-            MLRPUA = safe_convert_to_float(Psi_str)
-        HRRPUA_val = Hc * MLRPUA * 0.93 * 1000
+            MLRPUA = precise.Psi if precise is not None else safe_convert_to_float(Psi_str)
+        HRRPUA_val = hrrpua(HEAT_OF_COMBUSTION, MLRPUA)
         if not MLRPUA or not TAU_Q:
             raise ValueError("Поля не должны быть пустыми")
-        modified_lines = []
-        inside_surf_block = False
-        vent_seen = False
-        surf_id = None
-        hrrpua_found = False
-        remove_ctrl_ramp = False
-        with open(fds_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-            for line in lines:
-                if line.strip().startswith('&SURF'):
-                    match = re.search(r"ID='([^']*)'", line)
-                    if match:
-                        surf_id = match.group(1)
-
-                    inside_surf_block = True
-                    vent_seen = False
-
-                    if 'HRRPUA' in line:
-                        hrrpua_found = True
-                        modified_lines.append(f"&SURF ID='{surf_id}', ")
-                        modified_lines.append(f"HRRPUA={HRRPUA_val}, ")
-                        modified_lines.append(f"COLOR='RED', ")
-                        modified_lines.append(f"TAU_Q={TAU_Q}/\n")
-                    else:
-                        hrrpua_found = False
-                        modified_lines.append(line)
-                    continue
-
-                if inside_surf_block and hrrpua_found:
-                    if line.strip().startswith('&VENT'):
-                        line = re.sub(r"CTRL_ID='[^']*'\s*", '', line)
-                        if 'SPREAD_RATE' in line:
-                            line = re.sub(r"SPREAD_RATE=[^\s]*\s*", '', line)
-                        modified_lines.append(line)
-                        vent_seen = True
-                        continue
-
-                    if '(end)' in line:
-                        inside_surf_block = False
-                        modified_lines.append(line)
-                        continue
-
-                    continue
-
-                if line.strip().startswith('&OBST'):
-                    if 'CTRL_ID' in line:
-                        line = re.sub(r"CTRL_ID='[^']*'\s*", '', line)
-                        remove_ctrl_ramp = True
-
-                    modified_lines.append(line)
-                    continue
-
-                if remove_ctrl_ramp and (line.strip().startswith('&CTRL') or line.strip().startswith('&RAMP')):
-                    continue
-                else:
-                    remove_ctrl_ramp = False
-
-                modified_lines.append(line)
-
-        output_dir = os.path.dirname(fds_path)
-        os.makedirs(output_dir, exist_ok=True)
-        with open(fds_path, 'w', encoding='utf-8') as file:
-            file.writelines(modified_lines)
-        QMessageBox.information(app_instance, "Успех", f"Модифицированный .fds файл сохранён:\n\n{fds_path}")
+        params_hash = surf_fix_hash("FDS5", k, Fpom, v_val_str, psi_ud, m_val_str, tmax, Psi_str, HEAT_OF_COMBUSTION, HRRPUA_val, TAU_Q)
+        if surf_fix_is_current(fds_path, params_hash):
+            check_state = "Done"
+            report = fire_inventory(fds_path)
+            QMessageBox.information(app_instance, "Успех", f"Файл уже обработан с этими параметрами:\n\n{fds_path}" + format_fire_inventory(report))
+        else:
+            take_snapshot(fds_path, "SURF_FIX")
+            inventory = FireInventory()
+            check_state = splice_surf_fix(fds_path, HRRPUA_val, TAU_Q, marker_state="Done", params_hash=params_hash, inventory=inventory)
+            QMessageBox.information(app_instance, "Успех", f"Модифицированный .fds файл сохранён:\n\n{fds_path}" + format_fire_inventory(inventory.report()))
         status_bar.showMessage("Файл успешно сохранен.")
-        create_check_ini_file(process_id, "Done")
+        show_lint_issues(app_instance, fds_path)
+        create_check_ini_file(process_id, check_state, update_fds=False)
         QTimer.singleShot(1000, app_instance.close)
     except Exception as e: 
         QMessageBox.critical(app_instance, "Ошибка", str(e))
         status_bar.showMessage(f"Ошибка при обработке файлов: {e}")
         create_check_ini_file(process_id, "None")
 
+def preview_fds_file_common(app_instance, m_entry, tmax_entry, psy_entry, process_id, read_ini_file_path_func, read_ini_file_hoc_func):
+    """Предпросмотр изменений SURF_FIX (unified diff) без записи .fds файла."""
+    current_directory = os.path.dirname(__file__)
+    parent_directory = os.path.abspath(os.path.join(current_directory, os.pardir))
+    inis_path = os.path.join(parent_directory, 'inis')
+
+    ini_path = os.path.join(inis_path, f'filePath_{process_id}.ini')
+    ini_path_hoc = os.path.join(inis_path, f'HOC_{process_id}.ini') if process_id is not None else os.path.join(inis_path, 'HOC.ini')
+
+    try:
+        HEAT_OF_COMBUSTION = float(read_ini_file_hoc_func(ini_path_hoc))
+        m_val = safe_convert_to_float(m_entry[1].text())
+        precise = precise_appendix1(app_instance, tmax_entry[1].text(), psy_entry[1].text())
+        TAU_Q = precise.TAU_Q if precise is not None else -safe_convert_to_float(tmax_entry[1].text())
+        fds_path = read_ini_file_path_func(ini_path)
+
+        if m_val > 0 and TAU_Q:
+            MLRPUA = m_val / -TAU_Q
+        else:
+            MLRPUA = precise.Psi if precise is not None else safe_convert_to_float(psy_entry[1].text())
+        HRRPUA_val = hrrpua(HEAT_OF_COMBUSTION, MLRPUA)
+        if not MLRPUA or not TAU_Q:
+            raise ValueError("Сначала выполните расчёт")
+
+        # Diff строится лениво; в окно выводятся первые PREVIEW_MAX_LINES строк
+        lines = []
+        truncated = False
+        for line in preview_surf_fix(fds_path, HRRPUA_val, TAU_Q, marker_state="Done"):
+            if len(lines) >= PREVIEW_MAX_LINES:
+                truncated = True
+                break
+            lines.append(line)
+        if not lines:
+            QMessageBox.information(app_instance, "Предпросмотр", f"Файл не изменится:\n\n{fds_path}")
+            return
+        if truncated:
+            lines.append(f"... (показаны первые {PREVIEW_MAX_LINES} строк)\n")
+        show_diff_dialog(app_instance, f"Предпросмотр: {os.path.basename(fds_path)}", ''.join(lines))
+
+    except Exception as e:
+        QMessageBox.critical(app_instance, "Ошибка", str(e))
+
+def format_fire_inventory(report):
+    """Сводка очагов (fds_stream.FireInventory.report) для сообщения об успешной обработке."""
+    if not report['surfaces']:
+        return ""
+    text = f"\n\nПлощадь очага: {report['area']:.2f} м², мощность: {report['hrr']:.1f} кВт"
+    if report['centroid'] is not None:
+        x, y, z = report['centroid']
+        text += f"\nЦентр очага: X={x:.2f}, Y={y:.2f}, Z={z:.2f}"
+    return text
+
+def show_lint_issues(parent, fds_path):
+    """Проверяет сохранённый сценарий (fds_lint) и показывает найденные ошибки до отправки на расчёт."""
+    try:
+        issues = lint_fds_file(fds_path)
+    except OSError:
+        return
+    if not issues:
+        return
+    lines = [message for _, message in issues[:LINT_MAX_ISSUES]]
+    if len(issues) > LINT_MAX_ISSUES:
+        lines.append(f"... и ещё {len(issues) - LINT_MAX_ISSUES}")
+    QMessageBox.warning(parent, "Проверка сценария", "В сценарии найдены ошибки:\n\n" + "\n".join(lines))
+
+def show_diff_dialog(parent, title, diff_text):
+    """Показывает diff в модальном окне только для чтения."""
+    dialog = QDialog(parent)
+    dialog.setWindowTitle(title)
+    dialog.resize(900, 600)
+    layout = QVBoxLayout(dialog)
+
+    text_edit = QPlainTextEdit(dialog)
+    text_edit.setReadOnly(True)
+    text_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+    text_edit.setFont(QFont("Consolas", 10))
+    text_edit.setPlainText(diff_text)
+    layout.addWidget(text_edit)
+
+    buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close, dialog)
+    buttons.rejected.connect(dialog.reject)
+    layout.addWidget(buttons)
+    dialog.exec()
+
 def validate_and_calculate(line_edit, text):
     """
     Проверяет ввод, разрешая цифры, десятичные точки, основные математические операторы (+, -, *, /), 
@@ -804,14 +785,16 @@ def get_icon_path(main_file_path, icon_filename):
     # Возвращаем путь к файлу иконки
     return os.path.join(gitpics_dir, icon_filename)
 
-def create_check_ini_file(process_id, state="None"):
+def create_check_ini_file(process_id, state="None", update_fds=True):
     """
     Создание checkSURFFIX_{process_id}.ini файла с указанным состоянием.
     Также добавляет CheckSURFFIX=state в конец .fds файла и проверяет состояние в .fds.
+    Метка ищется и обновляется только в конце .fds файла (см. fds_stream.update_check_marker).
     
     Args:
         process_id: ID процесса (может быть None)
         state: Состояние ("Done" или "None")
+        update_fds: False, если метка уже записана в .fds при его перезаписи
     """
     try:
         current_directory = os.path.dirname(__file__)
@@ -823,7 +806,7 @@ def create_check_ini_file(process_id, state="None"):
         ini_filename_path = f'filePath_{process_id}.ini' if process_id is not None else 'filePath.ini'
         ini_path_file = os.path.join(inis_path, ini_filename_path)
         
-        if os.path.exists(ini_path_file):
+        if update_fds and os.path.exists(ini_path_file):
             # Читаем путь к .fds файлу из INI файла
             config = configparser.ConfigParser()
             with open(ini_path_file, 'r', encoding='utf-16') as f:
@@ -831,27 +814,8 @@ def create_check_ini_file(process_id, state="None"):
             fds_path = config['filePath']['filePath']
             
             if os.path.exists(fds_path):
-                # Читаем .fds файл для проверки существующего состояния CheckSURFFIX
-                with open(fds_path, 'r', encoding='utf-8') as fds_file:
-                    fds_content = fds_file.read()
-                
-                # Проверяем существующее состояние в .fds
-                if 'CheckSURFFIX=Done' in fds_content:
-                    state = "Done"
-                elif 'CheckSURFFIX=None' in fds_content:
-                    state = "None"
-                # Если CheckSURFFIX не найден, оставляем переданное состояние
-                
-                # Добавляем CheckSURFFIX=state в конец .fds файла
-                if 'CheckSURFFIX=' not in fds_content:
-                    # Если нет строки CheckSURFFIX, добавляем её
-                    with open(fds_path, 'a', encoding='utf-8') as fds_file:
-                        fds_file.write(f'\nCheckSURFFIX={state}\n')
-                else:
-                    # Если строка CheckSURFFIX уже существует, обновляем её
-                    updated_content = re.sub(r'CheckSURFFIX=(Done|None)', f'CheckSURFFIX={state}', fds_content)
-                    with open(fds_path, 'w', encoding='utf-8') as fds_file:
-                        fds_file.write(updated_content)
+                # Существующее состояние в .fds имеет приоритет; если метки нет, она дописывается
+                state = update_check_marker(fds_path, state)
         
         # Создаем или обновляем .ini файл с точным форматом без пробелов вокруг =
         ini_filename = f'CheckSURFFIX_{process_id}.ini' if process_id is not None else 'CheckSURFFIX.ini'
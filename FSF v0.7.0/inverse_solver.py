@@ -0,0 +1,176 @@
+"""
+Обратная задача Приложения 1: подбор m, Fpom или v по ограничению HRRPUA или Q.
+
+Для каждого помещения ищется граничное значение неизвестного параметра,
+при котором величина (HRRPUA, кВт/м², или полное тепловыделение
+Q = 0.93·Hc·bigM, МДж) равна пределу. Все помещения решаются одновременно
+векторной бисекцией (appendix1.calculate_arrays) в логарифмическом масштабе;
+из двух концов итогового интервала возвращается тот, где величина не превышает предела.
+
+Направление ограничения определяется монотонностью: если величина растёт с
+параметром, найдено наибольшее допустимое значение (bound = 1, например
+наибольшая m), если убывает - наименьшее (bound = -1, например наименьшая
+Fpom при заданной m). Если ограничение выполняется во всём интервале поиска,
+возвращается соответствующий конец интервала (для m - сама M: сокращать
+нагрузку не нужно). Если ограничение не выполняется нигде или величина от
+параметра не зависит, значение - nan, bound = 0.
+
+Масса m ищется в интервале (0, M], где M - масса при m = 0 (подсказка поля m:
+компенсирующая масса должна быть меньше M).
+
+Запуск:
+    python inverse_solver.py --solve m --limit 5000 --k 2 --Fpom 39 --v 0.042 --psi_ud 0.0129 --HOC 14000
+    python inverse_solver.py --solve Fpom --quantity Q --limit 2000 --rooms rooms.csv -o result.csv
+"""
+import argparse
+import csv
+import sys
+
+from appendix1 import COMBUSTION_EFFICIENCY, DIALECTS, calculate_arrays, np
+from fds_stream import atomic_write
+
+INPUTS = ('k', 'Fpom', 'v', 'psi_ud', 'm', 'HOC')
+UNKNOWNS = ('m', 'Fpom', 'v')
+TARGETS = ('HRRPUA', 'Q')
+SEARCH_RANGES = {'Fpom': (1e-6, 1e9), 'v': (1e-9, 1e3)}
+M_LOWER_FRACTION = 1e-12
+RELATIVE_TOLERANCE = 1e-12
+MAX_ITERATIONS = 200
+
+
+def _target(values, hoc, target):
+    """Величина ограничения по результату calculate_arrays."""
+    if target == 'HRRPUA':
+        return values['HRRPUA']
+    return COMBUSTION_EFFICIENCY * hoc / 1000 * values['bigM']
+
+
+def solve_inverse(unknown, limit, target='HRRPUA', dialect='fds6', lower=None, upper=None, **inputs):
+    """
+    Граничное значение параметра для массива помещений.
+
+    :param unknown: Искомый параметр: 'm', 'Fpom' или 'v'.
+    :param limit: Предел величины (число или массив).
+    :param target: 'HRRPUA' (кВт/м²) или 'Q' (полное тепловыделение, МДж).
+    :param dialect: 'fds6' или 'fds5'.
+    :param lower: Нижняя граница поиска (по умолчанию см. SEARCH_RANGES; для m - доля от M).
+    :param upper: Верхняя граница поиска (для m по умолчанию M при m = 0).
+    :param inputs: Остальные параметры k, Fpom, v, psi_ud, m, HOC (числа или массивы).
+    :return: Словарь {'value': массив значений, 'bound': массив 1 / -1 / 0, 'target': величина в найденной точке}.
+    :raises ValueError: При неизвестном параметре, величине или незаданных исходных данных.
+    :raises ImportError: Если NumPy не установлен.
+    """
+    if np is None:
+        raise ImportError("Для обратной задачи требуется NumPy")
+    if unknown not in UNKNOWNS:
+        raise ValueError(f"Неизвестный искомый параметр {unknown}")
+    if target not in TARGETS:
+        raise ValueError(f"Неизвестная величина {target}")
+    inputs.setdefault('m', 0.0)
+    missing = [name for name in INPUTS if name != unknown and name not in inputs]
+    if missing:
+        raise ValueError(f"Не заданы параметры {', '.join(missing)}")
+    inputs[unknown] = 1.0
+    arrays = dict(zip(INPUTS, np.broadcast_arrays(*(np.asarray(inputs[name], dtype=float) for name in INPUTS),
+                                                   np.asarray(limit, dtype=float))))
+    limit = np.broadcast_to(np.asarray(limit, dtype=float), arrays['k'].shape)
+
+    def evaluate(x):
+        args = dict(arrays, **{unknown: x})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = calculate_arrays(*(args[name] for name in INPUTS), dialect=dialect)
+        return _target(values, args['HOC'], target)
+
+    if unknown == 'm':
+        full = calculate_arrays(*(dict(arrays, m=0.0)[name] for name in INPUTS), dialect=dialect)['bigM']
+        hi = np.broadcast_to(full if upper is None else np.asarray(upper, dtype=float), limit.shape).copy()
+        lo = hi * M_LOWER_FRACTION if lower is None else np.broadcast_to(np.asarray(lower, dtype=float), limit.shape).copy()
+    else:
+        default_lo, default_hi = SEARCH_RANGES[unknown]
+        lo = np.broadcast_to(np.asarray(default_lo if lower is None else lower, dtype=float), limit.shape).copy()
+        hi = np.broadcast_to(np.asarray(default_hi if upper is None else upper, dtype=float), limit.shape).copy()
+
+    f_lo = evaluate(lo) - limit
+    f_hi = evaluate(hi) - limit
+    with np.errstate(invalid='ignore'):
+        valid = (lo > 0) & (hi > lo) & (f_lo != f_hi) & np.isfinite(f_lo) & np.isfinite(f_hi)
+        bracketed = valid & (np.sign(f_lo) * np.sign(f_hi) <= 0)
+        feasible = valid & (f_lo < 0) & (f_hi < 0)
+        increasing = f_hi > f_lo
+    for _ in range(MAX_ITERATIONS):
+        active = bracketed & (hi - lo > RELATIVE_TOLERANCE * hi)
+        if not active.any():
+            break
+        mid = np.sqrt(lo * hi)
+        f_mid = evaluate(mid) - limit
+        # Допустимая сторона (величина <= предела) сдвигается к середине вместе со своим концом
+        move_lo = active & ((f_mid <= 0) == increasing)
+        move_hi = active & ~move_lo
+        lo = np.where(move_lo, mid, lo)
+        hi = np.where(move_hi, mid, hi)
+
+    # Для bracketed - допустимый конец итогового интервала; для feasible бисекция не выполнялась,
+    # lo и hi - концы интервала поиска, и берётся дальний от ограничения конец
+    solved = bracketed | feasible
+    value = np.where(solved, np.where(increasing ^ feasible, lo, hi), np.nan)
+    bound = np.where(solved, np.where(increasing, 1, -1), 0)
+    return {'value': value, 'bound': bound, 'target': np.where(solved, evaluate(value), np.nan)}
+
+
+def _read_rooms(path):
+    """Столбцы ведомости помещений (как в room_schedule): {колонка: список}."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"Ведомость {path} пуста")
+    columns = {'room': [row.get('room', '') for row in rows]}
+    for name in INPUTS:
+        if name not in rows[0]:
+            continue
+        try:
+            columns[name] = [float((row[name] or '0').replace(',', '.')) for row in rows]
+        except ValueError as e:
+            raise ValueError(f"Ведомость {path}, колонка {name}: {e}")
+    return columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обратная задача Приложения 1: m, Fpom или v по пределу HRRPUA или Q.")
+    parser.add_argument('--solve', required=True, choices=UNKNOWNS, help="Искомый параметр")
+    parser.add_argument('--quantity', default='HRRPUA', choices=TARGETS, help="Величина ограничения (Q - тепловыделение, МДж)")
+    parser.add_argument('--limit', type=float, required=True, help="Предел величины")
+    for name in INPUTS:
+        parser.add_argument(f'--{name}', type=float, default=None, help=f"Значение {name} для всех помещений")
+    parser.add_argument('--rooms', default=None, help="CSV ведомости помещений (room,k,Fpom,v,psi_ud,m,HOC)")
+    parser.add_argument('--dialect', default='fds6', choices=DIALECTS, help="Вариант расчёта Ψ (по умолчанию fds6)")
+    parser.add_argument('-o', '--output', default=None, help="Результат .csv (по умолчанию - вывод на экран)")
+    args = parser.parse_args(argv)
+
+    try:
+        columns = _read_rooms(args.rooms) if args.rooms else {'room': ['']}
+        inputs = {name: columns[name] for name in INPUTS if name in columns and name != args.solve}
+        inputs.update({name: getattr(args, name) for name in INPUTS
+                       if getattr(args, name) is not None and name != args.solve})
+        result = solve_inverse(args.solve, args.limit, args.quantity, args.dialect, **inputs)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+
+    rooms = columns['room'] * (result['value'].size if len(columns['room']) == 1 else 1)
+    rows = list(zip(rooms, result['value'].ravel().tolist(), result['bound'].ravel().tolist(),
+                    result['target'].ravel().tolist()))
+    labels = {1: 'наибольшее', -1: 'наименьшее', 0: 'предел не достигается'}
+    if args.output:
+        with atomic_write(args.output) as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(('room', args.solve, 'bound', args.quantity))
+            writer.writerows(rows)
+        print(f"Помещений: {len(rows)}. Результат: {args.output}")
+    else:
+        for room, value, bound, target in rows:
+            print(f"{room or '-'}: {args.solve} = {value:.6g} ({labels[bound]}), {args.quantity} = {target:.6g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
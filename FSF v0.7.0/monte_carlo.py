@@ -0,0 +1,304 @@
+"""
+Распространение неопределённости исходных данных Приложения 1 методом Монте-Карло.
+
+Любой параметр (k, Fpom, v, psi_ud, m, HOC) задаётся числом или распределением:
+    uniform:a:b              равномерное на [a, b]
+    normal:среднее:ско       нормальное, усечённое до положительных значений
+    triangular:a:мода:b      треугольное
+
+Выборки генерируются пакетами по batch значений (NumPy) и считаются
+appendix1.calculate_arrays. Если вся выборка помещается в один пакет
+(samples <= batch), процентили tmax, Psi, HRRPUA и TAU_Q считаются точно
+(np.percentile, линейная интерполяция). Для нескольких пакетов выборка не
+хранится: квантили оцениваются потоково алгоритмом P² (Jain, Chlamtac, 1985) -
+пять маркеров на квантиль, поэтому память ограничена одним пакетом при любом
+числе выборок. Расхождение P² с точным процентилем для гладких распределений
+на 2·10⁵ выборок - не более 5·10⁻³ относительных (см. tests/test_monte_carlo.py).
+TAU_Q = -tmax, поэтому P-й процентиль TAU_Q равен -(100-P)-му процентилю tmax.
+
+При одинаковых seed, samples и batch результат воспроизводится точно.
+
+Запуск:
+    python monte_carlo.py --k 2 --Fpom 39 --v normal:0.042:0.005 --psi_ud uniform:0.01:0.015 --HOC 14000
+        [--samples 1000000] [--percentile 95] [--seed 1] [--fds scenario.fds]
+С --fds процентили HRRPUA и TAU_Q записываются в сценарий (SURF_FIX, режим минимальных правок).
+"""
+import argparse
+import sys
+import time
+
+from appendix1 import DIALECTS, calculate_arrays, np
+from fds_stream import surf_fix_hash
+from fds_splice import splice_surf_fix, surf_fix_is_current
+from fds_snapshot import take_snapshot
+
+INPUTS = ('k', 'Fpom', 'v', 'psi_ud', 'm', 'HOC')
+REQUIRED_INPUTS = ('k', 'Fpom', 'v', 'psi_ud', 'HOC')
+QUANTITIES = ('tmax', 'Psi', 'HRRPUA', 'TAU_Q')
+DEFAULT_SAMPLES = 1_000_000
+DEFAULT_BATCH = 100_000
+DEFAULT_PERCENTILE = 95.0
+DEFAULT_SEED = 1
+
+
+class P2Quantile:
+    """
+    Потоковая оценка квантиля алгоритмом P² (пять маркеров, память O(1)).
+
+    Маркеры 0 и 4 - минимум и максимум, маркер 2 - оценка квантиля p,
+    маркеры 1 и 3 - квантили p/2 и (1+p)/2. После каждого значения
+    промежуточные маркеры сдвигаются к желаемым позициям с
+    параболической (при выходе за соседей - линейной) интерполяцией высоты.
+    """
+
+    def __init__(self, p):
+        """
+        :param p: Уровень квантиля, 0 < p < 1.
+        """
+        if not 0 < p < 1:
+            raise ValueError(f"Уровень квантиля должен быть в интервале (0, 1): {p}")
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [0, 1, 2, 3, 4]
+
+    def extend(self, values):
+        """
+        Добавляет значения в порядке следования.
+
+        :param values: Итерируемая последовательность чисел.
+        """
+        heights = self.heights
+        values = iter(values)
+        while len(heights) < 5:
+            x = next(values, None)
+            if x is None:
+                return
+            heights.append(x)
+            self.count += 1
+            if len(heights) == 5:
+                heights.sort()
+
+        # Цикл развёрнут по маркерам и работает с локальными переменными: это горячий путь
+        d1, d2, d3 = self.p / 2, self.p, (1 + self.p) / 2
+        count = self.count
+        q0, q1, q2, q3, q4 = heights
+        _, n1, n2, n3, n4 = self.positions
+        for x in values:
+            count += 1
+            n4 += 1
+            if x < q2:
+                n2 += 1
+                n3 += 1
+                if x < q1:
+                    n1 += 1
+                    if x < q0:
+                        q0 = x
+            elif x < q3:
+                n3 += 1
+            elif x > q4:
+                q4 = x
+
+            m = count - 1
+            d = m * d1 - n1
+            if (d >= 1 and n2 - n1 > 1) or (d <= -1 and n1 > 1):
+                s = 1 if d > 0 else -1
+                q = q1 + s / n2 * ((n1 + s) * (q2 - q1) / (n2 - n1) + (n2 - n1 - s) * (q1 - q0) / n1)
+                if not q0 < q < q2:
+                    q = q1 + ((q2 - q1) / (n2 - n1) if s > 0 else -(q1 - q0) / n1)
+                q1 = q
+                n1 += s
+            d = m * d2 - n2
+            if (d >= 1 and n3 - n2 > 1) or (d <= -1 and n2 - n1 > 1):
+                s = 1 if d > 0 else -1
+                q = q2 + s / (n3 - n1) * ((n2 - n1 + s) * (q3 - q2) / (n3 - n2) + (n3 - n2 - s) * (q2 - q1) / (n2 - n1))
+                if not q1 < q < q3:
+                    q = q2 + ((q3 - q2) / (n3 - n2) if s > 0 else -(q2 - q1) / (n2 - n1))
+                q2 = q
+                n2 += s
+            d = m * d3 - n3
+            if (d >= 1 and n4 - n3 > 1) or (d <= -1 and n3 - n2 > 1):
+                s = 1 if d > 0 else -1
+                q = q3 + s / (n4 - n2) * ((n3 - n2 + s) * (q4 - q3) / (n4 - n3) + (n4 - n3 - s) * (q3 - q2) / (n3 - n2))
+                if not q2 < q < q4:
+                    q = q3 + ((q4 - q3) / (n4 - n3) if s > 0 else -(q3 - q2) / (n3 - n2))
+                q3 = q
+                n3 += s
+
+        heights[:] = [q0, q1, q2, q3, q4]
+        self.positions = [0, n1, n2, n3, n4]
+        self.count = count
+
+    @property
+    def value(self):
+        """Оценка квантиля (до пяти значений - по упорядоченной выборке); None, если значений нет."""
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            ordered = sorted(self.heights)
+            return ordered[min(int(self.p * len(ordered)), len(ordered) - 1)]
+        return self.heights[2]
+
+
+def parse_distribution(text):
+    """
+    Распределение параметра из строки.
+
+    :param text: Число или 'uniform:a:b', 'normal:среднее:ско', 'triangular:a:мода:b'.
+    :return: Функция sample(rng, size) -> число или массив.
+    :raises ValueError: Если описание некорректно.
+    """
+    kind, _, rest = text.strip().partition(':')
+    try:
+        if not rest:
+            value = float(kind)
+            return lambda rng, size: value
+        args = [float(value) for value in rest.split(':')]
+        kind = kind.lower()
+        if kind == 'uniform' and len(args) == 2 and args[0] <= args[1]:
+            return lambda rng, size: rng.uniform(args[0], args[1], size)
+        if kind == 'normal' and len(args) == 2 and args[0] > 0 and args[1] >= 0:
+            return lambda rng, size: _positive_normal(rng, args[0], args[1], size)
+        if kind == 'triangular' and len(args) == 3 and args[0] <= args[1] <= args[2] and args[0] < args[2]:
+            return lambda rng, size: rng.triangular(args[0], args[1], args[2], size)
+    except ValueError:
+        pass
+    raise ValueError(f"Некорректное распределение '{text}'")
+
+
+def _positive_normal(rng, mean, sd, size):
+    """Нормальное распределение, усечённое до положительных значений (отрицательные перевыбираются)."""
+    values = rng.normal(mean, sd, size)
+    bad = values <= 0
+    while bad.any():
+        values[bad] = rng.normal(mean, sd, int(bad.sum()))
+        bad = values <= 0
+    return values
+
+
+def run_monte_carlo(inputs, samples=DEFAULT_SAMPLES, percentile=DEFAULT_PERCENTILE, seed=DEFAULT_SEED,
+                    batch=DEFAULT_BATCH, dialect='fds6'):
+    """
+    Оценивает процентиль tmax, Psi, HRRPUA и TAU_Q.
+
+    :param inputs: {параметр: описание для parse_distribution}; m по умолчанию 0.
+    :param samples: Число выборок.
+    :param percentile: Процентиль, 0 < percentile < 100.
+    :param seed: Зерно генератора.
+    :param batch: Число выборок, считаемых за один вызов; при samples <= batch процентили точные.
+    :param dialect: 'fds6' или 'fds5'.
+    :return: {величина: {'value': процентиль, 'mean', 'min', 'max'}}.
+    :raises ValueError: При некорректных исходных данных.
+    :raises ImportError: Если NumPy не установлен.
+    """
+    if np is None:
+        raise ImportError("Для метода Монте-Карло требуется NumPy")
+    missing = [name for name in REQUIRED_INPUTS if name not in inputs]
+    if missing:
+        raise ValueError(f"Не заданы параметры {', '.join(missing)}")
+    if samples < 1:
+        raise ValueError("Число выборок должно быть положительным")
+    distributions = [parse_distribution(str(inputs.get(name, 0))) for name in INPUTS]
+    p = percentile / 100
+    # Вся выборка в одном пакете - процентили считаются точно, P² не нужен
+    exact = samples <= batch
+    estimators = {'tmax': P2Quantile(p), 'Psi': P2Quantile(p), 'HRRPUA': P2Quantile(p)}
+    # Процентиль TAU_Q = -tmax берётся из дополнительного процентиля tmax
+    tau_estimator = estimators['tmax'] if p == 0.5 else P2Quantile(1 - p)
+    totals = {name: 0.0 for name in QUANTITIES}
+    minima = {name: np.inf for name in QUANTITIES}
+    maxima = {name: -np.inf for name in QUANTITIES}
+
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < samples:
+        size = min(batch, samples - done)
+        values = calculate_arrays(*(sample(rng, size) for sample in distributions), dialect=dialect)
+        for name in QUANTITIES:
+            array = np.broadcast_to(values[name], (size,))
+            if not np.isfinite(array).all():
+                raise ValueError(f"Некорректные значения {name}: проверьте распределения исходных данных")
+            totals[name] += float(array.sum())
+            minima[name] = min(minima[name], float(array.min()))
+            maxima[name] = max(maxima[name], float(array.max()))
+        if exact:
+            result = {name: {'value': float(np.percentile(np.broadcast_to(values[name], (size,)), percentile))}
+                      for name in estimators}
+            result['TAU_Q'] = {'value': -float(np.percentile(np.broadcast_to(values['tmax'], (size,)),
+                                                             100 - percentile))}
+        else:
+            for name, estimator in estimators.items():
+                estimator.extend(np.broadcast_to(values[name], (size,)).tolist())
+            if tau_estimator is not estimators['tmax']:
+                tau_estimator.extend(np.broadcast_to(values['tmax'], (size,)).tolist())
+        done += size
+
+    if not exact:
+        result = {name: {'value': estimator.value} for name, estimator in estimators.items()}
+        result['TAU_Q'] = {'value': -tau_estimator.value}
+    for name in QUANTITIES:
+        result[name].update(mean=totals[name] / samples, min=minima[name], max=maxima[name])
+    return result
+
+
+def apply_to_scenario(fds_path, result, params_hash):
+    """
+    Записывает процентили HRRPUA и TAU_Q в сценарий (SURF_FIX со снимком и меткой CheckSURFFIX).
+
+    :param fds_path: Путь к .fds файлу.
+    :param result: Результат run_monte_carlo().
+    :param params_hash: Хэш исходных данных для метки (surf_fix_hash).
+    :return: Итоговое состояние метки CheckSURFFIX.
+    """
+    take_snapshot(fds_path, "SURF_FIX (Монте-Карло)")
+    return splice_surf_fix(fds_path, result['HRRPUA']['value'], result['TAU_Q']['value'], marker_state="Done",
+                           params_hash=params_hash)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Метод Монте-Карло для параметров пожара по Приложению 1.")
+    for name in INPUTS:
+        parser.add_argument(f'--{name}', default=None, help=f"{name}: число, uniform:a:b, normal:среднее:ско или triangular:a:мода:b")
+    parser.add_argument('--samples', type=float, default=DEFAULT_SAMPLES, help=f"Число выборок (по умолчанию {DEFAULT_SAMPLES})")
+    parser.add_argument('--percentile', type=float, default=DEFAULT_PERCENTILE, help=f"Процентиль (по умолчанию {DEFAULT_PERCENTILE:g})")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f"Зерно генератора (по умолчанию {DEFAULT_SEED})")
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help=f"Выборок в пакете (по умолчанию {DEFAULT_BATCH})")
+    parser.add_argument('--dialect', default='fds6', choices=DIALECTS, help="Вариант расчёта Ψ (по умолчанию fds6)")
+    parser.add_argument('--fds', default=None, help="Записать процентили HRRPUA и TAU_Q в .fds файл")
+    args = parser.parse_args(argv)
+
+    inputs = {name: getattr(args, name) for name in INPUTS if getattr(args, name) is not None}
+    samples = int(args.samples)
+    batch = max(1, args.batch)
+    params_hash = None
+    if args.fds:
+        params_hash = surf_fix_hash('monte_carlo', args.dialect, sorted(inputs.items()), samples, args.percentile,
+                                    args.seed, batch)
+        if surf_fix_is_current(args.fds, params_hash):
+            print(f"Файл уже обработан с этими параметрами: {args.fds}")
+            return 0
+
+    started = time.perf_counter()
+    try:
+        result = run_monte_carlo(inputs, samples, args.percentile, args.seed, batch, args.dialect)
+    except (ImportError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    print(f"Выборок: {samples}, seed {args.seed}, {time.perf_counter() - started:.1f} с")
+    print(f"{'':8} {'P' + format(args.percentile, 'g'):>14} {'среднее':>14} {'мин':>14} {'макс':>14}")
+    for name in QUANTITIES:
+        values = result[name]
+        print(f"{name:8} {values['value']:14.6g} {values['mean']:14.6g} {values['min']:14.6g} {values['max']:14.6g}")
+
+    if args.fds:
+        try:
+            apply_to_scenario(args.fds, result, params_hash)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка записи {args.fds}: {e}", file=sys.stderr)
+            return 1
+        print(f"HRRPUA={result['HRRPUA']['value']}, TAU_Q={result['TAU_Q']['value']} записаны в {args.fds}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Перебор параметров Приложения 1 по многомерной сетке (k × Fpom × v × ψуд × m × HOC).
+
+Каждая ось задаётся числом или списком значений; сетка считается одним
+вызовом appendix1.calculate_arrays с трансляцией размерностей (ось i
+разворачивается по измерению i), результат - массивы формы сетки.
+Результаты запоминаются по описанию сетки (sweep), повторный запрос той же
+сетки не пересчитывается.
+
+Экспорт:
+    CSV по точкам сетки: значения осей и tmax, Psi, HRRPUA, TAU_Q, Stt, bigM;
+    тепловая карта: таблица одной величины по двум осям (строки - первая ось,
+    столбцы - вторая), остальные оси должны быть заданы одним значением.
+
+Оси задаются как 0.01 (одно значение), 0.01,0.02,0.042 (список) или
+0.005:0.05:10 (10 равномерных значений от 0.005 до 0.05).
+
+Запуск:
+    python param_sweep.py --k 2 --Fpom 39 --v 0.005:0.05:10 --psi_ud 0.005:0.03:6 --HOC 14000 -o sweep.csv
+    python param_sweep.py ... --heatmap v psi_ud --quantity HRRPUA -o hrrpua_map.csv
+"""
+import argparse
+import csv
+import sys
+from functools import lru_cache
+
+from appendix1 import DIALECTS, calculate_arrays, np
+from fds_stream import atomic_write
+
+AXES = ('k', 'Fpom', 'v', 'psi_ud', 'm', 'HOC')
+RESULT_FIELDS = ('tmax', 'Psi', 'HRRPUA', 'TAU_Q', 'Stt', 'bigM')
+AXIS_DEFAULTS = {'m': 0.0}
+SWEEP_CACHE_SIZE = 32
+
+
+def parse_axis(text):
+    """
+    Значения оси из строки: '0.01', '0.01,0.02' или 'начало:конец:число'.
+
+    :param text: Описание оси (допускается десятичная запятая в диапазоне).
+    :return: Кортеж чисел.
+    :raises ValueError: Если описание некорректно.
+    """
+    text = text.strip()
+    try:
+        if ':' in text:
+            start, stop, num = text.replace(',', '.').split(':')
+            num = int(num)
+            if num < 1:
+                raise ValueError
+            if num == 1:
+                return (float(start),)
+            step = (float(stop) - float(start)) / (num - 1)
+            return tuple(float(start) + step * i for i in range(num))
+        return tuple(float(value) for value in text.split(','))
+    except ValueError:
+        raise ValueError(f"Некорректное описание оси '{text}'")
+
+
+def grid_spec(axes):
+    """
+    Каноническое описание сетки для запоминания результатов.
+
+    :param axes: {ось: число или последовательность чисел}; m по умолчанию 0.
+    :return: Кортеж ((ось, значения), ...) в порядке AXES.
+    :raises ValueError: Если ось не задана или пуста.
+    """
+    spec = []
+    for name in AXES:
+        values = axes.get(name, AXIS_DEFAULTS.get(name))
+        if values is None:
+            raise ValueError(f"Не задана ось {name}")
+        values = (float(values),) if isinstance(values, (int, float)) else tuple(float(value) for value in values)
+        if not values:
+            raise ValueError(f"Ось {name} не содержит значений")
+        spec.append((name, values))
+    return tuple(spec)
+
+
+@lru_cache(maxsize=SWEEP_CACHE_SIZE)
+def _sweep(spec, dialect):
+    count = len(spec)
+    arrays = []
+    for i, (_, values) in enumerate(spec):
+        shape = [1] * count
+        shape[i] = len(values)
+        arrays.append(np.asarray(values).reshape(shape))
+    results = calculate_arrays(*arrays, dialect=dialect)
+    shape = tuple(len(values) for _, values in spec)
+    # Массивы приводятся к полной форме сетки; broadcast_to даёт представления только для чтения,
+    # поэтому запомненный результат нельзя изменить через возвращённые массивы
+    return {name: np.broadcast_to(results[name], shape) for name in RESULT_FIELDS}
+
+
+def sweep(axes, dialect='fds6'):
+    """
+    Параметры пожара на всех точках сетки.
+
+    :param axes: {ось: число или последовательность чисел} (см. grid_spec).
+    :param dialect: 'fds6' или 'fds5'.
+    :return: Кортеж (spec, {величина: массив формы сетки только для чтения}).
+    :raises ImportError: Если NumPy не установлен.
+    """
+    if np is None:
+        raise ImportError("Для перебора параметров требуется NumPy")
+    spec = grid_spec(axes)
+    return spec, _sweep(spec, dialect)
+
+
+def write_points(path, spec, results):
+    """Записывает CSV по точкам сетки: значения осей и RESULT_FIELDS."""
+    grids = np.meshgrid(*(np.asarray(values) for _, values in spec), indexing='ij')
+    columns = [grid.ravel().tolist() for grid in grids] + [results[name].ravel().tolist() for name in RESULT_FIELDS]
+    with atomic_write(path) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow([name for name, _ in spec] + list(RESULT_FIELDS))
+        writer.writerows(zip(*columns))
+
+
+def heatmap(spec, results, row_axis, column_axis, quantity):
+    """
+    Таблица одной величины по двум осям.
+
+    :param spec: Описание сетки из sweep().
+    :param results: Результаты из sweep().
+    :param row_axis: Ось строк.
+    :param column_axis: Ось столбцов.
+    :param quantity: Величина из RESULT_FIELDS.
+    :return: Кортеж (значения оси строк, значения оси столбцов, двумерный массив).
+    :raises ValueError: Если оси совпадают, не входят в сетку или остальные оси заданы несколькими значениями.
+    """
+    names = [name for name, _ in spec]
+    if quantity not in RESULT_FIELDS:
+        raise ValueError(f"Неизвестная величина {quantity}")
+    if row_axis == column_axis or row_axis not in names or column_axis not in names:
+        raise ValueError("Для тепловой карты нужны две разные оси сетки")
+    fixed = [name for name, values in spec if name not in (row_axis, column_axis) and len(values) > 1]
+    if fixed:
+        raise ValueError(f"Для тепловой карты оси {', '.join(fixed)} должны иметь одно значение")
+    row, column = names.index(row_axis), names.index(column_axis)
+    index = tuple(slice(None) if i in (row, column) else 0 for i in range(len(names)))
+    table = results[quantity][index]
+    if row > column:
+        table = table.T
+    return spec[row][1], spec[column][1], table
+
+
+def write_heatmap(path, row_axis, column_axis, row_values, column_values, table):
+    """Записывает тепловую карту в CSV: первая строка - значения оси столбцов, первый столбец - оси строк."""
+    with atomic_write(path) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow([f"{row_axis}\\{column_axis}"] + list(column_values))
+        for value, line in zip(row_values, table.tolist()):
+            writer.writerow([value] + line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перебор параметров Приложения 1 по многомерной сетке.")
+    for name in AXES:
+        parser.add_argument(f'--{name}', default=None, help=f"Ось {name}: число, список через запятую или начало:конец:число")
+    parser.add_argument('--dialect', default='fds6', choices=DIALECTS, help="Вариант расчёта Ψ (по умолчанию fds6)")
+    parser.add_argument('--heatmap', nargs=2, default=None, metavar=('ROWS', 'COLUMNS'), help="Оси тепловой карты")
+    parser.add_argument('--quantity', default='HRRPUA', choices=RESULT_FIELDS, help="Величина тепловой карты")
+    parser.add_argument('-o', '--output', default='sweep.csv', help="Файл результата .csv")
+    args = parser.parse_args(argv)
+
+    try:
+        axes = {name: parse_axis(getattr(args, name)) for name in AXES if getattr(args, name) is not None}
+        spec, results = sweep(axes, args.dialect)
+        if args.heatmap:
+            row_values, column_values, table = heatmap(spec, results, *args.heatmap, args.quantity)
+            write_heatmap(args.output, *args.heatmap, row_values, column_values, table)
+        else:
+            write_points(args.output, spec, results)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    points = int(np.prod([len(values) for _, values in spec]))
+    print(f"Точек сетки: {points}. Результат: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Расчёт параметров пожара по Приложению 1 для ведомости помещений (CSV).
+
+Ведомость читается группами по chunksize строк, каждая группа считается
+одним вызовом appendix1.calculate_arrays (без NumPy - построчно через
+appendix1.calculate), результат дописывается в CSV или JSON (по расширению).
+
+Входной CSV (заголовок обязателен, порядок колонок любой):
+    room,k,Fpom,v,psi_ud,m,HOC
+room - необязательное обозначение помещения; m - необязательно (пусто или 0 -
+по ψуд); HOC - теплота сгорания, кДж/кг (если колонки нет - значение --hoc).
+
+Результат: исходные колонки (как в ведомости) и tmax, Psi, HRRPUA, TAU_Q, Stt, bigM.
+
+k, Fpom, v и psi_ud должны быть больше нуля, m и HOC - неотрицательны; строка
+с некорректными данными или нерассчитываемым результатом (inf/nan) - ошибка
+с номером строки, результат при этом не записывается.
+
+Запуск:
+    python room_schedule.py rooms.csv [-o result.csv|result.json] [--dialect fds5] [--hoc 14000]
+    python room_schedule.py --benchmark [1000000]    (строк/с на синтетической ведомости)
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+from math import isfinite
+
+from appendix1 import DIALECTS, RoomInput, calculate, calculate_arrays, np
+from fds_stream import DEFAULT_CHUNKSIZE, atomic_write
+
+INPUT_FIELDS = ('k', 'Fpom', 'v', 'psi_ud', 'm', 'HOC')
+REQUIRED_FIELDS = ('k', 'Fpom', 'v', 'psi_ud')
+POSITIVE_FIELDS = ('k', 'Fpom', 'v', 'psi_ud')
+RESULT_FIELDS = ('tmax', 'Psi', 'HRRPUA', 'TAU_Q', 'Stt', 'bigM')
+OUTPUT_FIELDS = ('room',) + INPUT_FIELDS + RESULT_FIELDS
+BENCHMARK_ROWS = 1_000_000
+
+
+def _parse_number(cell, field, line):
+    cell = cell.strip()
+    if not cell and field == 'm':
+        return 0.0
+    try:
+        return float(cell.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"Строка {line}: некорректное значение {field} '{cell}'")
+
+
+def _first_invalid(values, positive):
+    """Индекс первого значения вне допустимой области (не конечное, <= 0 или < 0); None, если таких нет."""
+    if np is not None:
+        array = np.asarray(values, dtype=float)
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(array) & ((array > 0) if positive else (array >= 0))
+        bad = np.flatnonzero(~valid)
+        return int(bad[0]) if bad.size else None
+    return next((i for i, value in enumerate(values)
+                 if not isfinite(value) or (value <= 0 if positive else value < 0)), None)
+
+
+def _check_inputs(texts, columns, first_line):
+    """
+    Проверяет область допустимых значений исходных данных группы строк.
+
+    :raises ValueError: С номером строки, если значение некорректно.
+    """
+    for field in INPUT_FIELDS:
+        positive = field in POSITIVE_FIELDS
+        i = _first_invalid(columns[field], positive)
+        if i is not None:
+            condition = "больше нуля" if positive else "неотрицательным"
+            raise ValueError(f"Строка {first_line + i}: значение {field} '{texts[field][i]}' должно быть {condition}")
+
+
+def _check_results(results, first_line):
+    """
+    Проверяет, что результаты группы строк конечны (JSON не допускает inf/nan).
+
+    :raises ValueError: С номером строки, если результат не рассчитывается.
+    """
+    for field in RESULT_FIELDS:
+        values = results[field]
+        if all(map(isfinite, values)):
+            continue
+        i = next(i for i, value in enumerate(values) if not isfinite(value))
+        raise ValueError(f"Строка {first_line + i}: результат {field} не рассчитывается ({results[field][i]})")
+
+
+def _parse_chunk(rows, positions, first_line, hoc):
+    """
+    Столбцы исходных данных группы строк.
+
+    Числа разбираются сразу всем столбцом; построчный разбор (пустая m,
+    десятичная запятая, сообщение об ошибке с номером строки) - только для
+    столбцов, где быстрый разбор не удался.
+
+    :param rows: Строки CSV (списки ячеек).
+    :param positions: {поле: индекс колонки}.
+    :param first_line: Номер строки файла для первой строки группы.
+    :param hoc: HOC для ведомостей без колонки HOC.
+    :return: Кортеж ({поле: исходный текст ячеек}, {поле: числа}); в тексте есть и 'room'.
+    :raises ValueError: Если значение некорректно или вне допустимой области.
+    """
+    texts = {}
+    columns = {}
+    for field in ('room',) + INPUT_FIELDS:
+        index = positions.get(field)
+        if index is None:
+            default = {'room': '', 'HOC': hoc}.get(field, 0.0)
+            texts[field] = [default] * len(rows)
+            if field != 'room':
+                columns[field] = [default] * len(rows)
+            continue
+        cells = [row[index] if index < len(row) else '' for row in rows]
+        texts[field] = cells
+        if field == 'room':
+            continue
+        try:
+            columns[field] = np.array(cells, dtype=float) if np is not None else [float(cell) for cell in cells]
+        except ValueError:
+            columns[field] = [_parse_number(cell, field, line) for line, cell in enumerate(cells, first_line)]
+    _check_inputs(texts, columns, first_line)
+    return texts, columns
+
+
+def calculate_columns(columns, dialect='fds6'):
+    """
+    Параметры пожара для столбцов исходных данных.
+
+    :param columns: {поле INPUT_FIELDS: список чисел}.
+    :param dialect: 'fds6' или 'fds5'.
+    :return: {поле RESULT_FIELDS: список чисел}; нерассчитываемые строки дают inf/nan, как в calculate_arrays.
+    """
+    args = [columns[field] for field in INPUT_FIELDS]
+    if np is not None:
+        values = calculate_arrays(*args, dialect=dialect)
+        return {field: values[field].tolist() for field in RESULT_FIELDS}
+    invalid = dict.fromkeys(RESULT_FIELDS, float('nan'))
+    results = []
+    for row in zip(*args):
+        try:
+            results.append(calculate(RoomInput(*row, dialect)).as_dict())
+        except ArithmeticError:
+            results.append(invalid)
+    return {field: [result[field] for result in results] for field in RESULT_FIELDS}
+
+
+class _JsonRowWriter:
+    """Запись массива JSON по строкам, без накопления результата в памяти."""
+
+    def __init__(self, f):
+        self.f = f
+        self.first = True
+
+    def writerows(self, rows):
+        for row in rows:
+            self.f.write('[\n' if self.first else ',\n')
+            self.first = False
+            self.f.write(json.dumps(dict(zip(OUTPUT_FIELDS, row)), ensure_ascii=False))
+
+    def close(self):
+        self.f.write('[]\n' if self.first else '\n]\n')
+
+
+def run_schedule(input_path, output_path, dialect='fds6', hoc=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Рассчитывает ведомость помещений.
+
+    :param input_path: Путь к CSV ведомости.
+    :param output_path: Путь к результату .csv или .json.
+    :param dialect: 'fds6' или 'fds5'.
+    :param hoc: HOC, кДж/кг, для ведомостей без колонки HOC.
+    :param chunksize: Число строк, считаемых за один вызов.
+    :return: Число рассчитанных помещений.
+    :raises ValueError: При ошибке в ведомости.
+    """
+    if dialect not in DIALECTS:
+        raise ValueError(f"Неизвестный dialect '{dialect}'")
+    # Результат публикуется только после успешного расчёта всей ведомости
+    with open(input_path, 'r', encoding='utf-8-sig', newline='') as src, atomic_write(output_path) as dst:
+        reader = csv.reader(src)
+        header = [name.strip() for name in next(reader, [])]
+        positions = {name: i for i, name in enumerate(header)}
+        missing = [field for field in REQUIRED_FIELDS if field not in positions]
+        if 'HOC' not in positions and hoc is None:
+            missing.append('HOC')
+        if missing:
+            raise ValueError(f"В ведомости нет колонок {', '.join(missing)}")
+
+        json_output = output_path.lower().endswith('.json')
+        if json_output:
+            writer = _JsonRowWriter(dst)
+        else:
+            writer = csv.writer(dst, lineterminator='\n')
+            writer.writerow(OUTPUT_FIELDS)
+
+        count = 0
+        for rows in iter(lambda: list(islice(reader, chunksize)), []):
+            texts, columns = _parse_chunk(rows, positions, count + 2, hoc)
+            results = calculate_columns(columns, dialect)
+            _check_results(results, count + 2)
+            # CSV повторяет исходные ячейки ведомости, JSON - разобранные числа
+            inputs = texts if not json_output else dict(columns, room=texts['room'])
+            writer.writerows(zip(*(inputs[field] for field in ('room',) + INPUT_FIELDS),
+                                 *(results[field] for field in RESULT_FIELDS)))
+            count += len(rows)
+        if json_output:
+            writer.close()
+    return count
+
+
+def benchmark(rows=BENCHMARK_ROWS, chunksize=DEFAULT_CHUNKSIZE, dialect='fds6'):
+    """
+    Замер скорости на синтетической ведомости (файлы во временном каталоге).
+
+    :param rows: Число помещений.
+    :param chunksize: Число строк, считаемых за один вызов.
+    :param dialect: 'fds6' или 'fds5'.
+    :return: Словарь {'rows', 'calculate', 'schedule'}: строк/с расчёта и полного цикла CSV -> CSV.
+    """
+    rng = random.Random(0)
+    columns = {
+        'k': [2.0] * rows,
+        'Fpom': [rng.uniform(5, 500) for _ in range(rows)],
+        'v': [rng.uniform(0.0055, 0.042) for _ in range(rows)],
+        'psi_ud': [rng.uniform(0.005, 0.03) for _ in range(rows)],
+        'm': [rng.choice((0.0, rng.uniform(50, 5000))) for _ in range(rows)],
+        'HOC': [rng.uniform(13800, 41900) for _ in range(rows)],
+    }
+    started = time.perf_counter()
+    for start in range(0, rows, chunksize):
+        calculate_columns({field: values[start:start + chunksize] for field, values in columns.items()}, dialect)
+    calculate_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'rooms.csv')
+        with open(input_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('room',) + INPUT_FIELDS)
+            writer.writerows(zip(range(1, rows + 1), *(columns[field] for field in INPUT_FIELDS)))
+        started = time.perf_counter()
+        run_schedule(input_path, os.path.join(tmp, 'result.csv'), dialect, chunksize=chunksize)
+        schedule_seconds = time.perf_counter() - started
+    return {'rows': rows, 'calculate': rows / calculate_seconds, 'schedule': rows / schedule_seconds}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Параметры пожара по Приложению 1 для ведомости помещений (CSV).")
+    parser.add_argument('input', nargs='?', help="CSV ведомости помещений")
+    parser.add_argument('-o', '--output', default=None, help="Результат .csv или .json (по умолчанию <ведомость>.result.csv)")
+    parser.add_argument('--dialect', default='fds6', choices=DIALECTS, help="Вариант расчёта Ψ (по умолчанию fds6)")
+    parser.add_argument('--hoc', type=float, default=None, help="HEAT_OF_COMBUSTION, кДж/кг, если в ведомости нет колонки HOC")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Число строк в группе расчёта")
+    parser.add_argument('--benchmark', type=int, nargs='?', const=BENCHMARK_ROWS, default=None, metavar='ROWS',
+                        help=f"Замер скорости на синтетической ведомости (по умолчанию {BENCHMARK_ROWS} строк)")
+    args = parser.parse_args(argv)
+    chunksize = max(1, args.chunksize)
+
+    if args.benchmark is not None:
+        result = benchmark(args.benchmark, chunksize, args.dialect)
+        print(f"Строк: {result['rows']}, NumPy: {'да' if np is not None else 'нет'}")
+        print(f"Расчёт: {result['calculate']:,.0f} строк/с")
+        print(f"CSV -> CSV: {result['schedule']:,.0f} строк/с")
+        return 0
+    if args.input is None:
+        parser.error("не задана ведомость помещений")
+
+    output = args.output or os.path.splitext(args.input)[0] + '.result.csv'
+    started = time.perf_counter()
+    try:
+        count = run_schedule(args.input, output, args.dialect, args.hoc, chunksize)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    print(f"Рассчитано помещений: {count} за {time.perf_counter() - started:.2f} с. Результат: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
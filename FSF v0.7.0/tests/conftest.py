@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули программы лежат плоско в каталоге FSF v0.7.0
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+import math
+
+import numpy as np
+import pytest
+
+from appendix1 import RoomInput, calculate, calculate_arrays, calculate_fire_parameters
+
+ROOMS = [(2, 39, 0.042, 0.0129, 0, 14000), (2, 12, 0.0055, 0.02, 0, 13800), (1, 500, 0.02, 0.005, 3000, 41900)]
+
+
+def test_reference_room():
+    values = calculate_fire_parameters(2, 39, 0.042, 0.0129, 0, 14000)
+    tmax = math.sqrt(2 * 39 / (math.pi * 0.042 ** 2))
+    assert values['tmax'] == pytest.approx(tmax)
+    assert values['TAU_Q'] == -values['tmax']
+    assert values['Stt'] == pytest.approx(2 * 39)
+    assert values['Psi'] == pytest.approx(0.0129 * 2 * 39)
+    assert values['HRRPUA'] == pytest.approx(14000 * values['Psi'] * 0.93)
+
+
+@pytest.mark.parametrize('dialect', ['fds6', 'fds5'])
+def test_arrays_match_scalar(dialect):
+    columns = [np.array(column, dtype=float) for column in zip(*ROOMS)]
+    arrays = calculate_arrays(*columns, dialect=dialect)
+    for i, room in enumerate(ROOMS):
+        expected = calculate(RoomInput(*room, dialect)).as_dict()
+        for name, value in expected.items():
+            assert arrays[name][i] == pytest.approx(value, rel=1e-12)
+
+
+def test_arrays_broadcast_and_invalid_values():
+    arrays = calculate_arrays(2, [39, 12], [0.042, 0.0], 0.0129, 0, 14000)
+    assert arrays['tmax'].shape == (2,)
+    assert math.isfinite(arrays['tmax'][0]) and not math.isfinite(arrays['tmax'][1])
+
+
+def test_unknown_dialect():
+    with pytest.raises(ValueError):
+        calculate(RoomInput(2, 39, 0.042, 0.0129, dialect='fds4'))
+    with pytest.raises(ValueError):
+        calculate_arrays(2, 39, 0.042, 0.0129, dialect='fds4')
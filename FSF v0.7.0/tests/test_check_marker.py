@@ -0,0 +1,122 @@
+import pytest
+
+import fds_index
+from fds_index import load_index
+from fds_splice import splice_surf_fix, surf_fix_is_current
+from fds_stream import (read_check_hash, read_check_marker, rewrite_fds_file, surf_fix_hash, surf_fix_pipeline,
+                        update_check_marker)
+
+SCENARIO = (
+    "&HEAD CHID='room'/\n"
+    "&SURF ID='FIRE', HRRPUA=500/\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE'/\n"
+    "(end)\n"
+    "&TAIL/\n"
+)
+
+
+def test_old_marker_is_readable(tmp_path):
+    path = tmp_path / 'room.fds'
+    path.write_text(SCENARIO + "CheckSURFFIX=Done\n")
+    assert read_check_marker(str(path)) == "Done"
+    assert read_check_hash(str(path)) is None
+    assert update_check_marker(str(path), "None") == "Done"
+    assert not surf_fix_is_current(str(path), surf_fix_hash(1))
+
+
+def test_marker_with_hash(tmp_path):
+    path = tmp_path / 'room.fds'
+    path.write_text(SCENARIO)
+    params_hash = surf_fix_hash(1000, -300)
+    splice_surf_fix(str(path), 1000, -300, marker_state="Done", params_hash=params_hash)
+    last_line = path.read_text().splitlines()[-1]
+    assert last_line.startswith(f"CheckSURFFIX=Done HASH={params_hash}:")
+    assert read_check_marker(str(path)) == "Done"
+    assert update_check_marker(str(path), "None") == "Done"
+    assert path.read_text().splitlines()[-1] == last_line
+    assert read_check_hash(str(path))[0] == params_hash
+    assert surf_fix_is_current(str(path), params_hash)
+    assert not surf_fix_is_current(str(path), surf_fix_hash(2000, -300))
+
+
+def test_is_current_does_not_build_index(tmp_path, monkeypatch):
+    path = tmp_path / 'room.fds'
+    path.write_text(SCENARIO)
+    params_hash = surf_fix_hash(1000, -300)
+    splice_surf_fix(str(path), 1000, -300, marker_state="Done", params_hash=params_hash)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("index must not be built")
+
+    monkeypatch.setattr(fds_index, 'build_index', fail)
+    assert surf_fix_is_current(str(path), params_hash)
+
+
+def test_is_current_checks_records_with_saved_index(tmp_path):
+    path = tmp_path / 'room.fds'
+    path.write_text(SCENARIO)
+    params_hash = surf_fix_hash(1000, -300)
+    splice_surf_fix(str(path), 1000, -300, marker_state="Done", params_hash=params_hash)
+    path.write_text(path.read_text().replace("HRRPUA=1000", "HRRPUA=900 "))
+    assert surf_fix_is_current(str(path), params_hash)
+    load_index(str(path))
+    assert not surf_fix_is_current(str(path), params_hash)
+
+
+TOUCHED_SCENARIO = (
+    "&HEAD CHID='room'/\n"
+    "&SURF ID='FIRE', HRRPUA=500, RAMP_Q='fire_ramp'/\n"
+    "&RAMP ID='fire_ramp', T=0, F=0/\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', CTRL_ID='ignition'/\n"
+    "(end)\n"
+    "&CTRL ID='ignition', FUNCTION_TYPE='ALL', INPUT_ID='t'/\n"
+    "&CTRL ID='door', FUNCTION_TYPE='ALL', INPUT_ID='t'/\n"
+    "&DEVC ID='t', QUANTITY='TIME', XYZ=0,0,0, SETPOINT=10/\n"
+    "&OBST XB=0,1,0,1,0,1, SURF_ID='INERT', CTRL_ID='door'/\n"
+    "&HOLE XB=0,1,0,1,0,1, CTRL_ID='door'/\n"
+    "&OBST XB=1,2,0,1,0,1, SURF_ID='INERT'/\n"
+    "&TAIL/\n"
+)
+
+
+def _fixed(tmp_path, mode):
+    path = tmp_path / 'room.fds'
+    path.write_text(TOUCHED_SCENARIO)
+    params_hash = surf_fix_hash(1000, -300)
+    if mode == 'rewrite':
+        rewrite_fds_file(str(path), surf_fix_pipeline(str(path), 1000, -300, "Done", params_hash=params_hash))
+    else:
+        splice_surf_fix(str(path), 1000, -300, marker_state="Done", params_hash=params_hash)
+    return path, params_hash
+
+
+@pytest.mark.parametrize('mode', ['rewrite', 'splice'])
+def test_pruned_records_do_not_break_hash(tmp_path, mode):
+    path, params_hash = _fixed(tmp_path, mode)
+    text = path.read_text()
+    assert "ignition" not in text and "fire_ramp" not in text and "ID='door'" in text
+    load_index(str(path))
+    assert surf_fix_is_current(str(path), params_hash)
+
+
+@pytest.mark.parametrize('mode', ['rewrite', 'splice'])
+@pytest.mark.parametrize('old, new', [
+    ("SURF_ID='FIRE', /", "SURF_ID='FIRE', CTRL_ID='door'/"),
+    ("&OBST XB=1,2,0,1,0,1, SURF_ID='INERT'/", "&OBST XB=1,2,0,1,0,1, SURF_ID='INERT', CTRL_ID='door'/"),
+    ("&CTRL ID='door', FUNCTION_TYPE='ALL'", "&CTRL ID='door', FUNCTION_TYPE='ANY'"),
+    ("&TAIL/", "&RAMP ID='new', T=0, F=1/\n&TAIL/"),
+])
+def test_manual_edit_of_touched_records_is_detected(tmp_path, mode, old, new):
+    path, params_hash = _fixed(tmp_path, mode)
+    text = path.read_text()
+    assert old in text
+    path.write_text(text.replace(old, new))
+    load_index(str(path))
+    assert not surf_fix_is_current(str(path), params_hash)
+
+
+def test_untouched_records_do_not_invalidate_hash(tmp_path):
+    path, params_hash = _fixed(tmp_path, 'splice')
+    path.write_text(path.read_text().replace("&OBST XB=1,2,0,1,0,1, SURF_ID='INERT'/", "&OBST XB=1,3,0,1,0,1/"))
+    load_index(str(path))
+    assert surf_fix_is_current(str(path), params_hash)
@@ -0,0 +1,24 @@
+import pytest
+
+from devc_csv import read_devc_csv_files
+
+
+def _write_csv(path, start, rows):
+    lines = ['s,kg/m3,C', 'Time,h_0001_1,Tg 3D_0001_1']
+    lines += [f'{start + i}.0,{i},{2 * i}' for i in range(rows)]
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.mark.parametrize('batchsize, processes', [(1, True), (3, False), (3, True)])
+def test_files_merged_in_order(tmp_path, batchsize, processes):
+    files = []
+    for n in range(3):
+        path = tmp_path / f'run{n}_devc.csv'
+        _write_csv(path, 100 * n, 5)
+        files.append(str(path))
+    calls = []
+    series = read_devc_csv_files(files, ['h_0001_1', 'missing'], chunksize=2, batchsize=batchsize,
+                                 progress=lambda done, total: calls.append((done, total)), processes=processes)
+    assert list(series) == ['h_0001_1']
+    assert [time for time, _ in series['h_0001_1']] == [100.0 * n + i for n in range(3) for i in range(5)]
+    assert calls == [(1, 3), (2, 3), (3, 3)]
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import fds_index
+from fds_index import block_hashes, build_index, refresh_index
+
+
+def _scenario(seed, count=400):
+    rng = random.Random(seed)
+    lines = ["&HEAD CHID='room'/\n", "&MESH ID='M1', IJK=10,10,10, XB=0,1,0,1,0,1/\n"]
+    for i in range(count):
+        lines.append(f"&OBST ID='O{i}', XB={rng.random():.3f},1,0,1,0,1/\n")
+        if rng.random() < 0.1:
+            lines.append(f"&DEVC ID='D{i}', QUANTITY='TEMPERATURE',\n      XYZ=0,0,{i}/\n")
+    lines.append("&TAIL/\n")
+    return ''.join(lines).encode('latin-1')
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(fds_index, 'INDEX_BLOCK_SIZE', 1000)
+    monkeypatch.setattr(fds_index, 'PARALLEL_SCAN_THRESHOLD', 0)
+    monkeypatch.setattr(fds_index, 'PARALLEL_CHUNK_SIZE', 4000)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_scan_computes_block_hashes(tmp_path, small_blocks, workers):
+    path = tmp_path / 'room.fds'
+    path.write_bytes(_scenario(0))
+    index = build_index(str(path), workers)
+    assert index.blocks == block_hashes(str(path), path.stat().st_size)
+    assert index.entries == build_index(str(path), 1).entries
+
+
+def test_refresh_after_edit(tmp_path, small_blocks):
+    path = tmp_path / 'room.fds'
+    data = _scenario(1)
+    path.write_bytes(data)
+    index = build_index(str(path), 1)
+    path.write_bytes(data.replace(b"ID='O200'", b"ID='CHANGED'"))
+    index, change = refresh_index(index, save=False, workers=1)
+    assert change is not None and 'OBST' in change.names
+    assert index.entries == build_index(str(path), 1).entries
+    assert index.blocks == block_hashes(str(path), path.stat().st_size)
@@ -0,0 +1,93 @@
+import pytest
+
+from fds_lint import find_overlaps, lint_fds_file, main
+from fds_stream import iter_namelists, run_pipeline
+from fds_lint import LintStage
+
+
+def _lint(text):
+    stage = LintStage()
+    for _ in run_pipeline(iter_namelists(text.splitlines(True)), [stage]):
+        pass
+    return stage.issues
+
+
+def _codes(text):
+    return [code for code, _ in _lint(text)]
+
+
+def test_clean_scenario():
+    assert _lint("&HEAD CHID='room'/\n"
+                 "&MESH ID='M1', IJK=10,10,10, XB=0,1,0,1,0,1/\n"
+                 "&SURF ID='FIRE', HRRPUA=500/\n"
+                 "&CTRL ID='door', FUNCTION_TYPE='ALL', INPUT_ID='t'/\n"
+                 "&DEVC ID='t', QUANTITY='TIME', XYZ=0,0,0, SETPOINT=10/\n"
+                 "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE'/\n"
+                 "&OBST XB=0,1,0,1,0,1, SURF_IDS='INERT','OPEN','INERT', CTRL_ID='door'/\n"
+                 "&VENT MB='XMIN', SURF_ID='OPEN'/\n") == []
+
+
+def test_missing_surf():
+    issues = _lint("&SURF ID='WALL'/\n"
+                   "&OBST XB=0,1,0,1,0,1, SURF_ID='WALL'/\n"
+                   "&OBST XB=0,1,0,1,0,1, SURF_ID6='WALL','WALL','INERT','OPEN','MIRROR','GLASS'/\n"
+                   "&VENT XB=0,1,0,1,0,0, SURF_ID='open'/\n")
+    assert [code for code, _ in issues] == ['MISSING_SURF']
+    assert "SURF_ID='GLASS'" in issues[0][1] and "строка 3" in issues[0][1]
+
+
+def test_unused_fire():
+    issues = _lint("&SURF ID='FIRE', HRRPUA=500/\n&SURF ID='USED', HRRPUA=100/\n&VENT XB=0,1,0,1,0,0, SURF_ID='USED'/\n")
+    assert issues == [('UNUSED_FIRE', "&SURF ID='FIRE' с HRRPUA (строка 1) не назначен ни одному &VENT/&OBST")]
+
+
+@pytest.mark.parametrize('name', ['OBST', 'VENT', 'HOLE'])
+def test_missing_ctrl(name):
+    issues = _lint(f"&CTRL ID='door', FUNCTION_TYPE='ALL', INPUT_ID='t'/\n"
+                   f"&{name} XB=0,1,0,1,0,1, CTRL_ID='door'/\n"
+                   f"&{name} XB=0,1,0,1,0,1, CTRL_ID='gone'/\n")
+    assert issues == [('MISSING_CTRL', f"&{name} (строка 3) ссылается на несуществующий CTRL_ID='gone'")]
+
+
+def test_duplicate_id_shared_devc_ctrl_namespace():
+    issues = _lint("&DEVC ID='a', QUANTITY='TIME', XYZ=0,0,0/\n"
+                   "&CTRL ID='a', FUNCTION_TYPE='ALL', INPUT_ID='a'/\n"
+                   "&SURF ID='a'/\n"
+                   "&MESH ID='M', IJK=1,1,1, XB=0,1,0,1,0,1/\n"
+                   "&MESH ID='M', IJK=1,1,1, XB=1,2,0,1,0,1/\n")
+    assert issues == [('DUPLICATE_ID', "&CTRL ID='a' (строка 2) повторяет &DEVC в строке 1"),
+                      ('DUPLICATE_ID', "&MESH ID='M' (строка 5) повторяет &MESH в строке 4")]
+
+
+def test_duplicate_id_on_one_line():
+    assert _codes("&DEVC ID='a', QUANTITY='TIME', XYZ=0,0,0/ &DEVC ID='a', QUANTITY='TIME', XYZ=0,0,1/\n") \
+        == ['DUPLICATE_ID']
+
+
+def test_duplicate_id_with_cr_line_endings():
+    assert _codes("&DEVC ID='a', QUANTITY='TIME', XYZ=0,0,0/\r&DEVC ID='a', QUANTITY='TIME', XYZ=0,0,1/\r") \
+        == ['DUPLICATE_ID']
+
+
+def test_mesh_overlap():
+    issues = _lint("&MESH ID='A', IJK=1,1,1, XB=0,1,0,1,0,1/\n"
+                   "&MESH ID='B', IJK=1,1,1, XB=0.5,1.5,0,1,0,1/\n"
+                   "&MESH ID='C', IJK=1,1,1, XB=1.5,2.5,0,1,0,1/\n")
+    assert issues == [('MESH_OVERLAP', "Сетки A (строка 1) и B (строка 2) пересекаются")]
+
+
+def test_touching_meshes_are_not_overlaps():
+    meshes = [('A', [0, 1, 0, 1, 0, 1]), ('B', [1, 2, 0, 1, 0, 1]), ('C', [0, 1, 1, 2, 0, 1]),
+              ('D', [0, 1, 0, 1, 1, 2]), ('E', [1, 2, 1, 2, 1, 2]), ('F', [3, 2, 1, 0, 0, 1]), ('G', [0, 1, 2 - 1e-9, 3, 0, 1])]
+    assert find_overlaps(meshes) == []
+    assert find_overlaps([('A', [0, 1, 0, 1, 0, 1]), ('B', [0.2, 0.8, 0.2, 0.8, 0.2, 0.8])]) == [('A', 'B')]
+
+
+def test_lint_file_and_exit_code(tmp_path):
+    good = tmp_path / 'good.fds'
+    bad = tmp_path / 'bad.fds'
+    good.write_text("&SURF ID='FIRE', HRRPUA=500/\n&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE'/\n", encoding='latin-1')
+    bad.write_text("&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE'/\n", encoding='latin-1')
+    assert lint_fds_file(str(good)) == []
+    assert main([str(good)]) == 0
+    assert main([str(good), str(bad)]) == 1
@@ -0,0 +1,90 @@
+import pytest
+
+from fds_index import load_index
+from fds_mesh import merge_mesh_stage, partition_mesh_stage, read_mesh_records, refine_mesh_stage
+from fds_splice import surf_fix_is_current
+from fds_stream import (CheckMarkerStage, DevcInjectStage, apply_surf_fix, iter_namelists, prepare_scenario,
+                        rewrite_fds_file, rewrite_lines, surf_fix_hash)
+
+SCENARIO = (
+    "&HEAD CHID='room'/\n"
+    "&MESH ID='M1', IJK=20,20,10,\n"
+    "      XB=0,2,0,2,0,1/\n"
+    "&INIT XB=0,1,0,1,0,1, TEMPERATURE=20.0001/\n"
+    "&SURF ID='FIRE', HRRPUA=500/\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE'/\n"
+    "(end)\n"
+    "&VENT XB=0,0,0,2,0,1, SURF_ID='OPEN'/\n"
+    "&TAIL/\n"
+)
+
+
+def _write(tmp_path, name, text=SCENARIO):
+    path = tmp_path / name
+    path.write_text(text, encoding='latin-1')
+    return str(path)
+
+
+def _records(path, name):
+    with open(path, encoding='latin-1', newline='') as f:
+        return [record for record in iter_namelists(f) if record.name == name]
+
+
+def test_read_mesh_records_uses_index(tmp_path):
+    path = _write(tmp_path, 'room.fds')
+    meshes = read_mesh_records(path)
+    assert [mesh.ijk for mesh in meshes] == [[20, 20, 10]]
+    assert load_index(path).has('MESH')
+    records = read_mesh_records(path, ('MESH', 'VENT'))
+    assert [record.name for record in records] == ['MESH', 'VENT', 'VENT']
+
+
+@pytest.mark.parametrize('build', [
+    lambda path: partition_mesh_stage(read_mesh_records(path), 4),
+    lambda path: partition_mesh_stage(read_mesh_records(path), 4, homogeneous=True),
+    lambda path: refine_mesh_stage(read_mesh_records(path), [0], 0.05),
+    lambda path: merge_mesh_stage(read_mesh_records(path, ('MESH', 'VENT')), 0.2),
+])
+def test_stage_from_records_matches_in_memory_rewrite(tmp_path, build):
+    path = _write(tmp_path, 'room.fds')
+    lines = SCENARIO.splitlines(keepends=True)
+    expected = ''.join(rewrite_lines(lines, [build(path)]))
+    rewrite_fds_file(path, [build(path)])
+    with open(path, encoding='latin-1', newline='') as f:
+        assert f.read() == expected
+
+
+def test_refine_skips_meshes_without_ijk(tmp_path):
+    path = _write(tmp_path, 'room.fds', SCENARIO.replace("&HEAD CHID='room'/\n", "&HEAD CHID='room'/\n&MESH ID='M0'/\n"))
+    rewrite_fds_file(path, [refine_mesh_stage(read_mesh_records(path), [0], 0.05)])
+    meshes = _records(path, 'MESH')
+    assert meshes[0].text == "&MESH ID='M0'/\n"
+    assert meshes[1].ijk == [40, 40, 20]
+
+
+def test_partition_requires_single_mesh(tmp_path):
+    path = _write(tmp_path, 'room.fds', SCENARIO.replace("&TAIL/", "&MESH ID='M2', IJK=1,1,1, XB=2,3,0,1,0,1/\n&TAIL/"))
+    with pytest.raises(ValueError):
+        partition_mesh_stage(read_mesh_records(path), 4)
+
+
+def test_prepare_scenario_matches_separate_passes(tmp_path):
+    params_hash = surf_fix_hash(1000, -300)
+    once = _write(tmp_path, 'once.fds')
+    stages = prepare_scenario(once, 1000, -300, delta_z=0.1, mesh_stage=partition_mesh_stage(read_mesh_records(once), 4),
+                              marker_state="Done", params_hash=params_hash)
+    assert stages[-1].state == "Done"
+
+    separate = _write(tmp_path, 'separate.fds')
+    apply_surf_fix(separate, 1000, -300)
+    rewrite_fds_file(separate, [DevcInjectStage(0.1)])
+    rewrite_fds_file(separate, [partition_mesh_stage(read_mesh_records(separate), 4)])
+    rewrite_fds_file(separate, [CheckMarkerStage("Done", params_hash=params_hash)])
+
+    with open(once, 'rb') as a, open(separate, 'rb') as b:
+        assert a.read() == b.read()
+    assert len(_records(once, 'MESH')) == 4
+    assert len(_records(once, 'DEVC')) == 4
+    assert "HRRPUA=1000" in _records(once, 'SURF')[0].text
+    load_index(once)
+    assert surf_fix_is_current(once, params_hash)
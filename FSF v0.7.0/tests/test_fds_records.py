@@ -0,0 +1,98 @@
+import pytest
+
+from fds_records import make_record, parse_param_spans
+from fds_stream import iter_namelists
+
+SCENARIO = (
+    "&HEAD CHID='room', TITLE='A/B = test'/ comment with = and /\n"
+    "&MESH ID='M1', IJK=10,10,10,   XB=0.0,1.0, 0.0,1.0, 0.0,1.0 /\n"
+    "! free text line\n"
+    "&SURF ID='WALL', MATL_ID(1,1)='STEEL', MATL_MASS_FRACTION(1, 1)=1.0,\n"
+    "      THICKNESS(1)=0.01 / wall\n"
+    "&OBST ID='O1',\n"
+    "      XB=0,1,0,1,0,1,\n"
+    "      SURF_ID='INERT' / trailing comment, CTRL_ID='x'\r\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', CTRL_ID='ignition'/\n"
+    "&TAIL /\n"
+)
+
+
+def _records():
+    return list(iter_namelists(SCENARIO.splitlines(True)))
+
+
+def test_untouched_records_round_trip():
+    assert ''.join(record.text for record in _records()) == SCENARIO
+
+
+def test_reading_and_same_value_keep_text():
+    for record in _records():
+        text = record.text
+        for key, value in record.params.items():
+            assert record.with_param(key, value).text == text
+        assert record.text == text
+        assert record.without_param('MISSING') is record
+
+
+def test_quoted_slash_and_equals():
+    head = make_record('HEAD', "&HEAD CHID='room', TITLE='A/B = test'/ comment with = and /\n")
+    assert head.params == {'CHID': "'room'", 'TITLE': "'A/B = test'"}
+    assert head.title == 'A/B = test'
+    assert head.with_param('CHID', "'hall'").text == \
+        "&HEAD CHID='hall', TITLE='A/B = test'/ comment with = and /\n"
+    assert head.with_param('TITLE', "'x'").text == "&HEAD CHID='room', TITLE='x'/ comment with = and /\n"
+
+
+def test_array_keys():
+    surf = make_record('SURF', "&SURF ID='WALL', MATL_ID(1,1)='STEEL', MATL_MASS_FRACTION(1, 1)=1.0,\n"
+                               "      THICKNESS(1)=0.01 / wall\n")
+    assert list(surf.spans) == ['ID', 'MATL_ID(1,1)', 'MATL_MASS_FRACTION(1,1)', 'THICKNESS(1)']
+    assert surf.get_str('MATL_ID(1,1)') == 'STEEL'
+    assert surf.get_float('THICKNESS(1)') == 0.01
+    assert surf.with_param('MATL_ID(1,1)', "'CONCRETE'").text == \
+        "&SURF ID='WALL', MATL_ID(1,1)='CONCRETE', MATL_MASS_FRACTION(1, 1)=1.0,\n      THICKNESS(1)=0.01 / wall\n"
+    assert surf.without_param('MATL_MASS_FRACTION(1,1)').text == \
+        "&SURF ID='WALL', MATL_ID(1,1)='STEEL', THICKNESS(1)=0.01 / wall\n"
+
+
+def test_multiline_record_with_trailing_comment():
+    text = "&OBST ID='O1',\n      XB=0,1,0,1,0,1,\n      SURF_ID='INERT' / trailing comment, CTRL_ID='x'\r\n"
+    obst = make_record('OBST', text)
+    assert obst.xb == [0, 1, 0, 1, 0, 1]
+    assert not obst.has('CTRL_ID')
+    assert obst.with_param('XB', '0,2,0,2,0,2').text == text.replace('XB=0,1,0,1,0,1', 'XB=0,2,0,2,0,2')
+    assert obst.with_param('CTRL_ID', "'door'").text == \
+        "&OBST ID='O1',\n      XB=0,1,0,1,0,1,\n      SURF_ID='INERT', CTRL_ID='door' / trailing comment, CTRL_ID='x'\r\n"
+    assert obst.without_param('XB').text == "&OBST ID='O1',\n      SURF_ID='INERT' / trailing comment, CTRL_ID='x'\r\n"
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("&TAIL /\n", "&TAIL T_END=10 /\n"),
+    ("&TAIL/\n", "&TAIL T_END=10/\n"),
+    ("&TAIL", "&TAIL T_END=10"),
+    ("&MISC TMPA=20, /\n", "&MISC TMPA=20, T_END=10 /\n"),
+])
+def test_add_parameter(text, expected):
+    assert make_record('TAIL', text).with_param('T_END', '10').text == expected
+
+
+def test_remove_parameters():
+    vent = make_record('VENT', "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', CTRL_ID='ignition'/\n")
+    assert vent.without_param('CTRL_ID').text == "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', /\n"
+    assert vent.without_param('SURF_ID').text == "&VENT XB=0,1,0,1,0,0, CTRL_ID='ignition'/\n"
+    assert vent.without_param('XB').text == "&VENT SURF_ID='FIRE', CTRL_ID='ignition'/\n"
+    single = make_record('VENT', "&VENT SURF_ID='OPEN' /\n").without_param('SURF_ID')
+    assert single.text == "&VENT /\n"
+    assert single.params == {}
+
+
+def test_new_record_keeps_type():
+    mesh = make_record('MESH', "&MESH ID='M1', IJK=10,10,10, XB=0,1,0,1,0,1/\n")
+    changed = mesh.with_param('IJK', '20,20,20')
+    assert type(changed) is type(mesh)
+    assert changed.ijk == [20, 20, 20] and mesh.ijk == [10, 10, 10]
+
+
+def test_spans_of_text_outside_namelist():
+    assert parse_param_spans("! ID='x'\n") == {}
+    assert make_record(None, "! ID='x'\n").params == {}
@@ -0,0 +1,184 @@
+import gzip
+import io
+import lzma
+import os
+import random
+import zlib
+
+import pytest
+
+from fds_snapshot import (CHUNK_MAX_SIZE, CHUNK_MIN_SIZE, iter_content_chunks, load_snapshots, main,
+                          prune_snapshots, restore_snapshot, store_path, take_snapshot)
+
+
+def _scenario(seed=0, count=4000):
+    rng = random.Random(seed)
+    lines = [f"&OBST ID='O{i}', XB={rng.random():.4f},1,0,1,0,1/\n" for i in range(count)]
+    return ("&HEAD CHID='room'/\n" + ''.join(lines) + "&TAIL/\n").encode('latin-1')
+
+
+def _write(path, data, mtime=None):
+    if str(path).endswith('.gz'):
+        data = gzip.compress(data)
+    elif str(path).endswith('.xz'):
+        data = lzma.compress(data)
+    path.write_bytes(data)
+    # Снимок пропускается по (размер, mtime): у каждой версии своё время изменения
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, mtime if mtime is not None else stat.st_mtime_ns + 1))
+
+
+def _read(path):
+    data = path.read_bytes()
+    if str(path).endswith('.gz'):
+        return gzip.decompress(data)
+    if str(path).endswith('.xz'):
+        return lzma.decompress(data)
+    return data
+
+
+def _chunk_files(fds_path):
+    chunks = os.path.join(store_path(str(fds_path)), 'chunks')
+    return {name for _, _, names in os.walk(chunks) for name in names}
+
+
+def test_chunks_follow_lines_and_sizes():
+    data = _scenario()
+    chunks = list(iter_content_chunks(io.BytesIO(data)))
+    assert b''.join(chunks) == data
+    assert len(chunks) > 3
+    assert all(chunk.endswith(b'\n') for chunk in chunks)
+    assert all(CHUNK_MIN_SIZE <= len(chunk) <= CHUNK_MAX_SIZE for chunk in chunks[:-1])
+
+
+def test_long_lines_are_cut_at_max_size():
+    data = b''.join(b'x' * 100_000 + b'\n' for _ in range(30))
+    chunks = list(iter_content_chunks(io.BytesIO(data)))
+    assert b''.join(chunks) == data
+    assert all(len(chunk) < CHUNK_MAX_SIZE + 100_001 for chunk in chunks)
+    assert len(chunks) >= 2
+
+
+def test_chunk_boundaries_depend_on_content():
+    data = _scenario()
+    edited = data.replace(b"ID='O10',", b"ID='O10', COLOR='RED',")
+    before = list(iter_content_chunks(io.BytesIO(data)))
+    after = list(iter_content_chunks(io.BytesIO(edited)))
+    assert len(set(after) - set(before)) == 1
+
+
+def test_snapshots_share_chunks(tmp_path):
+    path = tmp_path / 'room.fds'
+    data = _scenario()
+    _write(path, data)
+    first = take_snapshot(str(path), 'first')
+    assert first['id'] == 1 and first['size'] == len(data)
+    assert take_snapshot(str(path)) is None
+    stored = _chunk_files(path)
+    assert stored == set(first['chunks'])
+
+    _write(path, data.replace(b"ID='O2000',", b"ID='O2000', COLOR='RED',"))
+    second = take_snapshot(str(path), 'second')
+    assert second['id'] == 2
+    assert len(_chunk_files(path) - stored) == 1
+    assert len(set(second['chunks']) - set(first['chunks'])) == 1
+
+    # Перезапись без изменения содержимого нового снимка не создаёт
+    _write(path, _read(path))
+    assert take_snapshot(str(path)) is None
+    assert [snapshot['label'] for snapshot in load_snapshots(str(path))] == ['first', 'second']
+
+
+@pytest.mark.parametrize('name', ['room.fds', 'room.fds.gz', 'room.fds.xz'])
+def test_restore_round_trip(tmp_path, name):
+    path = tmp_path / name
+    original = _scenario(1) + b"! CRLF\r\nlast line"
+    _write(path, original)
+    take_snapshot(str(path), 'SURF_FIX')
+    _write(path, b"&HEAD CHID='other'/\n")
+    restored = restore_snapshot(str(path))
+    assert restored['label'] == 'SURF_FIX'
+    assert _read(path) == original
+    # Текущее содержимое перед восстановлением тоже сохранено снимком
+    labels = [snapshot['label'] for snapshot in load_snapshots(str(path))]
+    assert labels == ['SURF_FIX', 'перед восстановлением снимка 1']
+    _write(path, _read(path))
+    restore_snapshot(str(path), 2)
+    assert _read(path) == b"&HEAD CHID='other'/\n"
+
+
+def _corrupt_chunk(path, snapshot):
+    chunk = os.path.join(store_path(str(path)), 'chunks', snapshot['chunks'][1][:2], snapshot['chunks'][1])
+    with open(chunk, 'wb') as f:
+        f.write(zlib.compress(b"&OBST ID='FORGED'/\n"))
+    return chunk
+
+
+def test_corrupted_snapshot_leaves_file_untouched(tmp_path):
+    path = tmp_path / 'room.fds'
+    _write(path, _scenario(2))
+    snapshot = take_snapshot(str(path))
+    _corrupt_chunk(path, snapshot)
+    _write(path, b"&HEAD CHID='current'/\n")
+    with pytest.raises(ValueError, match='повреждён'):
+        restore_snapshot(str(path), snapshot['id'])
+    assert path.read_bytes() == b"&HEAD CHID='current'/\n"
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+
+def test_missing_chunk_leaves_file_untouched(tmp_path, capsys):
+    path = tmp_path / 'room.fds'
+    _write(path, _scenario(3))
+    snapshot = take_snapshot(str(path))
+    os.remove(_corrupt_chunk(path, snapshot))
+    _write(path, b"&HEAD CHID='current'/\n")
+    assert main(['restore', str(path), str(snapshot['id'])]) == 1
+    assert 'Ошибка' in capsys.readouterr().err
+    assert path.read_bytes() == b"&HEAD CHID='current'/\n"
+
+
+def test_restore_unknown_snapshot(tmp_path):
+    path = tmp_path / 'room.fds'
+    _write(path, b"&HEAD CHID='room'/\n")
+    with pytest.raises(LookupError):
+        restore_snapshot(str(path))
+    take_snapshot(str(path))
+    with pytest.raises(LookupError):
+        restore_snapshot(str(path), 7)
+
+
+def test_prune_keeps_last_snapshots_and_shared_chunks(tmp_path, capsys):
+    path = tmp_path / 'room.fds'
+    other = tmp_path / 'copy.fds'
+    data = _scenario(4)
+    _write(other, data)
+    take_snapshot(str(other))
+    for i in range(4):
+        _write(path, data.replace(b"ID='O100',", f"ID='O100', COLOR='C{i}',".encode()))
+        take_snapshot(str(path), f"v{i}")
+    kept = load_snapshots(str(path))[-2:]
+
+    assert prune_snapshots(str(path), keep=2) == (2, 2)
+    assert load_snapshots(str(path)) == kept
+    referenced = {chunk for snapshot in kept + load_snapshots(str(other)) for chunk in snapshot['chunks']}
+    assert _chunk_files(path) == referenced
+    for snapshot in kept:
+        restore_snapshot(str(path), snapshot['id'])
+
+    assert main(['prune', str(other), '--keep', '0']) == 0
+    assert 'Удалено снимков: 1' in capsys.readouterr().out
+    assert load_snapshots(str(other)) == []
+
+
+def test_prune_does_not_collect_with_unreadable_manifest(tmp_path):
+    path = tmp_path / 'room.fds'
+    _write(path, _scenario(5))
+    take_snapshot(str(path))
+    with open(os.path.join(store_path(str(path)), 'broken.fds.json'), 'w') as f:
+        f.write('{')
+    before = _chunk_files(path)
+    with pytest.raises(ValueError):
+        prune_snapshots(str(path), keep=0)
+    assert _chunk_files(path) == before
+    with pytest.raises(ValueError):
+        prune_snapshots(str(path), keep=-1)
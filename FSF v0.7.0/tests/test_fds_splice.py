@@ -0,0 +1,59 @@
+import pytest
+
+import fds_stream
+from fds_index import load_index
+from fds_splice import preview_surf_fix, splice_surf_fix
+from fds_stream import apply_surf_fix
+
+SCENARIO = (
+    "&HEAD CHID='room'/\n"
+    "&CTRL ID='ignition', FUNCTION_TYPE='ANY', INPUT_ID='timer', RAMP_ID='delay'/\n"
+    "&CTRL ID='door', FUNCTION_TYPE='ANY', INPUT_ID='smoke'/\n"
+    "&RAMP ID='delay', T=0, F=0/\n"
+    "&RAMP ID='fire_ramp', T=0, F=0/\n"
+    "&SURF ID='FIRE', HRRPUA=500, RAMP_Q='fire_ramp'/\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', CTRL_ID='ignition'/\n"
+    "&OBST XB=0,1,0,1,0,1, CTRL_ID='ignition'/\n"
+    "! комментарий внутри блока очага\n"
+    "(end)\n"
+    "&OBST XB=1,2,0,1,0,1, ctrl_id='ignition'/\n"
+    "&OBST XB=2,3,0,1,0,1, SURF_ID='INERT'/\n"
+    "&HOLE XB=0,1,0,1,0,1, CTRL_ID='door'/\n"
+    "&TAIL/\n"
+)
+
+
+@pytest.fixture
+def scenario(tmp_path):
+    paths = {}
+    for name in ('rewrite', 'splice', 'indexed'):
+        path = tmp_path / f'{name}.fds'
+        path.write_bytes(SCENARIO.encode('cp1251'))
+        paths[name] = str(path)
+    return paths
+
+
+def test_splice_matches_rewrite(scenario):
+    apply_surf_fix(scenario['rewrite'], 1000, -300, marker_state="Done")
+    splice_surf_fix(scenario['splice'], 1000, -300, marker_state="Done")
+    load_index(scenario['indexed'])
+    splice_surf_fix(scenario['indexed'], 1000, -300, marker_state="Done")
+    expected = open(scenario['rewrite'], 'rb').read()
+    assert open(scenario['splice'], 'rb').read() == expected
+    assert open(scenario['indexed'], 'rb').read() == expected
+    text = expected.decode('cp1251')
+    # После SURF_FIX на ignition, delay и fire_ramp не осталось ссылок, door нужен &HOLE
+    assert "&CTRL ID='ignition'" not in text
+    assert "&RAMP ID='delay'" not in text
+    assert "&RAMP ID='fire_ramp'" not in text
+    assert "&CTRL ID='door'" in text
+    assert "комментарий" not in text
+
+
+def test_splice_builds_graph_in_the_same_pass(scenario, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("extra pass over the file")
+
+    monkeypatch.setattr(fds_stream, 'build_reference_graph', fail)
+    splice_surf_fix(scenario['splice'], 1000, -300, marker_state="Done")
+    assert list(preview_surf_fix(scenario['splice'], 1000, -300, marker_state="Done")) == []
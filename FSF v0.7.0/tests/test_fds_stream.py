@@ -0,0 +1,84 @@
+import gzip
+
+import pytest
+
+from fds_splice import splice_surf_fix
+from fds_stream import CheckMarkerStage, MeshReplaceStage, apply_surf_fix, open_fds, rewrite_fds_file, rewrite_lines
+
+CRLF_SCENARIO = (
+    "&HEAD CHID='room', TITLE='Помещение'/\r\n"
+    "&MESH ID='M1', IJK=10,10,10, XB=0,1,0,1,0,1/\r\n"
+    "&SURF ID='FIRE', HRRPUA=500,\r\n"
+    "      RAMP_Q='fire_ramp'/\r\n"
+    "&RAMP ID='fire_ramp', T=0, F=0/\r\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', CTRL_ID='ignition'/\r\n"
+    "(end)\r\n"
+    "&OBST XB=0,1,0,1,0,1/\r\n"
+    "&TAIL/\r\n"
+).encode('cp1251')
+
+
+def _write(path, data):
+    if str(path).endswith('.gz'):
+        with gzip.open(path, 'wb') as f:
+            f.write(data)
+    else:
+        path.write_bytes(data)
+
+
+def _read(path):
+    with open_fds(str(path), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('name', ['room.fds', 'room.fds.gz'])
+def test_rewrite_without_changes_keeps_bytes(tmp_path, name):
+    path = tmp_path / name
+    data = CRLF_SCENARIO + b"! lone CR\rlast line without newline"
+    _write(path, data)
+    rewrite_fds_file(str(path), [])
+    assert _read(path) == data
+    rewrite_fds_file(str(path), [], chunksize=2)
+    assert _read(path) == data
+
+
+@pytest.mark.parametrize('fix', ['rewrite', 'splice'])
+def test_surf_fix_keeps_crlf(tmp_path, fix):
+    path = tmp_path / 'room.fds'
+    _write(path, CRLF_SCENARIO)
+    if fix == 'rewrite':
+        apply_surf_fix(str(path), 1000, -300, marker_state="Done")
+    else:
+        splice_surf_fix(str(path), 1000, -300, marker_state="Done")
+    data = _read(path)
+    lines = data.split(b'\r\n')
+    assert b'\n' not in data.replace(b'\r\n', b'')
+    assert lines[0] == "&HEAD CHID='room', TITLE='Помещение'/".encode('cp1251')
+    assert b"&SURF ID='FIRE', HRRPUA=1000, COLOR='RED', TAU_Q=-300/" in lines
+    assert b"&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE', /" in lines
+    assert lines[-2:] == [b'CheckSURFFIX=Done', b'']
+
+
+def test_rewrite_and_splice_agree_on_crlf(tmp_path):
+    rewritten = tmp_path / 'rewrite.fds'
+    spliced = tmp_path / 'splice.fds'
+    _write(rewritten, CRLF_SCENARIO)
+    _write(spliced, CRLF_SCENARIO)
+    apply_surf_fix(str(rewritten), 1000, -300, marker_state="Done")
+    splice_surf_fix(str(spliced), 1000, -300, marker_state="Done")
+    assert _read(rewritten) == _read(spliced)
+
+
+def test_marker_stage_keeps_crlf(tmp_path):
+    path = tmp_path / 'room.fds'
+    _write(path, CRLF_SCENARIO + b'CheckSURFFIX=None\r\n')
+    rewrite_fds_file(str(path), [CheckMarkerStage("Done")])
+    assert _read(path) == CRLF_SCENARIO + b'CheckSURFFIX=None\r\n'
+
+
+def test_rewrite_lines_keeps_line_endings():
+    lines = ["&MESH ID='M1', IJK=1,1,1, XB=0,1,0,1,0,1/\r\n",
+             "! ellipsis in cp1251: \x85\r\n",
+             "&TAIL/\r\n"]
+    stage = MeshReplaceStage({0: "&MESH ID='M1', IJK=2,2,2, XB=0,1,0,1,0,1/\n"})
+    assert rewrite_lines(lines, [stage]) == ["&MESH ID='M1', IJK=2,2,2, XB=0,1,0,1,0,1/\r\n"] + lines[1:]
@@ -0,0 +1,37 @@
+import json
+
+from fsf_batch import main
+
+SCENARIO = (
+    "&HEAD CHID='room'/\n"
+    "&MESH ID='M1', IJK=10,10,10, XB=0,1,0,1,0,1/\n"
+    "&SURF ID='FIRE', HRRPUA=500/\n"
+    "&VENT XB=0,1,0,1,0,0, SURF_ID='FIRE'/\n"
+    "(end)\n"
+    "&TAIL/\n"
+)
+WARNING_SCENARIO = SCENARIO.replace("&TAIL/", "&OBST XB=0,1,0,1,0,1, SURF_ID='NOWHERE'/\n&TAIL/")
+JOB = {"k": 2, "Fpom": 39, "v": 0.042, "psi_ud": 0.0129, "HOC": 14000}
+
+
+def _run(tmp_path, capsys, files, overrides=None):
+    for name, text in files.items():
+        (tmp_path / name).write_text(text, encoding='latin-1')
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps([dict(JOB, path=name, **(overrides or {}).get(name, {})) for name in files]))
+    code = main([str(manifest), '--workers', '1', '--no-snapshot'])
+    return code, capsys.readouterr().out
+
+
+def test_lint_warning_is_not_a_failure(tmp_path, capsys):
+    code, out = _run(tmp_path, capsys, {'ok.fds': SCENARIO, 'warn.fds': WARNING_SCENARIO})
+    assert code == 0
+    assert "Обработано: 2, предупреждений: 1, ошибок: 0." in out
+    assert "MISSING_SURF" in out
+
+
+def test_error_is_a_failure(tmp_path, capsys):
+    code, out = _run(tmp_path, capsys, {'ok.fds': SCENARIO, 'broken.fds': SCENARIO},
+                     overrides={'broken.fds': {'Fpom': 0}})
+    assert code == 1
+    assert "Обработано: 1, предупреждений: 0, ошибок: 1." in out
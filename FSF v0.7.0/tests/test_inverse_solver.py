@@ -0,0 +1,47 @@
+import math
+
+import numpy as np
+import pytest
+
+from appendix1 import calculate_fire_parameters
+from inverse_solver import solve_inverse
+
+ROOM = {'k': 2, 'Fpom': 39, 'v': 0.042, 'psi_ud': 0.0129, 'HOC': 14000}
+
+
+def test_mass_for_hrrpua_limit():
+    result = solve_inverse('m', 5000, **ROOM)
+    tmax = math.sqrt(2 * 39 / (math.pi * 0.042 ** 2))
+    # HRRPUA = HOC·0.93·m/tmax, откуда m = limit·tmax / (0.93·HOC)
+    assert result['value'][()] == pytest.approx(5000 * tmax / (0.93 * 14000), rel=1e-9)
+    assert result['bound'][()] == 1
+    assert result['target'][()] == pytest.approx(5000, rel=1e-9)
+
+
+def test_feasible_mass_returns_full_load():
+    full = calculate_fire_parameters(2, 39, 0.042, 0.0129, 0, 14000)['bigM']
+    result = solve_inverse('m', 1e9, **ROOM)
+    assert result['value'][()] == pytest.approx(full)
+    assert result['bound'][()] == 1
+
+
+@pytest.mark.parametrize('unknown, bound', [('Fpom', 1), ('v', -1)])
+def test_heat_release_limit_for_rooms(unknown, bound):
+    # Q растёт с Fpom (наибольшая площадь) и убывает с v (наименьшая скорость)
+    inputs = {name: value for name, value in ROOM.items() if name != unknown}
+    result = solve_inverse(unknown, 2000, target='Q', **dict(inputs, psi_ud=[0.01, 0.0129, 0.02]))
+    assert result['value'].shape == (3,)
+    assert np.all(result['bound'] == bound)
+    np.testing.assert_allclose(result['target'], 2000, rtol=1e-9)
+
+
+def test_unreachable_limit():
+    result = solve_inverse('Fpom', 1e-30, target='Q', m=100, **{k: v for k, v in ROOM.items() if k != 'Fpom'})
+    assert math.isnan(result['value'][()]) and result['bound'][()] == 0
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        solve_inverse('k', 5000, **ROOM)
+    with pytest.raises(ValueError):
+        solve_inverse('m', 5000, k=2, Fpom=39)
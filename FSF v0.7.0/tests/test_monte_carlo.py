@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from monte_carlo import P2Quantile, parse_distribution, run_monte_carlo
+
+# Допустимое относительное расхождение P² с np.percentile на 200 000 выборок
+P2_TOLERANCE = 5e-3
+INPUTS = {'k': 2, 'Fpom': 'uniform:20:60', 'v': 'normal:0.042:0.005', 'psi_ud': 'uniform:0.01:0.015', 'HOC': 14000}
+
+
+@pytest.mark.parametrize('distribution', ['normal', 'uniform', 'lognormal', 'triangular'])
+@pytest.mark.parametrize('p', [0.05, 0.5, 0.95, 0.99])
+def test_p2_matches_percentile(distribution, p):
+    rng = np.random.default_rng(7)
+    values = {'normal': lambda: rng.normal(10, 2, 200_000),
+              'uniform': lambda: rng.uniform(1, 5, 200_000),
+              'lognormal': lambda: rng.lognormal(0, 0.5, 200_000),
+              'triangular': lambda: rng.triangular(0, 1, 4, 200_000)}[distribution]()
+    estimator = P2Quantile(p)
+    estimator.extend(values.tolist())
+    assert estimator.value == pytest.approx(np.percentile(values, 100 * p), rel=P2_TOLERANCE)
+
+
+def test_p2_short_sample():
+    estimator = P2Quantile(0.5)
+    assert estimator.value is None
+    estimator.extend([3.0, 1.0, 2.0])
+    assert estimator.value == 2.0
+
+
+def test_single_batch_is_exact():
+    result = run_monte_carlo(INPUTS, samples=10_000, percentile=95, seed=3, batch=10_000)
+    rng = np.random.default_rng(3)
+    samples = [parse_distribution(str(INPUTS.get(name, 0)))(rng, 10_000)
+               for name in ('k', 'Fpom', 'v', 'psi_ud', 'm', 'HOC')]
+    k, Fpom, v = (np.broadcast_to(value, (10_000,)) for value in samples[:3])
+    tmax = np.sqrt(k * Fpom / (np.pi * v ** 2))
+    assert result['tmax']['value'] == pytest.approx(np.percentile(tmax, 95), rel=1e-12)
+    assert result['TAU_Q']['value'] == pytest.approx(-np.percentile(tmax, 5), rel=1e-12)
+
+
+def test_streaming_matches_exact():
+    # Одна случайная величина: при любом batch генератор выдаёт ту же выборку
+    inputs = {'k': 2, 'Fpom': 'uniform:20:60', 'v': 0.042, 'psi_ud': 0.0129, 'HOC': 14000}
+    exact = run_monte_carlo(inputs, samples=200_000, percentile=95, batch=200_000)
+    streamed = run_monte_carlo(inputs, samples=200_000, percentile=95, batch=10_000)
+    for name in ('tmax', 'Psi', 'HRRPUA', 'TAU_Q'):
+        assert streamed[name]['value'] == pytest.approx(exact[name]['value'], rel=P2_TOLERANCE)
+        assert streamed[name]['mean'] == pytest.approx(exact[name]['mean'], rel=1e-9)
+
+
+def test_same_seed_is_reproducible():
+    first = run_monte_carlo(INPUTS, samples=50_000, batch=7_000, seed=5)
+    assert run_monte_carlo(INPUTS, samples=50_000, batch=7_000, seed=5) == first
+
+
+def test_invalid_inputs():
+    with pytest.raises(ValueError):
+        run_monte_carlo({'k': 2}, samples=10)
+    with pytest.raises(ValueError):
+        parse_distribution('normal:1')
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from appendix1 import calculate_fire_parameters
+from param_sweep import RESULT_FIELDS, heatmap, parse_axis, sweep
+
+AXES = {'k': 2, 'Fpom': (12, 39), 'v': parse_axis('0.005:0.05:4'), 'psi_ud': (0.01, 0.0129, 0.02), 'HOC': 14000}
+
+
+def test_parse_axis():
+    assert parse_axis('0.01') == (0.01,)
+    assert parse_axis('0.01,0.02') == (0.01, 0.02)
+    assert parse_axis('0:1:3') == (0.0, 0.5, 1.0)
+    assert parse_axis('0,5:1:2') == (0.5, 1.0)
+    with pytest.raises(ValueError):
+        parse_axis('1:2:0')
+
+
+def test_grid_matches_scalar_calculation():
+    spec, results = sweep(AXES)
+    axes = dict(spec)
+    assert results['HRRPUA'].shape == (1, 2, 4, 3, 1, 1)
+    for index in np.ndindex(results['HRRPUA'].shape):
+        point = [values[i] for (_, values), i in zip(spec, index)]
+        expected = calculate_fire_parameters(*point)
+        for name in RESULT_FIELDS:
+            assert results[name][index] == pytest.approx(expected[name], rel=1e-12)
+    assert axes['m'] == (0.0,)
+
+
+def test_results_are_cached_and_read_only():
+    _, first = sweep(AXES)
+    _, second = sweep(dict(AXES, Fpom=[12.0, 39.0]))
+    assert first is second
+    with pytest.raises(ValueError):
+        first['tmax'][(0,) * 6] = 0
+
+
+def test_heatmap_orientation():
+    spec, results = sweep(dict(AXES, Fpom=39))
+    rows, columns, table = heatmap(spec, results, 'psi_ud', 'v', 'HRRPUA')
+    assert table.shape == (len(rows), len(columns)) == (3, 4)
+    assert table[1, 2] == pytest.approx(calculate_fire_parameters(2, 39, columns[2], rows[1], 0, 14000)['HRRPUA'])
+    with pytest.raises(ValueError):
+        heatmap(*sweep(AXES), 'psi_ud', 'v', 'HRRPUA')
@@ -0,0 +1,103 @@
+import csv
+import json
+
+import pytest
+
+import room_schedule
+from appendix1 import RoomInput, calculate
+from room_schedule import RESULT_FIELDS, main, run_schedule
+
+ROWS = [('A', '2', '39', '0.042', '0.0129', '', '14000'),
+        ('B', '2', '12', '0,0055', '0.02', '0', '13800'),
+        ('C', '1', '500', '0.02', '0.005', '3000', '41900'),
+        ('D', '2', '39', '0.042', '0.0129', '50', '14000'),
+        ('E', '3', '80', '0.03', '0.01', '', '20000')]
+HEADER = ('room', 'k', 'Fpom', 'v', 'psi_ud', 'm', 'HOC')
+
+
+def _write_rooms(path, rows, header=HEADER):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def _expected(row, hoc=None):
+    k, Fpom, v, psi_ud, m = (float((cell or '0').replace(',', '.')) for cell in row[1:6])
+    return calculate(RoomInput(k, Fpom, v, psi_ud, m, hoc if hoc is not None else float(row[6]))).as_dict()
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(room_schedule, 'np', None)
+    return request.param
+
+
+@pytest.mark.parametrize('chunksize', [2, 1000])
+def test_csv_output(tmp_path, backend, chunksize):
+    output = tmp_path / 'result.csv'
+    assert run_schedule(_write_rooms(tmp_path / 'rooms.csv', ROWS), str(output), chunksize=chunksize) == len(ROWS)
+    with open(output, encoding='utf-8', newline='') as f:
+        result = list(csv.DictReader(f))
+    assert [row['room'] for row in result] == [row[0] for row in ROWS]
+    for row, written in zip(ROWS, result):
+        assert [written[field] for field in HEADER] == list(row)
+        for field in RESULT_FIELDS:
+            assert float(written[field]) == pytest.approx(_expected(row)[field], rel=1e-12)
+
+
+def test_json_output(tmp_path, backend):
+    output = tmp_path / 'result.json'
+    run_schedule(_write_rooms(tmp_path / 'rooms.csv', ROWS), str(output), chunksize=2)
+    result = json.loads(output.read_text(encoding='utf-8'))
+    assert [row['room'] for row in result] == [row[0] for row in ROWS]
+    for row, written in zip(ROWS, result):
+        assert written['v'] == float(row[3].replace(',', '.'))
+        for field in RESULT_FIELDS:
+            assert written[field] == pytest.approx(_expected(row)[field], rel=1e-12)
+
+
+def test_empty_schedule_json(tmp_path):
+    output = tmp_path / 'result.json'
+    assert run_schedule(_write_rooms(tmp_path / 'rooms.csv', []), str(output)) == 0
+    assert json.loads(output.read_text(encoding='utf-8')) == []
+
+
+def test_hoc_fallback(tmp_path):
+    rows = [row[:6] for row in ROWS]
+    path = _write_rooms(tmp_path / 'rooms.csv', rows, HEADER[:6])
+    with pytest.raises(ValueError, match='HOC'):
+        run_schedule(path, str(tmp_path / 'result.csv'))
+    output = tmp_path / 'result.json'
+    run_schedule(path, str(output), hoc=15000, chunksize=3)
+    result = json.loads(output.read_text(encoding='utf-8'))
+    for row, written in zip(rows, result):
+        assert written['HOC'] == 15000
+        assert written['HRRPUA'] == pytest.approx(_expected(row, 15000)['HRRPUA'], rel=1e-12)
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('v', '0', "Строка 4: значение v '0' должно быть больше нуля"),
+    ('k', '-2', "Строка 4: значение k '-2' должно быть больше нуля"),
+    ('Fpom', 'nan', "Строка 4: значение Fpom 'nan' должно быть больше нуля"),
+    ('m', '-1', "Строка 4: значение m '-1' должно быть неотрицательным"),
+    ('HOC', 'abc', "Строка 4: некорректное значение HOC 'abc'"),
+    ('v', '1e-200', "Строка 4: результат tmax не рассчитывается"),
+])
+def test_invalid_row(tmp_path, backend, field, value, message):
+    rows = [list(row) for row in ROWS]
+    rows[2][HEADER.index(field)] = value
+    output = tmp_path / 'result.json'
+    with pytest.raises(ValueError) as error:
+        run_schedule(_write_rooms(tmp_path / 'rooms.csv', rows), str(output), chunksize=2)
+    assert str(error.value).startswith(message)
+    assert not output.exists()
+
+
+def test_main_reports_invalid_row(tmp_path, backend, capsys):
+    rows = [list(row) for row in ROWS]
+    rows[1][3] = '0'
+    assert main([_write_rooms(tmp_path / 'rooms.csv', rows), '-o', str(tmp_path / 'result.json')]) == 2
+    assert "Строка 3: значение v '0'" in capsys.readouterr().err